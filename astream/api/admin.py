@@ -0,0 +1,59 @@
+import secrets
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Request
+
+from astream.config.settings import settings
+from astream.utils.data.database import get_cache_report, invalidate_anime
+from astream.utils.data.cache_stats import cache_stats
+from astream.utils.data.single_flight import single_flight
+from astream.utils.http.client import get_http_limits
+from astream.warm import rewarm_anime
+
+# Router pour les endpoints d'administration (désactivés sans ADMIN_TOKEN)
+admin = APIRouter(prefix="/admin")
+
+
+def verify_admin_token(request: Request) -> None:
+    """Vérifie le jeton d'administration (en-tête Authorization: Bearer ou paramètre token)."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    authorization = request.headers.get("Authorization", "")
+    token = authorization[7:] if authorization.startswith("Bearer ") else request.query_params.get("token", "")
+    if not secrets.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Jeton d'administration invalide")
+
+
+@admin.get("/cache/stats", dependencies=[Depends(verify_admin_token)])
+async def get_cache_stats(limit: int = 10):
+    """Statistiques du cache : taux de succès par famille de clés (worker courant) et tailles par table."""
+    return await get_cache_report(max(1, min(limit, 100)))
+
+
+@admin.post("/cache/stats/reset", dependencies=[Depends(verify_admin_token)])
+async def reset_cache_stats(request: Request):
+    """Remet à zéro les compteurs du worker courant."""
+    cache_stats.reset()
+    single_flight.reset()
+    request.app.state.http_client.connection_stats.reset()
+    return {"status": "ok"}
+
+
+@admin.get("/http/stats", dependencies=[Depends(verify_admin_token)])
+async def get_http_stats(request: Request):
+    """Réutilisation des connexions par pool et concurrence adaptative par hôte (worker courant), limites configurées."""
+    limits = get_http_limits()
+    return {
+        "http2": settings.HTTP2_ENABLED,
+        "limits": {"max_connections": limits.max_connections, "max_keepalive_connections": limits.max_keepalive_connections, "keepalive_expiry": limits.keepalive_expiry},
+        "pools": request.app.state.http_client.connection_stats.snapshot(),
+        "hosts": request.app.state.http_client.host_limiter.snapshot(),
+    }
+
+
+@admin.post("/cache/anime/{anime_slug}/invalidate", dependencies=[Depends(verify_admin_token)])
+async def invalidate_anime_cache(request: Request, anime_slug: str = Path(..., pattern=r"^[a-z0-9-]+$"), rewarm: bool = True):
+    """Purge la fiche et les épisodes d'un anime, puis la recharge immédiatement (sauf rewarm=false)."""
+    if rewarm:
+        return await rewarm_anime(request.app.state.http_client, anime_slug)
+    return {"purged": len(await invalidate_anime(anime_slug)), "warmed": 0}
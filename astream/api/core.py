@@ -11,7 +11,8 @@ from astream.scrapers.animesama.client import AnimeSamaAPI
 from astream.scrapers.animesama.details import get_or_fetch_anime_details
 from astream.scrapers.animesama.player import AnimeSamaPlayer
 from astream.utils.logger import logger
-from astream.utils.data.database import get_metadata_from_cache, set_metadata_to_cache
+from astream.utils.data.database import get_metadata_fields
+from astream.utils.data.response_cache import response_document_key, get_cached_response, cache_response, anime_tag, start_document_build
 from astream.utils.dependencies import get_animesama_api_dependency, get_animesama_player_dependency, extract_client_ip, get_tmdb_service
 from astream.utils.errors.handler import global_exception_handler, AnimeNotFoundException
 from astream.services.anime import AnimeSamaService
@@ -99,14 +100,7 @@ async def _enrich_catalog_with_tmdb(anime_data: list, config: 'ConfigModel', tmd
         return anime_data
     
     try:
-        tasks = [tmdb_service.enhance_anime_metadata(anime, config) for anime in anime_data]
-        enhanced_anime_data = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Filtrer les exceptions
-        enhanced_anime_data = [
-            result if not isinstance(result, Exception) else anime_data[i]
-            for i, result in enumerate(enhanced_anime_data)
-        ]
+        enhanced_anime_data = await tmdb_service.enhance_catalog_metadata(anime_data, config)
         logger.log("TMDB", f"Catalogue enrichi avec TMDB: {len([r for r in enhanced_anime_data if 'poster' in r])} anime")
         return enhanced_anime_data
     except Exception as e:
@@ -358,20 +352,15 @@ async def manifest(request: Request, b64config: str = None, animesama_api: Anime
 
 async def extract_unique_genres(animesama_api: AnimeSamaAPI) -> list[str]:
     """Extrait tous les genres uniques des données anime."""
-    cached_data = await get_metadata_from_cache("as:homepage")
-
-    if not cached_data:
-        logger.debug("CACHE MISS: as:homepage - Recuperation depuis anime-sama")
-        anime_data = await animesama_api.get_homepage_content()
-        await set_metadata_to_cache("as:homepage", {"anime": anime_data, "total": len(anime_data)})
-        logger.debug("CACHE SAUVEGARDE: as:homepage")
+    # Lecture des seuls genres de as:homepage ; sinon le catalogue gère le cache (y compris le service d'un cache expiré)
+    fields = await get_metadata_fields("as:homepage", ["anime.*.genres"])
+    if fields and fields["anime.*.genres"] is not None:
+        all_genres = fields["anime.*.genres"]
     else:
-        logger.debug("CACHE HIT: as:homepage")
-        anime_data = cached_data.get("anime", [])
+        all_genres = [anime.get('genres', '') for anime in await animesama_api.get_homepage_content()]
 
     unique_genres = set()
-    for anime in anime_data:
-        genres_raw = anime.get('genres', '')
+    for genres_raw in all_genres:
         if genres_raw:
             genres = parse_genres_string(genres_raw)
             unique_genres.update(genres)
@@ -402,6 +391,15 @@ async def animesama_catalog(request: Request, b64config: str = None, search: str
 
         # Configuration et IP client
         config_dict = validate_config(b64config) or {}
+
+        # Document déjà sérialisé pour cette requête et cette configuration
+        document_key = response_document_key(request, "catalog", config_dict, search, genre)
+        cached_response = await get_cached_response(document_key)
+        if cached_response is not None:
+            logger.log("PERFORMANCE", f"CATALOG - Document servi depuis le cache (recherche: {search}, genre: {genre})")
+            return cached_response
+        start_document_build()
+
         config = ConfigModel(**config_dict)
         language_filter = config.language if config.language != "Tout" else None
         client_ip = extract_client_ip(request)
@@ -489,7 +487,8 @@ async def animesama_catalog(request: Request, b64config: str = None, search: str
         else:
             logger.log("API", f"CATALOG - Retour de tous les {len(metas)} anime valides")
 
-        return {"metas": metas}
+        tags = [f"as:search:{search}"] if search else ["as:homepage"]
+        return cache_response(document_key, {"metas": metas}, tags, cacheable=bool(metas))
         
     except Exception as e:
         logger.error(f"Erreur dans le catalogue: {e}")
@@ -505,13 +504,22 @@ async def animesama_meta(request: Request, id: str, b64config: str = None, anime
 
     anime_slug = id.replace("as:", "")
 
+    # Configuration utilisateur
+    config_dict = validate_config(b64config) or {}
+
+    # Document déjà sérialisé pour cet anime et cette configuration
+    document_key = response_document_key(request, "meta", config_dict, id)
+    cached_response = await get_cached_response(document_key)
+    if cached_response is not None:
+        logger.log("PERFORMANCE", f"META - Document servi depuis le cache pour {anime_slug}")
+        return cached_response
+    start_document_build()
+
     anime_data = await get_or_fetch_anime_details(animesama_api.details, anime_slug)
 
     if not anime_data:
         return {"meta": {}}
 
-    # Configuration utilisateur
-    config_dict = validate_config(b64config) or {}
     config = ConfigModel(**config_dict)
     
     # Enrichir avec TMDB si activé
@@ -593,4 +601,4 @@ async def animesama_meta(request: Request, id: str, b64config: str = None, anime
     imdb_links = _build_imdb_link(enhanced_anime_data)  # Liens IMDB cliquables
     meta['links'] = genre_links + imdb_links  # Genres + IMDB
 
-    return {"meta": meta}
\ No newline at end of file
+    return cache_response(document_key, {"meta": meta}, [anime_tag(anime_slug)])
\ No newline at end of file
@@ -4,10 +4,12 @@ from astream.scrapers.animesama.client import AnimeSamaAPI
 from astream.scrapers.animesama.player import AnimeSamaPlayer
 from astream.scrapers.animesama.details import get_or_fetch_anime_details
 from astream.utils.logger import logger
+from astream.config.settings import settings
 from astream.utils.dependencies import get_animesama_api_dependency, get_animesama_player_dependency
 from astream.utils.validation.helpers import validate_config
 from astream.utils.parsers import MediaIdParser
 from astream.services.anime import AnimeSamaService
+from astream.utils.data.response_cache import response_document_key, get_cached_response, cache_response, anime_tag, start_document_build
 
 # Router pour les endpoints de streaming
 streams = APIRouter()
@@ -41,6 +43,14 @@ async def get_anime_stream(
     season_num = parsed['season_number']
     episode_num = parsed['episode_number']
     
+    # Document déjà sérialisé pour cet épisode et cette configuration
+    document_key = response_document_key(request, "stream", config, episode_id)
+    cached_response = await get_cached_response(document_key)
+    if cached_response is not None:
+        logger.log("PERFORMANCE", f"Flux servis depuis le cache de documents pour {episode_id}")
+        return cached_response
+    start_document_build()
+    
     try:
         # Récupérer données anime avec saisons
         anime_data = await get_or_fetch_anime_details(animesama_api.details, anime_slug)
@@ -89,7 +99,8 @@ async def get_anime_stream(
             streams = []
         
         logger.log("STREAM", f"{len(streams)} flux trouvés pour {episode_id}")
-        return {"streams": streams}
+        # URLs vidéo résolues : le document ne survit pas aux entrées as:video utilisées
+        return cache_response(document_key, {"streams": streams}, [anime_tag(anime_slug)], cacheable=bool(streams), ttl=settings.VIDEO_URL_TTL)
         
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des flux: {e}")
@@ -18,22 +18,60 @@ class AppSettings(BaseSettings):
     DATABASE_TYPE: Optional[str] = "sqlite"
     DATABASE_URL: Optional[str] = "username:password@hostname:port"
     DATABASE_PATH: Optional[str] = "data/astream.db"
+    CACHE_BACKEND: Optional[str] = "sql"
+    REDIS_URL: Optional[str] = "redis://localhost:6379/0"
+    REDIS_KEY_PREFIX: Optional[str] = "astream:"
     DATASET_ENABLED: Optional[bool] = True
     DATASET_URL: Optional[str] = None
     DATASET_UPDATE_INTERVAL: Optional[int] = 3600
     EPISODE_TTL: Optional[int] = 3600
+    VIDEO_URL_TTL: Optional[int] = 600
     DYNAMIC_LIST_TTL: Optional[int] = 3600
     PLANNING_TTL: Optional[int] = 3600
     ONGOING_ANIME_TTL: Optional[int] = 3600
     FINISHED_ANIME_TTL: Optional[int] = 604800
     SCRAPE_LOCK_TTL: Optional[int] = 300
     SCRAPE_WAIT_TIMEOUT: Optional[int] = 30
+    MEMORY_CACHE_MAX_ITEMS: Optional[int] = 1000
+    MEMORY_CACHE_MAX_TTL: Optional[int] = 60
+    RESPONSE_CACHE_MAX_ITEMS: Optional[int] = 500
+    RESPONSE_CACHE_TTL: Optional[int] = 60
+    STALE_CACHE_GRACE: Optional[int] = 86400
+    NOT_FOUND_TTL: Optional[int] = 900
+    PARTIAL_RESULT_TTL: Optional[int] = 300
+    UPSTREAM_ERROR_TTL: Optional[int] = 60
+    CACHE_TTL_JITTER: Optional[float] = 0.1
+    CACHE_EARLY_REFRESH: Optional[bool] = False
+    CACHE_EARLY_REFRESH_BETA: Optional[float] = 1.0
+    CACHE_CODEC: Optional[str] = "orjson"
+    CACHE_COMPRESSION_THRESHOLD: Optional[int] = 1024
+    CACHE_COMPRESSION_LEVEL: Optional[int] = 6
+    CACHE_PROJECTION_FAMILIES: Optional[str] = "as:homepage"
+    CACHE_SWEEP_INTERVAL: Optional[int] = 300
+    CACHE_SWEEP_BATCH_SIZE: Optional[int] = 500
+    CACHE_MAX_ROWS: Optional[int] = 0
+    CACHE_MAX_BYTES: Optional[int] = 0
+    CACHE_WRITE_BEHIND: Optional[bool] = False
+    CACHE_WRITE_BEHIND_INTERVAL_MS: Optional[int] = 500
+    CACHE_WRITE_BEHIND_MAX_ITEMS: Optional[int] = 100
+    CACHE_WARM_ON_STARTUP: Optional[bool] = False
+    CACHE_WARM_CONCURRENCY: Optional[int] = 2
+    CACHE_WARM_LOCK_TTL: Optional[int] = 3600
     RATE_LIMIT_PER_USER: Optional[float] = 1
     HTTP_TIMEOUT: Optional[int] = 15
+    HTTP_MAX_CONNECTIONS: Optional[int] = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: Optional[int] = 20
+    HTTP_KEEPALIVE_EXPIRY: Optional[float] = 30.0
+    HTTP2_ENABLED: Optional[bool] = False
+    HTTP_ADAPTIVE_CONCURRENCY: Optional[bool] = True
+    HTTP_HOST_CONCURRENCY_INITIAL: Optional[int] = 8
+    HTTP_HOST_CONCURRENCY_MIN: Optional[int] = 1
+    HTTP_HOST_CONCURRENCY_MAX: Optional[int] = 64
     PROXY_URL: Optional[str] = None
     PROXY_BYPASS_DOMAINS: Optional[str] = ""
     EXCLUDED_DOMAINS: Optional[str] = ""
     CUSTOM_HEADER_HTML: Optional[str] = None
+    ADMIN_TOKEN: Optional[str] = None
     LOG_LEVEL: Optional[str] = "DEBUG"
     TMDB_API_KEY: Optional[str] = None
     TMDB_TTL: Optional[int] = 604800
@@ -7,8 +7,9 @@ from urllib.parse import quote
 from difflib import SequenceMatcher
 
 from astream.utils.http.client import HttpClient
-from astream.utils.data.database import get_metadata_from_cache, set_metadata_to_cache
+from astream.utils.data.database import set_metadata_to_cache, set_metadata_many, get_cache_entry, get_cache_entries, CacheEntry, CacheOutcome
 from astream.utils.logger import logger
+from astream.utils.data.single_flight import single_flight
 from astream.config.settings import settings
 
 
@@ -208,21 +209,72 @@ class TMDBClient:
         self.api_key = api_key or settings.TMDB_API_KEY
         self.base_url = "https://api.themoviedb.org/3"
         self.image_base_url = "https://image.tmdb.org/t/p"
-        
+        self._prefetched: Dict[str, CacheEntry] = {}
+        self._pending_writes: Optional[List[tuple]] = None
+
+    @staticmethod
+    def search_cache_key(title: str) -> str:
+        """Clé de cache d'une recherche TMDB."""
+        return f"tmdb:search:{title.lower()}"
+
+    async def prefetch(self, cache_keys: List[str]) -> None:
+        """Précharge plusieurs entrées de cache en une seule lecture."""
+        missing_keys = [key for key in cache_keys if key not in self._prefetched]
+        if missing_keys:
+            self._prefetched.update(await get_cache_entries(missing_keys))
+
+    def get_prefetched(self, cache_key: str) -> Optional[CacheEntry]:
+        """Retourne une entrée préchargée (None si absente)."""
+        return self._prefetched.get(cache_key)
+
+    def begin_batch(self) -> None:
+        """Regroupe les écritures de cache jusqu'au prochain flush_batch()."""
+        if self._pending_writes is None:
+            self._pending_writes = []
+
+    async def flush_batch(self) -> None:
+        """Écrit les entrées regroupées dans une seule transaction."""
+        pending_writes, self._pending_writes = self._pending_writes, None
+        if pending_writes:
+            await set_metadata_many(pending_writes)
+            logger.log("TMDB", f"Cache TMDB: {len(pending_writes)} entrées écrites en lot")
+
+    async def _get_cache_entry(self, cache_key: str) -> Optional[CacheEntry]:
+        """Lit une entrée de cache en privilégiant le préchargement."""
+        if cache_key in self._prefetched:
+            return self._prefetched[cache_key]
+        return await get_cache_entry(cache_key)
+
+    async def _set_cache(self, cache_key: str, data, ttl: int = None, outcome: CacheOutcome = CacheOutcome.FOUND) -> None:
+        """Écrit une entrée de cache, immédiatement ou en lot."""
+        if self._pending_writes is None:
+            await set_metadata_to_cache(cache_key, data, ttl, outcome)
+        else:
+            self._pending_writes.append((cache_key, data, ttl, outcome))
+
     async def search_anime(self, title: str) -> Optional[Dict[str, Any]]:
         """Recherche un anime sur TMDB dans le genre Animation uniquement."""
-        cache_key = f"tmdb:search:{title.lower()}"
+        cache_key = self.search_cache_key(title)
         
-        # Vérifier le cache
-        cached_data = await get_metadata_from_cache(cache_key)
-        if cached_data:
-            logger.log("TMDB", f"Cache hit pour recherche: {title}")
-            return cached_data
+        # Vérifier le cache (y compris les recherches sans résultat)
+        cached_entry = await self._get_cache_entry(cache_key)
+        if cached_entry:
+            if cached_entry.is_negative:
+                logger.log("TMDB", f"Cache négatif pour recherche: {title} ({cached_entry.outcome.value})")
+                return None
+            if cached_entry.data:
+                logger.log("TMDB", f"Cache hit pour recherche: {title}")
+                return cached_entry.data
         
         if not self.api_key:
             logger.warning("Aucune clé API TMDB configurée")
             return None
-            
+
+        # Recherches identiques simultanées dans ce worker : une seule série de requêtes TMDB
+        return await single_flight.run(cache_key, lambda: self._search_anime_upstream(title, cache_key))
+
+    async def _search_anime_upstream(self, title: str, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Interroge TMDB (séries puis films d'animation) et met le résultat en cache."""
         try:
             # Recherche STRICTE - Animation UNIQUEMENT
             url = f"{self.base_url}/search/tv"
@@ -235,6 +287,7 @@ class TMDBClient:
             response = await self.client.get(url, params=params)
             data = response.json()
             if not data or "results" not in data:
+                await self._set_cache(cache_key, {}, outcome=CacheOutcome.UPSTREAM_ERROR)
                 return None
                 
             results = data["results"]
@@ -270,12 +323,14 @@ class TMDBClient:
                 
                 if not animation_results:
                     logger.log("TMDB", f"Aucun anime/film d'animation trouvé pour: {title}")
+                    await self._set_cache(cache_key, {}, outcome=CacheOutcome.NOT_FOUND)
                     return None
             
             # SYSTÈME DE MATCHING INTELLIGENT AVANCÉ
             best_match = await find_best_match(title, animation_results, self)
             if not best_match:
                 logger.log("TMDB", f"Aucun match satisfaisant trouvé pour: {title}")
+                await self._set_cache(cache_key, {}, outcome=CacheOutcome.NOT_FOUND)
                 return None
             
             final_display_name = best_match.get("name") or best_match.get("title", "")
@@ -289,11 +344,12 @@ class TMDBClient:
                 best_match["media_type"] = "movie"
             
             # Mettre en cache pour 7 jours
-            await set_metadata_to_cache(cache_key, best_match, settings.TMDB_TTL)
+            await self._set_cache(cache_key, best_match, settings.TMDB_TTL)
             return best_match
             
         except Exception as e:
             logger.error(f"Erreur recherche TMDB pour '{title}': {e}")
+            await self._set_cache(cache_key, {}, outcome=CacheOutcome.UPSTREAM_ERROR)
             return None
     
     async def get_anime_details(self, tmdb_id: int, media_type: str = "tv") -> Optional[Dict[str, Any]]:
@@ -301,7 +357,8 @@ class TMDBClient:
         cache_key = f"tmdb:{tmdb_id}"
         
         # Vérifier le cache
-        cached_data = await get_metadata_from_cache(cache_key)
+        cached_entry = await self._get_cache_entry(cache_key)
+        cached_data = cached_entry.data if cached_entry else None
         if cached_data:
             logger.log("TMDB", f"Cache hit pour détails: {tmdb_id}")
             return cached_data
@@ -330,7 +387,7 @@ class TMDBClient:
             logger.log("TMDB", f"Détails récupérés pour ID: {tmdb_id}")
             
             # Mettre en cache pour 7 jours
-            await set_metadata_to_cache(cache_key, data, settings.TMDB_TTL)
+            await self._set_cache(cache_key, data, settings.TMDB_TTL)
             return data
             
         except Exception as e:
@@ -342,7 +399,8 @@ class TMDBClient:
         cache_key = f"tmdb:{tmdb_id}:s{season_number}"
         
         # Vérifier le cache
-        cached_data = await get_metadata_from_cache(cache_key)
+        cached_entry = await self._get_cache_entry(cache_key)
+        cached_data = cached_entry.data if cached_entry else None
         if cached_data:
             logger.log("TMDB", f"Cache hit pour saison: {tmdb_id}:S{season_number}")
             return cached_data
@@ -365,7 +423,7 @@ class TMDBClient:
             logger.log("TMDB", f"Saison récupérée: {tmdb_id}:S{season_number}")
             
             # Mettre en cache pour 7 jours
-            await set_metadata_to_cache(cache_key, data, settings.TMDB_TTL)
+            await self._set_cache(cache_key, data, settings.TMDB_TTL)
             return data
             
         except Exception as e:
@@ -23,12 +23,12 @@ class TMDBService:
         
         return TMDBClient(self.http_client, api_key)
     
-    async def enhance_anime_metadata(self, anime_data: Dict[str, Any], config: ConfigModel) -> Dict[str, Any]:
+    async def enhance_anime_metadata(self, anime_data: Dict[str, Any], config: ConfigModel, tmdb_client: Optional[TMDBClient] = None) -> Dict[str, Any]:
         """Enrichit les métadonnées anime avec TMDB si activé."""
         if not config.tmdbEnabled:
             return anime_data
             
-        tmdb_client = self._get_tmdb_client(config)
+        tmdb_client = tmdb_client or self._get_tmdb_client(config)
         if not tmdb_client:
             logger.log("TMDB", "Aucune clé API TMDB disponible")
             return anime_data
@@ -267,6 +267,43 @@ class TMDBService:
             logger.error(f"Erreur enrichissement TMDB pour '{title}': {e}")
             return anime_data
     
+    async def enhance_catalog_metadata(self, anime_list: List[Dict[str, Any]], config: ConfigModel) -> List[Dict[str, Any]]:
+        """Enrichit un catalogue complet avec lectures et écritures de cache groupées."""
+        if not config.tmdbEnabled:
+            return anime_list
+
+        tmdb_client = self._get_tmdb_client(config)
+        if not tmdb_client:
+            logger.log("TMDB", "Aucune clé API TMDB disponible")
+            return anime_list
+
+        # Précharger recherches puis détails en une lecture par étape
+        search_keys = []
+        for anime in anime_list:
+            title = anime.get("title", anime.get("name", ""))
+            if title:
+                search_keys.append(TMDBClient.search_cache_key(self._clean_title_for_search(title)))
+        await tmdb_client.prefetch(search_keys)
+
+        details_keys = []
+        for search_key in search_keys:
+            search_entry = tmdb_client.get_prefetched(search_key)
+            if search_entry and not search_entry.is_negative and search_entry.data and search_entry.data.get("id"):
+                details_keys.append(f"tmdb:{search_entry.data['id']}")
+        await tmdb_client.prefetch(details_keys)
+
+        tmdb_client.begin_batch()
+        try:
+            tasks = [self.enhance_anime_metadata(anime, config, tmdb_client) for anime in anime_list]
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            await tmdb_client.flush_batch()
+
+        return [
+            result if not isinstance(result, Exception) else anime_list[i]
+            for i, result in enumerate(results)
+        ]
+
     async def enhance_episodes_metadata(self, anime_data: Dict[str, Any], config: ConfigModel) -> Dict[str, Any]:
         """Enrichit les métadonnées des épisodes avec TMDB."""
         if not config.tmdbEnabled:
@@ -15,17 +15,24 @@ from starlette.requests import Request
 
 from astream.api.core import main as core_router
 from astream.api.stream import streams as stream_router
+from astream.api.admin import admin as admin_router
 from astream.config.settings import settings
 from astream.utils.data.database import (
     setup_database,
     teardown_database,
     cleanup_expired_locks,
+    cleanup_expired_cache,
+    run_write_behind_flusher,
+    stop_write_behind_flusher,
+    flush_pending_writes,
+    run_background_migrations,
 )
 from astream.utils.dependencies import set_global_http_client
 from astream.utils.http.client import HttpClient
 from astream.utils.logger import logger
 from astream.utils.errors.handler import global_exception_handler
 from astream.utils.data.loader import DatasetLoader, set_dataset_loader
+from astream.warm import warm_cache
 
 
 class LoguruMiddleware(BaseHTTPMiddleware):
@@ -79,16 +86,37 @@ async def lifespan(app: FastAPI):
         raise RuntimeError(f"L'initialisation a échoué : {e}")
 
     cleanup_task = asyncio.create_task(cleanup_expired_locks())
+    cache_sweeper_task = asyncio.create_task(cleanup_expired_cache())
+    migration_task = asyncio.create_task(run_background_migrations())
+    write_behind_task = asyncio.create_task(run_write_behind_flusher()) if settings.CACHE_WRITE_BEHIND else None
+    warm_task = asyncio.create_task(warm_cache(app.state.http_client)) if settings.CACHE_WARM_ON_STARTUP else None
 
     try:
         yield
     finally:
         cleanup_task.cancel()
+        cache_sweeper_task.cancel()
+        migration_task.cancel()
+        background_tasks = [cleanup_task, cache_sweeper_task, migration_task]
+        if warm_task:
+            warm_task.cancel()
+            background_tasks.append(warm_task)
 
         try:
-            await asyncio.gather(cleanup_task, return_exceptions=True)
+            await asyncio.gather(*background_tasks, return_exceptions=True)
         except asyncio.CancelledError:
             pass
+
+        if write_behind_task:
+            # Laisser l'écriture en cours se terminer (une annulation la perdrait) puis vider le reste
+            stop_write_behind_flusher()
+            await asyncio.gather(write_behind_task, return_exceptions=True)
+            try:
+                flushed = await flush_pending_writes()
+                if flushed:
+                    logger.log("DATABASE", f"File d'écriture différée vidée: {flushed} entrées")
+            except Exception as e:
+                logger.error(f"Échec écriture de la file différée à l'arrêt: {e}")
         
         await app.state.http_client.close()
         await teardown_database()
@@ -121,6 +149,7 @@ else:
 
 app.include_router(core_router)
 app.include_router(stream_router)
+app.include_router(admin_router)
 
 
 class Server(uvicorn.Server):
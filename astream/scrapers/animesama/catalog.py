@@ -1,4 +1,5 @@
 from typing import List, Optional, Dict, Any
+import time
 import asyncio
 from urllib.parse import quote
 from bs4 import BeautifulSoup
@@ -6,7 +7,7 @@ from bs4 import BeautifulSoup
 from astream.utils.http.client import HttpClient
 from astream.utils.logger import logger
 from astream.scrapers.base import BaseScraper
-from astream.utils.data.database import get_metadata_from_cache, set_metadata_to_cache
+from astream.utils.data.database import get_metadata_from_cache, set_metadata_to_cache, get_cache_entry, schedule_background_refresh, is_refresh_due, CacheOutcome, DistributedLock, LockAcquisitionError
 from astream.config.settings import settings
 from astream.scrapers.animesama.parser import (
     parse_anime_card,
@@ -27,13 +28,32 @@ class AnimeSamaCatalog(BaseScraper):
     async def get_homepage_content(self) -> List[Dict[str, Any]]:
         """Récupère le contenu de la page d'accueil anime-sama."""
         cache_key = "as:homepage"
-        cached_data = await get_metadata_from_cache(cache_key)
-        if cached_data:
-            logger.log("DATABASE", f"Cache hit {cache_key} - Contenu homepage récupéré")
-            return cached_data.get("anime", [])
+        cached_entry = await get_cache_entry(cache_key, allow_stale=True)
+        if cached_entry and cached_entry.data:
+            if is_refresh_due(cached_entry):
+                schedule_background_refresh(cache_key, lambda: self._refresh_homepage_content(cached_entry.created_at))
+            if not cached_entry.is_stale:
+                logger.log("DATABASE", f"Cache hit {cache_key} - Contenu homepage récupéré")
+            return cached_entry.data.get("anime", [])
         
         logger.log("DATABASE", f"Cache miss {cache_key} - Scraping homepage complet")
-        
+        return await self._fetch_homepage_content()
+
+    async def _refresh_homepage_content(self, served_created_at: float) -> None:
+        """Rafraîchit en arrière-plan la homepage servie (sauf si une autre instance l'a déjà fait)."""
+        try:
+            async with DistributedLock("homepage_fetch"):
+                cached_entry = await get_cache_entry("as:homepage")
+                if cached_entry and cached_entry.created_at > served_created_at:
+                    return
+                await self._fetch_homepage_content()
+        except LockAcquisitionError:
+            logger.debug("Rafraîchissement as:homepage ignoré - verrou détenu")
+
+    async def _fetch_homepage_content(self) -> List[Dict[str, Any]]:
+        """Scrape la homepage complète et la met en cache."""
+        cache_key = "as:homepage"
+        fetch_start = time.perf_counter()
         try:
             logger.log("ANIMESAMA", "Récupération complète de la homepage")
             response = await self._rate_limited_request('get', f"{self.base_url}/")
@@ -65,7 +85,7 @@ class AnimeSamaCatalog(BaseScraper):
                 all_anime = await self._enhance_anime_with_languages(all_anime)
             
             cache_data = {"anime": all_anime, "total": len(all_anime)}
-            await set_metadata_to_cache(cache_key, cache_data)
+            await set_metadata_to_cache(cache_key, cache_data, compute_time=time.perf_counter() - fetch_start)
             logger.log("DATABASE", f"Cache set {cache_key} - {len(all_anime)} anime")
             
             return all_anime
@@ -87,6 +107,7 @@ class AnimeSamaCatalog(BaseScraper):
         
         try:
             all_results = []
+            failed_searches = 0
             
             types_to_search = ["Anime", "Film"]
             
@@ -117,6 +138,7 @@ class AnimeSamaCatalog(BaseScraper):
                 
                 except Exception as e:
                     logger.warning(f"ANIMESAMA: Erreur recherche {content_type}: {e}")
+                    failed_searches += 1
                     continue
             
             logger.info(f"Trouvé {len(all_results)} résultats pour '{query}'")
@@ -124,13 +146,19 @@ class AnimeSamaCatalog(BaseScraper):
             if all_results and self._detect_all_languages_in_catalog:
                 all_results = await self._enhance_anime_with_languages(all_results)
             
-            # Ne mettre en cache que si on a des résultats
-            if all_results:
-                cache_data = {"results": all_results, "query": query, "total_found": len(all_results)}
-                await set_metadata_to_cache(cache_key, cache_data)
-                logger.log("DATABASE", f"Cache set {cache_key} - {len(all_results)} résultats")
+            # Qualifier le résultat pour appliquer un TTL adapté (résultats vides ou échecs = TTL court)
+            if failed_searches == len(types_to_search):
+                outcome = CacheOutcome.UPSTREAM_ERROR
+            elif failed_searches:
+                outcome = CacheOutcome.PARTIAL
+            elif all_results:
+                outcome = CacheOutcome.FOUND
             else:
-                logger.log("DATABASE", f"Pas de cache pour {cache_key} - 0 résultats")
+                outcome = CacheOutcome.NOT_FOUND
+            
+            cache_data = {"results": all_results, "query": query, "total_found": len(all_results)}
+            await set_metadata_to_cache(cache_key, cache_data, outcome=outcome)
+            logger.log("DATABASE", f"Cache set {cache_key} - {len(all_results)} résultats ({outcome.value})")
             
             return all_results
             
@@ -1,10 +1,13 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+import time
+import httpx
 from bs4 import BeautifulSoup
 
 from astream.utils.http.client import HttpClient
 from astream.utils.logger import logger
 from astream.scrapers.base import BaseScraper
-from astream.utils.data.database import get_metadata_from_cache, set_metadata_to_cache, DistributedLock, LockAcquisitionError
+from astream.utils.data.database import set_metadata_to_cache, get_cache_entry, schedule_background_refresh, is_refresh_due, CacheOutcome, DistributedLock, LockAcquisitionError, LockHolderError
+from astream.utils.data.single_flight import single_flight
 from astream.config.settings import settings
 from astream.scrapers.animesama.parser import (
     parse_anime_details_from_html,
@@ -23,22 +26,25 @@ class AnimeSamaDetails(BaseScraper):
     async def get_anime_details(self, anime_slug: str) -> Optional[Dict[str, Any]]:
         """Récupère les détails d'un anime par slug."""
         try:
-            logger.debug(f"ANIMESAMA: Récupération détails pour {anime_slug}")
-            response = await self._rate_limited_request('get', f"{self.base_url}/catalogue/{anime_slug}/")
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            anime_data = parse_anime_details_from_html(soup, anime_slug)
-            
-            anime_data["languages"] = parse_languages_from_html(response.text)
-            
-            return anime_data
-            
+            return await self._fetch_anime_details(anime_slug)
         except Exception as e:
             logger.error(f"ANIMESAMA: Échec détails pour {anime_slug}: {e}")
             return None
 
+    async def _fetch_anime_details(self, anime_slug: str) -> Dict[str, Any]:
+        """Récupère les détails d'un anime en propageant les erreurs HTTP."""
+        logger.debug(f"ANIMESAMA: Récupération détails pour {anime_slug}")
+        response = await self._rate_limited_request('get', f"{self.base_url}/catalogue/{anime_slug}/")
+        response.raise_for_status()
+        
+        soup = BeautifulSoup(response.text, 'html.parser')
+        
+        anime_data = parse_anime_details_from_html(soup, anime_slug)
+        
+        anime_data["languages"] = parse_languages_from_html(response.text)
+        
+        return anime_data
+
     async def get_seasons(self, anime_slug: str) -> List[Dict[str, Any]]:
         """Récupère les saisons disponibles."""
         try:
@@ -80,45 +86,105 @@ class AnimeSamaDetails(BaseScraper):
 
     async def fetch_complete_anime_data(self, anime_slug: str) -> Optional[Dict[str, Any]]:
         """Récupère données complètes d'un anime."""
-        anime_data = await self.get_anime_details(anime_slug)
+        anime_data, _ = await self.fetch_complete_anime_data_with_outcome(anime_slug)
+        return anime_data
+
+    async def fetch_complete_anime_data_with_outcome(self, anime_slug: str) -> Tuple[Optional[Dict[str, Any]], CacheOutcome]:
+        """Récupère données complètes d'un anime et qualifie le résultat (introuvable, erreur)."""
+        try:
+            anime_data = await self._fetch_anime_details(anime_slug)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                logger.warning(f"ANIMESAMA: Anime introuvable {anime_slug}")
+                return None, CacheOutcome.NOT_FOUND
+            logger.error(f"ANIMESAMA: Échec détails pour {anime_slug}: {e}")
+            return None, CacheOutcome.UPSTREAM_ERROR
+        except Exception as e:
+            logger.error(f"ANIMESAMA: Échec détails pour {anime_slug}: {e}")
+            return None, CacheOutcome.UPSTREAM_ERROR
+
         if not anime_data:
-            return None
+            return None, CacheOutcome.NOT_FOUND
         
         seasons = await self.get_seasons(anime_slug)
         anime_data["seasons"] = seasons
         
-        return anime_data
+        return anime_data, CacheOutcome.FOUND
 
 
 async def get_or_fetch_anime_details(animesama_details: AnimeSamaDetails, anime_slug: str) -> Optional[Dict[str, Any]]:
     """Obtient les détails d'un anime depuis le cache ou par récupération."""
     cache_id = f"as:{anime_slug}"
-    cached_anime = await get_metadata_from_cache(cache_id)
+    cached_entry = await get_cache_entry(cache_id, allow_stale=True)
 
-    if cached_anime:
-        logger.log("DATABASE", f"Cache hit {cache_id}")
-        return cached_anime
+    if cached_entry:
+        if cached_entry.is_negative and not cached_entry.is_stale:
+            logger.log("DATABASE", f"Cache négatif {cache_id} ({cached_entry.outcome.value})")
+            return None
+        if not cached_entry.is_negative and cached_entry.data:
+            if is_refresh_due(cached_entry):
+                schedule_background_refresh(cache_id, lambda: _refresh_anime_details(animesama_details, anime_slug, cached_entry.created_at))
+            if not cached_entry.is_stale:
+                logger.log("DATABASE", f"Cache hit {cache_id}")
+            return cached_entry.data
 
+    # Demandes simultanées du même anime dans ce worker : un seul fetch (et une seule attente de verrou)
+    return await single_flight.run(cache_id, lambda: _fetch_anime_details_with_lock(animesama_details, anime_slug))
+
+
+async def _fetch_anime_details_with_lock(animesama_details: AnimeSamaDetails, anime_slug: str) -> Optional[Dict[str, Any]]:
+    """Récupère les détails sous verrou distribué ; les instances en attente reçoivent le résultat du détenteur."""
+    cache_id = f"as:{anime_slug}"
     lock_key = f"metadata_fetch_{anime_slug}"
-    try:
-        async with DistributedLock(lock_key):
-            cached_anime = await get_metadata_from_cache(cache_id)
-            if cached_anime:
-                logger.log("DATABASE", f"Cache hit après acquisition du verrou {cache_id}")
-                return cached_anime
 
-            logger.log("DATABASE", f"Cache miss {cache_id} - Fetch avec verrou")
-            anime_data = await animesama_details.fetch_complete_anime_data(anime_slug)
-            if anime_data:
-                await set_metadata_to_cache(cache_id, anime_data)
-            return anime_data
-            
+    async def fetch_if_missing() -> Optional[Dict[str, Any]]:
+        cached_entry = await get_cache_entry(cache_id)
+        if cached_entry:
+            logger.log("DATABASE", f"Cache hit après acquisition du verrou {cache_id}")
+            return None if cached_entry.is_negative else cached_entry.data
+
+        logger.log("DATABASE", f"Cache miss {cache_id} - Fetch avec verrou")
+        return await _fetch_and_cache_anime_details(animesama_details, anime_slug)
+
+    try:
+        return await DistributedLock(lock_key).run(fetch_if_missing)
+    except LockHolderError as e:
+        logger.warning(f"DATABASE: {e}")
+        return None
     except LockAcquisitionError:
         logger.warning(f"DATABASE: Verrou impossible {anime_slug}, tentative sans verrou")
-        anime_data = await animesama_details.fetch_complete_anime_data(anime_slug)
-        if anime_data:
-            await set_metadata_to_cache(cache_id, anime_data)
-        return anime_data
+        return await _fetch_and_cache_anime_details(animesama_details, anime_slug)
     except Exception as e:
         logger.error(f"ANIMESAMA: Erreur inattendue détails {anime_slug}: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+async def _fetch_and_cache_anime_details(animesama_details: AnimeSamaDetails, anime_slug: str) -> Optional[Dict[str, Any]]:
+    """Récupère les détails d'un anime et met en cache le résultat, y compris négatif."""
+    cache_id = f"as:{anime_slug}"
+    fetch_start = time.perf_counter()
+    anime_data, outcome = await animesama_details.fetch_complete_anime_data_with_outcome(anime_slug)
+    if anime_data:
+        await set_metadata_to_cache(cache_id, anime_data, compute_time=time.perf_counter() - fetch_start)
+    else:
+        await set_metadata_to_cache(cache_id, {}, outcome=outcome)
+        logger.log("DATABASE", f"Cache négatif set {cache_id} ({outcome.value})")
+    return anime_data
+
+
+async def _refresh_anime_details(animesama_details: AnimeSamaDetails, anime_slug: str, served_created_at: float) -> None:
+    """Rafraîchit en arrière-plan les détails d'un anime servis (sauf si une autre instance l'a déjà fait)."""
+    cache_id = f"as:{anime_slug}"
+    try:
+        async with DistributedLock(f"metadata_fetch_{anime_slug}"):
+            cached_entry = await get_cache_entry(cache_id)
+            if cached_entry and cached_entry.created_at > served_created_at:
+                return
+
+            fetch_start = time.perf_counter()
+            anime_data = await animesama_details.fetch_complete_anime_data(anime_slug)
+            if anime_data:
+                await set_metadata_to_cache(cache_id, anime_data, compute_time=time.perf_counter() - fetch_start)
+                logger.log("DATABASE", f"Cache rafraîchi {cache_id}")
+    except LockAcquisitionError:
+        logger.debug(f"Rafraîchissement {cache_id} ignoré - verrou détenu")
@@ -1,11 +1,14 @@
 import re
 import asyncio
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from urllib.parse import urljoin
 
+import httpx
+
 from astream.utils.logger import logger
 from astream.scrapers.base import BaseScraper
-from astream.utils.data.database import get_metadata_from_cache, set_metadata_to_cache
+from astream.utils.data.database import get_episode_players, set_episode_players, CacheOutcome
+from astream.utils.data.single_flight import single_flight
 from astream.config.settings import settings
 from astream.scrapers.animesama.helpers import extract_episodes_from_js
 
@@ -18,13 +21,18 @@ class AnimeSamaPlayerExtractor(BaseScraper):
 
     async def extract_player_urls_smart_mapping_with_language(self, anime_slug: str, season_data: Dict[str, Any], episode_number: int, language_filter: Optional[str] = None, config: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Extrait les URLs de players avec mapping intelligent."""
+        player_urls, _ = await self.extract_player_urls_with_outcome(anime_slug, season_data, episode_number, language_filter, config)
+        return player_urls
+
+    async def extract_player_urls_with_outcome(self, anime_slug: str, season_data: Dict[str, Any], episode_number: int, language_filter: Optional[str] = None, config: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], CacheOutcome]:
+        """Extrait les URLs de players avec mapping intelligent et qualifie le résultat du scraping."""
         season_num = season_data.get('season_number')
         cache_key = f"as:{anime_slug}:s{season_num}e{episode_number}"
         
-        cached_players = await get_metadata_from_cache(cache_key)
-        if cached_players:
+        cached_entry = await get_episode_players(anime_slug, season_num, episode_number)
+        if cached_entry is not None:
             logger.log("DATABASE", f"Cache hit {cache_key} - Players récupérés")
-            player_urls = cached_players.get("player_urls", [])
+            player_urls = cached_entry.data
             
             # Filtrer selon language_filter puis réorganiser si nécessaire
             filtered_urls = self._filter_by_language(player_urls, language_filter)
@@ -34,51 +42,23 @@ class AnimeSamaPlayerExtractor(BaseScraper):
                 if user_language_order != "VOSTFR,VF":
                     filtered_urls = self._reorder_by_user_preference(filtered_urls, user_language_order)
             
-            return filtered_urls
+            return filtered_urls, cached_entry.outcome
         
         logger.log("DATABASE", f"Cache miss {cache_key} - Extraction players")
         
         try:
             logger.debug(f"Mapping intelligent épisode {episode_number} {anime_slug} S{season_data.get('season_number')}")
             
-            available_languages = season_data.get("languages", ["vostfr"])
-            
             # Stocker l'ordre utilisateur pour réorganisation finale
             user_language_order = "VOSTFR,VF"
             if config and "languageOrder" in config:
                 user_language_order = config["languageOrder"]
             
-            # TOUJOURS extraire toutes les langues pour le cache unique
-            languages_to_check = ["vostfr", "vf", "vf1", "vf2"]
-            
-            
-            player_urls_with_language = []
-            
-            for language in languages_to_check:
-                try:
-                    urls = await self._extract_from_single_season(anime_slug, season_data, episode_number, language, config)
-                    
-                    for url in urls:
-                        player_urls_with_language.append({
-                            "url": url,
-                            "language": language
-                        })
-                        
-                except Exception as e:
-                    logger.warning(f"Erreur extraction langue {language}: {e}")
-                    continue
-            
-            # Stocker en cache dans l'ordre STANDARD (pas réorganisé)
-            cache_data = {
-                "player_urls": player_urls_with_language,
-                "anime_slug": anime_slug,
-                "season": season_num,
-                "episode": episode_number,
-                "language_filter": language_filter,
-                "total_players": len(player_urls_with_language)
-            }
-            await set_metadata_to_cache(cache_key, cache_data, ttl=settings.EPISODE_TTL)
-            logger.log("DATABASE", f"Cache set {cache_key} - {len(player_urls_with_language)} players")
+            # Extractions simultanées du même épisode dans ce worker : un seul scraping partagé
+            player_urls_with_language, outcome = await single_flight.run(
+                f"scrape:{cache_key}",
+                lambda: self._scrape_and_cache_players(anime_slug, season_data, episode_number, config)
+            )
             
             # Filtrer selon language_filter puis réorganiser si nécessaire
             filtered_urls = self._filter_by_language(player_urls_with_language, language_filter)
@@ -86,11 +66,48 @@ class AnimeSamaPlayerExtractor(BaseScraper):
             if (not language_filter or language_filter == "Tout") and user_language_order != "VOSTFR,VF":
                 filtered_urls = self._reorder_by_user_preference(filtered_urls, user_language_order)
             
-            return filtered_urls
+            return filtered_urls, outcome
             
         except Exception as e:
             logger.error(f"Erreur mapping intelligent: {e}")
-            return []
+            return [], CacheOutcome.UPSTREAM_ERROR
+
+    async def _scrape_and_cache_players(self, anime_slug: str, season_data: Dict[str, Any], episode_number: int, config: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], CacheOutcome]:
+        """Scrape les players de toutes les langues d'un épisode et les met en cache dans l'ordre standard."""
+        season_num = season_data.get('season_number')
+        cache_key = f"as:{anime_slug}:s{season_num}e{episode_number}"
+        
+        # TOUJOURS extraire toutes les langues pour le cache unique
+        languages_to_check = ["vostfr", "vf", "vf1", "vf2"]
+        
+        player_urls_with_language = []
+        failed_languages = 0
+        
+        for language in languages_to_check:
+            try:
+                urls = await self._extract_from_single_season(anime_slug, season_data, episode_number, language, config)
+                
+                for url in urls:
+                    player_urls_with_language.append({
+                        "url": url,
+                        "language": language,
+                        "source": "animesama"
+                    })
+                    
+            except Exception as e:
+                logger.warning(f"Erreur extraction langue {language}: {e}")
+                failed_languages += 1
+                continue
+        
+        if failed_languages:
+            outcome = CacheOutcome.PARTIAL if player_urls_with_language else CacheOutcome.UPSTREAM_ERROR
+        else:
+            outcome = CacheOutcome.FOUND if player_urls_with_language else CacheOutcome.NOT_FOUND
+        
+        # Stocker en cache dans l'ordre STANDARD (pas réorganisé)
+        await set_episode_players(anime_slug, season_num, episode_number, player_urls_with_language, outcome)
+        logger.log("DATABASE", f"Cache set {cache_key} - {len(player_urls_with_language)} players ({outcome.value})")
+        return player_urls_with_language, outcome
 
     def _filter_by_language(self, player_urls_with_language, language_filter):
         """Filtre les player URLs selon le language_filter demandé."""
@@ -189,9 +206,16 @@ class AnimeSamaPlayerExtractor(BaseScraper):
             
             return episode_urls
             
+        except httpx.HTTPStatusError as e:
+            # Une langue absente (404) n'est pas une erreur de scraping
+            if e.response.status_code == 404:
+                logger.debug(f"Langue {language} indisponible pour {anime_slug}")
+                return []
+            logger.error(f"Erreur extraction: {e}")
+            raise
         except Exception as e:
             logger.error(f"Erreur extraction: {e}")
-            return []
+            raise
 
     async def _extract_from_episodes_js(self, season_url: str, html: str, episode_number: int) -> List[str]:
         """Extrait les URLs d'épisode depuis le fichier episodes.js."""
@@ -5,7 +5,9 @@ from urllib.parse import urljoin, urlparse
 
 from astream.utils.logger import logger
 from astream.scrapers.base import BaseScraper
-from astream.utils.data.database import get_metadata_from_cache, set_metadata_to_cache
+from astream.utils.data.database import get_metadata_from_cache, set_metadata_to_cache, CacheOutcome, DistributedLock, LockAcquisitionError, LockHolderError
+from astream.utils.data.backends.base import get_video_cache_id
+from astream.utils.data.single_flight import single_flight
 from astream.config.settings import settings
 from astream.scrapers.animesama.helpers import extract_video_urls_from_text
 
@@ -26,26 +28,9 @@ class AnimeSamaVideoResolver(BaseScraper):
                 player_url = player_data["url"]
                 language = player_data["language"]
                 
+                found_urls = await self._get_or_resolve_player_url(player_url)
                 
-                if 'sibnet.ru' in player_url:
-                    sibnet_url = await self._extract_sibnet_real_url(player_url)
-                    if sibnet_url:
-                        return [{"url": sibnet_url, "language": language}]
-                    else:
-                        logger.warning(f"Impossible extraire URL Sibnet depuis {player_url}")
-                        return []
-                
-                response = await self.client.get(player_url)
-                response.raise_for_status()
-                player_html = response.text
-                
-                found_urls = self._extract_video_urls_from_html(player_html, player_url)
-                
-                results = []
-                for url in found_urls:
-                    results.append({"url": url, "language": language})
-                
-                return results
+                return [{"url": url, "language": language} for url in found_urls]
                 
             except Exception as e:
                 logger.warning(f"Échec visite {player_data['url']}: {e}")
@@ -77,6 +62,54 @@ class AnimeSamaVideoResolver(BaseScraper):
         logger.info(f"SUCCESS: Extrait {len(final_urls_with_language)} URLs vidéo uniques")
         return final_urls_with_language
 
+    async def _get_or_resolve_player_url(self, player_url: str) -> List[str]:
+        """Retourne les URLs vidéo d'un player depuis le cache partagé, sinon les résout une seule fois."""
+        cache_id = get_video_cache_id(player_url)
+        cached_urls = await get_metadata_from_cache(cache_id)
+        if cached_urls is not None:
+            return cached_urls
+        
+        # Même player visité simultanément par plusieurs requêtes : une seule résolution
+        return await single_flight.run(cache_id, lambda: self._resolve_player_url_with_lock(player_url, cache_id))
+
+    async def _resolve_player_url_with_lock(self, player_url: str, cache_id: str) -> List[str]:
+        """Résout un player sous verrou distribué ; les instances en attente reçoivent le résultat du détenteur."""
+        async def resolve_if_missing() -> List[str]:
+            cached_urls = await get_metadata_from_cache(cache_id)
+            if cached_urls is not None:
+                logger.log("DATABASE", f"Cache hit après acquisition du verrou {cache_id}")
+                return cached_urls
+            return await self._resolve_and_cache_player_url(player_url, cache_id)
+        
+        try:
+            return await DistributedLock(f"video_resolve_{cache_id.rsplit(':', 1)[1]}").run(resolve_if_missing)
+        except LockHolderError as e:
+            logger.warning(f"DATABASE: {e}")
+            return []
+        except LockAcquisitionError:
+            logger.warning(f"DATABASE: Verrou impossible {cache_id}, résolution sans verrou")
+            return await self._resolve_and_cache_player_url(player_url, cache_id)
+
+    async def _resolve_and_cache_player_url(self, player_url: str, cache_id: str) -> List[str]:
+        """Résout un player et publie le résultat (un résultat vide n'est conservé que brièvement)."""
+        found_urls = await self._resolve_player_url(player_url)
+        outcome = CacheOutcome.FOUND if found_urls else CacheOutcome.UPSTREAM_ERROR
+        await set_metadata_to_cache(cache_id, found_urls, ttl=settings.VIDEO_URL_TTL, outcome=outcome)
+        return found_urls
+
+    async def _resolve_player_url(self, player_url: str) -> List[str]:
+        """Visite un player et retourne les URLs vidéo trouvées."""
+        if 'sibnet.ru' in player_url:
+            sibnet_url = await self._extract_sibnet_real_url(player_url)
+            if sibnet_url:
+                return [sibnet_url]
+            logger.warning(f"Impossible extraire URL Sibnet depuis {player_url}")
+            return []
+        
+        response = await self.client.get(player_url)
+        response.raise_for_status()
+        return self._extract_video_urls_from_html(response.text, player_url)
+
     def _extract_video_urls_from_html(self, html: str, player_url: str) -> List[str]:
         """Extrait URLs vidéo depuis HTML d'un player."""
         video_urls = []
@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import asyncio
 
 from astream.utils.logger import logger
@@ -7,8 +7,8 @@ from astream.utils.parsers import MediaIdParser
 from astream.scrapers.animesama.details import get_or_fetch_anime_details
 from astream.scrapers.animesama.video_resolver import AnimeSamaVideoResolver
 from astream.utils.data.loader import get_dataset_loader
-from astream.utils.data.database import get_metadata_from_cache, set_metadata_to_cache
-from astream.config.settings import settings
+from astream.utils.data.database import get_episode_players, set_episode_players, get_metadata_fields, CacheOutcome, DistributedLock, LockAcquisitionError, LockHolderError
+from astream.utils.data.single_flight import single_flight
 from astream.utils.stremio_formatter import format_stream_for_stremio
 from astream.scrapers.animesama.helpers import parse_genres_string
 
@@ -81,12 +81,12 @@ class AnimeSamaService:
             
             # 1. Vérifier cache des URLs de player fusionnées d'abord
             cache_key = f"as:{anime_slug}:s{season_number}e{episode_number}"
-            cached_players = await get_metadata_from_cache(cache_key)
+            cached_players = await get_episode_players(anime_slug, season_number, episode_number)
             
-            if cached_players:
+            if cached_players is not None:
                 logger.log("DATABASE", f"Cache hit {cache_key} - Players fusionnés récupérés")
                 # Extraire URLs vidéo depuis le cache
-                player_urls_with_language = cached_players.get("player_urls", [])
+                player_urls_with_language = cached_players.data
                 
                 if player_urls_with_language:
                     # Obtenir le resolver pour extraire les URLs vidéo
@@ -119,47 +119,13 @@ class AnimeSamaService:
             else:
                 logger.log("DATABASE", f"Cache miss {cache_key} - Extraction dataset + scraping puis fusion")
                 
-                # 2. Lancer dataset + scraping EN PARALLÈLE (URLs de player seulement)
-                dataset_task = asyncio.create_task(self._get_dataset_player_urls(anime_slug, season_number, episode_number, language_filter))
-                scraping_task = asyncio.create_task(self._get_scraping_player_urls(anime_slug, season_number, episode_number, language_filter, client_ip, config))
+                # 2-8. Un seul calcul par épisode dans le worker (et une seule instance via le verrou)
+                unique_players = await single_flight.run(
+                    cache_key,
+                    lambda: self._fetch_merged_player_urls_with_lock(anime_slug, season_number, episode_number, language_filter, client_ip, config)
+                )
                 
-                # 3. Attendre les 2 résultats
-                dataset_players, scraping_players = await asyncio.gather(dataset_task, scraping_task, return_exceptions=True)
-                
-                # 4. Gérer les exceptions
-                if isinstance(dataset_players, Exception):
-                    logger.warning(f"DATASET: Erreur récupération players: {dataset_players}")
-                    dataset_players = []
-                
-                if isinstance(scraping_players, Exception):
-                    logger.warning(f"ANIMESAMA: Erreur récupération players: {scraping_players}")
-                    scraping_players = []
-                
-                # 5. Fusionner les URLs de player
-                all_players = dataset_players + scraping_players
-                
-                # 6. Dédupliquer les URLs de player par URL
-                seen_urls = set()
-                unique_players = []
-                for player in all_players:
-                    url = player.get("url")
-                    if url and url not in seen_urls:
-                        seen_urls.add(url)
-                        unique_players.append(player)
-                
-                # 7. Sauvegarder les URLs de player fusionnées en cache
-                cache_data = {
-                    "player_urls": unique_players,
-                    "anime_slug": anime_slug,
-                    "season": season_number,
-                    "episode": episode_number,
-                    "language_filter": language_filter,
-                    "total_players": len(unique_players)
-                }
-                await set_metadata_to_cache(cache_key, cache_data, ttl=settings.EPISODE_TTL)
-                logger.log("DATABASE", f"Cache set {cache_key} - {len(unique_players)} players fusionnés (dataset + scraping)")
-                
-                # 8. Extraire URLs vidéo depuis les players fusionnés
+                # 9. Extraire URLs vidéo depuis les players fusionnés
                 if unique_players:
                     http_client = await self._get_http_client()
                     resolver = AnimeSamaVideoResolver(http_client)
@@ -180,7 +146,7 @@ class AnimeSamaService:
                             format_stream_for_stremio(video_url, language, anime_slug, season_number)
                         )
                     
-                    logger.log("STREAM", f"Fusion: {len(dataset_players)} dataset + {len(scraping_players)} scraping = {len(unique_streams)} streams extraits")
+                    logger.log("STREAM", f"Fusion: {len(unique_players)} players = {len(unique_streams)} streams extraits")
                 else:
                     unique_streams = []
             
@@ -192,6 +158,71 @@ class AnimeSamaService:
             logger.error(f"STREAM: Erreur récupération streams {episode_id}: {e}")
             return []
 
+    async def _fetch_merged_player_urls_with_lock(self, anime_slug: str, season_number: int, episode_number: int, language_filter: Optional[str] = None, client_ip: Optional[str] = None, config: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Récupère les players sous verrou distribué ; les instances en attente reçoivent le résultat du détenteur."""
+        cache_key = f"as:{anime_slug}:s{season_number}e{episode_number}"
+        
+        async def fetch_if_missing() -> List[Dict[str, Any]]:
+            cached_players = await get_episode_players(anime_slug, season_number, episode_number)
+            if cached_players is not None:
+                logger.log("DATABASE", f"Cache hit après acquisition du verrou {cache_key}")
+                return cached_players.data
+            return await self._fetch_merged_player_urls(anime_slug, season_number, episode_number, language_filter, client_ip, config)
+        
+        try:
+            return await DistributedLock(f"episode_fetch_{anime_slug}_s{season_number}e{episode_number}").run(fetch_if_missing)
+        except LockHolderError as e:
+            logger.warning(f"DATABASE: {e}")
+            return []
+        except LockAcquisitionError:
+            logger.warning(f"DATABASE: Verrou impossible {cache_key}, extraction sans verrou")
+            return await self._fetch_merged_player_urls(anime_slug, season_number, episode_number, language_filter, client_ip, config)
+
+    async def _fetch_merged_player_urls(self, anime_slug: str, season_number: int, episode_number: int, language_filter: Optional[str] = None, client_ip: Optional[str] = None, config: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Récupère dataset + scraping en parallèle, fusionne les URLs de player et met le résultat en cache."""
+        cache_key = f"as:{anime_slug}:s{season_number}e{episode_number}"
+        
+        # 2. Lancer dataset + scraping EN PARALLÈLE (URLs de player seulement)
+        dataset_task = asyncio.create_task(self._get_dataset_player_urls(anime_slug, season_number, episode_number, language_filter))
+        scraping_task = asyncio.create_task(self._get_scraping_player_urls(anime_slug, season_number, episode_number, language_filter, client_ip, config))
+        
+        # 3. Attendre les 2 résultats
+        dataset_players, scraping_players = await asyncio.gather(dataset_task, scraping_task, return_exceptions=True)
+        
+        # 4. Gérer les exceptions
+        if isinstance(dataset_players, Exception):
+            logger.warning(f"DATASET: Erreur récupération players: {dataset_players}")
+            dataset_players = []
+        
+        if isinstance(scraping_players, Exception):
+            logger.warning(f"ANIMESAMA: Erreur récupération players: {scraping_players}")
+            scraping_players, scraping_outcome = [], CacheOutcome.UPSTREAM_ERROR
+        else:
+            scraping_players, scraping_outcome = scraping_players
+        
+        # 5. Fusionner les URLs de player
+        all_players = dataset_players + scraping_players
+        
+        # 6. Dédupliquer les URLs de player par URL
+        seen_urls = set()
+        unique_players = []
+        for player in all_players:
+            url = player.get("url")
+            if url and url not in seen_urls:
+                seen_urls.add(url)
+                unique_players.append(player)
+        
+        # 7. Qualifier le résultat : un échec de scraping ne doit pas être mis en cache pour tout l'EPISODE_TTL
+        if scraping_outcome in (CacheOutcome.PARTIAL, CacheOutcome.UPSTREAM_ERROR):
+            outcome = CacheOutcome.PARTIAL if unique_players else CacheOutcome.UPSTREAM_ERROR
+        else:
+            outcome = CacheOutcome.FOUND if unique_players else CacheOutcome.NOT_FOUND
+        
+        # 8. Sauvegarder les URLs de player fusionnées en cache
+        await set_episode_players(anime_slug, season_number, episode_number, unique_players, outcome)
+        logger.log("DATABASE", f"Cache set {cache_key} - {len(unique_players)} players fusionnés ({len(dataset_players)} dataset + {len(scraping_players)} scraping, {outcome.value})")
+        return unique_players
+
     async def get_film_title(self, anime_slug: str, episode_num: int, client_ip: Optional[str] = None) -> Optional[str]:
         """Récupère titre d'un film."""
         try:
@@ -287,7 +318,8 @@ class AnimeSamaService:
             for stream in streams:
                 player_urls_with_language.append({
                     "url": stream.get("url", ""),
-                    "language": stream.get("language", "VOSTFR").lower()
+                    "language": stream.get("language", "VOSTFR").lower(),
+                    "source": "dataset"
                 })
             
             logger.log("DATASET", f"{len(player_urls_with_language)} URLs player dataset extraites")
@@ -297,21 +329,25 @@ class AnimeSamaService:
             logger.error(f"DATASET: Erreur récupération URLs player: {e}")
             return []
     
-    async def _get_scraping_player_urls(self, anime_slug: str, season: int, episode: int, language_filter: Optional[str] = None, client_ip: Optional[str] = None, config: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-        """Récupère URLs de player par scraping AnimeSama."""
+    async def _get_scraping_player_urls(self, anime_slug: str, season: int, episode: int, language_filter: Optional[str] = None, client_ip: Optional[str] = None, config: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], CacheOutcome]:
+        """Récupère URLs de player par scraping AnimeSama avec le résultat du scraping."""
         try:
             # Récupérer les détails de l'anime pour obtenir les données de saison
             animesama_api = await get_animesama_api()
             if client_ip:
                 animesama_api.set_client_ip(client_ip)
                 
-            anime_data = await get_or_fetch_anime_details(animesama_api.details, anime_slug)
-            if not anime_data:
-                logger.warning(f"ANIMESAMA: Aucune donnée trouvée pour {anime_slug}")
-                return []
+            # Seules les saisons sont nécessaires : lecture partielle du cache avant récupération complète
+            fields = await get_metadata_fields(f"as:{anime_slug}", ["seasons"])
+            seasons = fields.get("seasons") if fields else None
+            if seasons is None:
+                anime_data = await get_or_fetch_anime_details(animesama_api.details, anime_slug)
+                if not anime_data:
+                    logger.warning(f"ANIMESAMA: Aucune donnée trouvée pour {anime_slug}")
+                    return [], CacheOutcome.NOT_FOUND
+                seasons = anime_data.get("seasons", [])
             
             # Trouver la saison correspondante
-            seasons = anime_data.get("seasons", [])
             target_season = None
             
             for season_data in seasons:
@@ -321,14 +357,14 @@ class AnimeSamaService:
             
             if not target_season:
                 logger.warning(f"ANIMESAMA: Saison {season} introuvable pour {anime_slug}")
-                return []
+                return [], CacheOutcome.NOT_FOUND
             
             # Utiliser AnimeSamaPlayerExtractor pour extraire juste les URLs de player
             animesama_player = await get_animesama_player()
             if client_ip:
                 animesama_player.set_client_ip(client_ip)
             
-            player_urls = await animesama_player.extractor.extract_player_urls_smart_mapping_with_language(
+            player_urls, outcome = await animesama_player.extractor.extract_player_urls_with_outcome(
                 anime_slug=anime_slug,
                 season_data=target_season,
                 episode_number=episode,
@@ -339,11 +375,11 @@ class AnimeSamaService:
             if player_urls:
                 logger.log("ANIMESAMA", f"{len(player_urls)} URLs player scrapées pour {anime_slug} S{season}E{episode}")
             
-            return player_urls
+            return player_urls, outcome
             
         except Exception as e:
             logger.error(f"ANIMESAMA: Erreur scraping URLs player: {e}")
-            return []
+            return [], CacheOutcome.UPSTREAM_ERROR
     
     def _filter_streams_by_language(self, streams: List[Dict[str, Any]], language_filter: Optional[str] = None, language_order: Optional[str] = None) -> List[Dict[str, Any]]:
         """Filtre et trie les streams par langue selon l'ordre de priorité."""
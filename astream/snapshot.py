@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import gzip
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import orjson
+
+from astream.utils.logger import logger
+from astream.utils.data.database import setup_database, teardown_database, get_cache_backend
+from astream.utils.data.backends.base import CacheEntry, CacheOutcome, get_family_version, parse_episode_cache_id
+
+SNAPSHOT_FORMAT = "astream-cache-snapshot"
+SNAPSHOT_VERSION = 1
+
+
+def _open_snapshot(path: str, mode: str):
+    """Ouvre un instantané compressé (gzip) ; "-" désigne l'entrée ou la sortie standard."""
+    if path == "-":
+        stream = sys.stdout.buffer if mode == "wb" else sys.stdin.buffer
+        return gzip.GzipFile(fileobj=stream, mode=mode)
+    return gzip.open(path, mode)
+
+
+async def export_snapshot(path: str, batch_size: int = 500) -> int:
+    """Écrit en flux les entrées non expirées du cache (une ligne JSON par entrée) et retourne leur nombre."""
+    backend = get_cache_backend()
+    target = path if path == "-" else f"{path}.tmp"
+    exported = 0
+
+    with _open_snapshot(target, "wb") as snapshot:
+        header = {"format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION, "backend": backend.name, "created_at": time.time()}
+        snapshot.write(orjson.dumps(header) + b"\n")
+
+        async for batch in backend.iter_snapshot(time.time(), batch_size):
+            for cache_id, entry in batch:
+                record = {
+                    "key": cache_id,
+                    "data": entry.data,
+                    "created_at": entry.created_at,
+                    "expires_at": entry.expires_at,
+                    "outcome": entry.outcome.value,
+                    "version": entry.version,
+                    "compute_time": entry.compute_time,
+                }
+                snapshot.write(orjson.dumps(record) + b"\n")
+            exported += len(batch)
+
+    # Remplacement atomique : un instantané partiel n'est jamais visible sous le nom final
+    if path != "-":
+        os.replace(target, path)
+    logger.log("DATABASE", f"Instantané du cache exporté: {exported} entrées ({backend.name})")
+    return exported
+
+
+async def _write_batch(entries: List[Tuple[str, CacheEntry]]) -> int:
+    """Écrit un lot importé sans écraser une entrée plus récente déjà présente ; retourne le nombre écrit."""
+    backend = get_cache_backend()
+    min_expires_at = time.time()
+
+    plain = [(cache_id, entry) for cache_id, entry in entries if parse_episode_cache_id(cache_id) is None]
+    existing = await backend.get_entries([cache_id for cache_id, _ in plain], min_expires_at)
+    plain = [(cache_id, entry) for cache_id, entry in plain if cache_id not in existing or existing[cache_id].created_at < entry.created_at]
+    await backend.set_entries(plain)
+
+    seasons: Dict[Tuple[str, int], Dict[int, CacheEntry]] = {}
+    for cache_id, entry in entries:
+        parsed = parse_episode_cache_id(cache_id)
+        if parsed:
+            anime_slug, season, episode = parsed
+            seasons.setdefault((anime_slug, season), {})[episode] = entry
+
+    written = len(plain)
+    for (anime_slug, season), episodes in seasons.items():
+        existing_episodes = await backend.get_episodes(anime_slug, season, list(episodes), min_expires_at)
+        episodes = {
+            episode: entry for episode, entry in episodes.items()
+            if episode not in existing_episodes or existing_episodes[episode].created_at < entry.created_at
+        }
+        await backend.set_episodes(anime_slug, season, episodes)
+        written += len(episodes)
+    return written
+
+
+async def import_snapshot(path: str, batch_size: int = 500) -> Dict[str, int]:
+    """Charge un instantané dans le backend configuré (entrées expirées ou de version obsolète ignorées)."""
+    imported = 0
+    skipped = 0
+    batch: List[Tuple[str, CacheEntry]] = []
+
+    with _open_snapshot(path, "rb") as snapshot:
+        header = orjson.loads(snapshot.readline() or b"{}")
+        if header.get("format") != SNAPSHOT_FORMAT or header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Format d'instantané non reconnu: {path}")
+
+        current_time = time.time()
+        for line in snapshot:
+            record = orjson.loads(line)
+            cache_id = record["key"]
+            if record["expires_at"] <= current_time or record["version"] != get_family_version(cache_id):
+                skipped += 1
+                continue
+
+            entry = CacheEntry(record["data"], record["created_at"], record["expires_at"], CacheOutcome(record["outcome"]), record["version"], record["compute_time"])
+            batch.append((cache_id, entry))
+            if len(batch) >= batch_size:
+                written = await _write_batch(batch)
+                imported += written
+                skipped += len(batch) - written
+                batch = []
+
+    if batch:
+        written = await _write_batch(batch)
+        imported += written
+        skipped += len(batch) - written
+
+    logger.log("DATABASE", f"Instantané du cache importé: {imported} entrées, {skipped} ignorées (expirées, obsolètes ou plus anciennes)")
+    return {"imported": imported, "skipped": skipped}
+
+
+async def main() -> None:
+    """Point d'entrée CLI : python -m astream.snapshot {export,import} FICHIER"""
+    parser = argparse.ArgumentParser(prog="python -m astream.snapshot", description="Export / import d'un instantané du cache AStream")
+    parser.add_argument("command", choices=["export", "import"], help="exporter le cache courant ou importer un instantané")
+    parser.add_argument("path", help="fichier d'instantané compressé (gzip), ou - pour stdout/stdin")
+    parser.add_argument("--batch-size", type=int, default=500, help="entrées lues ou écrites par lot (défaut : 500)")
+    args = parser.parse_args()
+
+    await setup_database()
+    try:
+        if args.command == "export":
+            await export_snapshot(args.path, max(1, args.batch_size))
+        else:
+            await import_snapshot(args.path, max(1, args.batch_size))
+    finally:
+        await teardown_database()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,257 @@
+import re
+import time
+import hashlib
+import asyncio
+from abc import ABC, abstractmethod
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from astream.utils.logger import logger
+
+
+class CacheOutcome(str, Enum):
+    """Résultat de la récupération ayant produit une entrée de cache."""
+    FOUND = "found"
+    NOT_FOUND = "not_found"
+    PARTIAL = "partial"
+    UPSTREAM_ERROR = "upstream_error"
+
+
+class CacheEntry:
+    """Entrée de cache avec ses métadonnées d'expiration."""
+    def __init__(self, data, created_at: float, expires_at: float, outcome: CacheOutcome = CacheOutcome.FOUND, version: int = 1, compute_time: float = 0.0):
+        self.data = data
+        self.created_at = created_at
+        self.expires_at = expires_at
+        self.outcome = outcome
+        self.version = version
+        self.compute_time = compute_time
+
+    @property
+    def is_negative(self) -> bool:
+        """Indique si l'entrée mémorise une absence de résultat ou un échec."""
+        return self.outcome in (CacheOutcome.NOT_FOUND, CacheOutcome.UPSTREAM_ERROR)
+
+    @property
+    def is_stale(self) -> bool:
+        """Indique si l'entrée a expiré mais reste dans la fenêtre de grâce."""
+        return self.expires_at <= time.time()
+
+
+# Familles de clés de cache : préfixe -> table (ou espace de noms)
+CACHE_TABLES = {"as:": "animesama", "tmdb:": "tmdb"}
+
+
+EPISODE_KEY_PATTERN = re.compile(r"^as:.+:s\d+e\d+$")
+TMDB_SEASON_KEY_PATTERN = re.compile(r"^tmdb:\d+:s\d+$")
+
+# Version du format de chaque famille de clés : l'incrémenter invalide uniquement
+# cette famille (les anciennes lignes sont ignorées à la lecture puis supprimées par le nettoyage)
+CACHE_FAMILY_VERSIONS = {
+    "as:homepage": 1,
+    "as:planning": 1,
+    "as:search": 1,
+    "as:episode": 1,
+    "as:details": 1,
+    "as:video": 1,
+    "tmdb:search": 1,
+    "tmdb:season": 1,
+    "tmdb:details": 1,
+}
+
+
+def get_key_family(cache_id: str) -> str:
+    """Regroupe une clé de cache par famille (as:homepage, as:episode, tmdb:details...)."""
+    if cache_id in ("as:homepage", "as:planning"):
+        return cache_id
+    if cache_id.startswith("as:search:"):
+        return "as:search"
+    if EPISODE_KEY_PATTERN.match(cache_id):
+        return "as:episode"
+    if cache_id.startswith("as:video:"):
+        return "as:video"
+    if cache_id.startswith("as:"):
+        return "as:details"
+    if cache_id.startswith("tmdb:search:"):
+        return "tmdb:search"
+    if TMDB_SEASON_KEY_PATTERN.match(cache_id):
+        return "tmdb:season"
+    if cache_id.startswith("tmdb:"):
+        return "tmdb:details"
+    return "other"
+
+
+def get_family_version(cache_id: str) -> int:
+    """Retourne la version courante de la famille d'une clé."""
+    return CACHE_FAMILY_VERSIONS.get(get_key_family(cache_id), 1)
+
+
+def get_anime_slug(cache_id: str) -> Optional[str]:
+    """Extrait le slug d'une clé propre à un anime (as:{slug} ou as:{slug}:s1e1), None sinon."""
+    if not cache_id.startswith("as:") or get_key_family(cache_id) not in ("as:details", "as:episode"):
+        return None
+    return cache_id[3:].split(":", 1)[0]
+
+
+def get_episode_cache_id(anime_slug: str, season: int, episode: int) -> str:
+    """Clé logique d'un épisode (cache mémoire, statistiques, invalidation)."""
+    return f"as:{anime_slug}:s{season}e{episode}"
+
+
+def get_video_cache_id(player_url: str) -> str:
+    """Clé des URLs vidéo résolues depuis un player (empreinte de l'URL du player)."""
+    return f"as:video:{hashlib.sha1(player_url.encode()).hexdigest()}"
+
+
+def parse_episode_cache_id(cache_id: str) -> Optional[Tuple[str, int, int]]:
+    """Retourne (slug, saison, épisode) d'une clé d'épisode, None pour les autres clés."""
+    if not EPISODE_KEY_PATTERN.match(cache_id):
+        return None
+    anime_slug, episode_part = cache_id[3:].rsplit(":", 1)
+    season, episode = episode_part[1:].split("e")
+    return anime_slug, int(season), int(episode)
+
+
+def parse_field_path(path: str) -> List[Any]:
+    """Découpe un chemin de champ ("seasons.0.path", "anime.*.genres") en segments (clé, index ou "*")."""
+    segments = [int(segment) if segment.isdigit() else segment for segment in path.split(".")]
+    if segments.count("*") > 1:
+        raise ValueError(f"Un seul joker autorisé par chemin: {path}")
+    return segments
+
+
+def extract_field(data: Any, path: str) -> Any:
+    """Extrait la valeur d'un chemin de champ (None si absent) ; "*" parcourt une liste."""
+    segments = parse_field_path(path)
+    if "*" in segments:
+        position = segments.index("*")
+        items = _extract_segments(data, segments[:position])
+        if not isinstance(items, list):
+            return None
+        return [_extract_segments(item, segments[position + 1:]) for item in items]
+    return _extract_segments(data, segments)
+
+
+def _extract_segments(data: Any, segments: List[Any]) -> Any:
+    for segment in segments:
+        if isinstance(segment, int) and isinstance(data, list):
+            data = data[segment] if segment < len(data) else None
+        elif isinstance(data, dict):
+            data = data.get(str(segment))
+        else:
+            return None
+        if data is None:
+            return None
+    return data
+
+
+def get_cache_table(cache_id: str) -> Optional[str]:
+    """Détermine la table de cache selon le préfixe de la clé."""
+    for prefix, table_name in CACHE_TABLES.items():
+        if cache_id.startswith(prefix):
+            return table_name
+    logger.warning(f"Préfixe de cache inconnu: {cache_id}")
+    return None
+
+
+class CacheBackend(ABC):
+    """Interface commune des backends de cache (entrées et verrous distribués)."""
+
+    name = "base"
+
+    async def setup(self) -> None:
+        """Prépare le backend (connexion, schéma)."""
+
+    async def teardown(self) -> None:
+        """Libère les ressources du backend."""
+
+    @abstractmethod
+    async def get_entries(self, cache_ids: List[str], min_expires_at: float) -> Dict[str, CacheEntry]:
+        """Retourne les entrées expirant après min_expires_at (clés absentes omises)."""
+
+    async def get_fields(self, cache_id: str, paths: List[str], min_expires_at: float) -> Optional[CacheEntry]:
+        """Retourne une entrée dont data ne contient que les chemins demandés (chemin -> valeur).
+
+        Implémentation par défaut : lecture complète puis extraction en Python.
+        """
+        entry = (await self.get_entries([cache_id], min_expires_at)).get(cache_id)
+        if entry is None:
+            return None
+        fields = {path: extract_field(entry.data, path) for path in paths}
+        return CacheEntry(fields, entry.created_at, entry.expires_at, entry.outcome, entry.version, entry.compute_time)
+
+    @abstractmethod
+    async def set_entries(self, entries: List[Tuple[str, CacheEntry]]) -> None:
+        """Écrit plusieurs entrées de façon atomique si le backend le permet."""
+
+    @abstractmethod
+    async def get_episodes(self, anime_slug: str, season: int, episodes: Optional[List[int]], min_expires_at: float) -> Dict[int, CacheEntry]:
+        """Retourne les players des épisodes d'une saison (tous si episodes est None), data étant la liste des players."""
+
+    @abstractmethod
+    async def set_episodes(self, anime_slug: str, season: int, entries: Dict[int, CacheEntry]) -> None:
+        """Remplace les players des épisodes donnés sans toucher aux autres épisodes de la saison."""
+
+    @abstractmethod
+    async def acquire_lock(self, lock_key: str, instance_id: str, duration: int) -> bool:
+        """Tente d'acquérir un verrou sans attendre."""
+
+    @abstractmethod
+    async def release_lock(self, lock_key: str, instance_id: str) -> bool:
+        """Libère un verrou détenu par instance_id."""
+
+    async def get_lock_holder(self, lock_key: str) -> Optional[str]:
+        """Retourne l'identifiant du détenteur actuel d'un verrou, None s'il est libre."""
+        return None
+
+    async def wait_for_release(self, lock_key: str, timeout: float) -> None:
+        """Attend la libération d'un verrou ou la fin du délai (simple attente sans notification)."""
+        await asyncio.sleep(timeout)
+
+    async def set_lock_result(self, lock_key: str, payload: bytes, ttl: float) -> None:
+        """Publie le résultat (sérialisé) du détenteur d'un verrou pour les instances en attente."""
+
+    async def get_lock_result(self, lock_key: str) -> Optional[bytes]:
+        """Retourne le résultat publié pour un verrou s'il n'a pas expiré."""
+        return None
+
+    async def cleanup_expired_locks(self) -> None:
+        """Supprime les verrous et résultats expirés (inutile si le backend les expire lui-même)."""
+
+    async def publish_invalidations(self, invalidations: Dict[str, float], ttl: float) -> None:
+        """Publie aux autres workers la date d'invalidation des étiquettes de documents (conservée ttl secondes).
+
+        Implémentation par défaut : aucune (backend propre à un seul worker).
+        """
+
+    async def get_invalidations(self, tags: List[str]) -> Dict[str, float]:
+        """Retourne la dernière date d'invalidation publiée des étiquettes (étiquettes jamais invalidées omises)."""
+        return {}
+
+    async def run_background_migrations(self) -> int:
+        """Applique par lots les migrations de données en attente (aucune sans schéma)."""
+        return 0
+
+    async def sweep_expired(self, cutoff: float, batch_size: int) -> Tuple[int, int]:
+        """Supprime les entrées expirées avant cutoff et retourne (entrées, octets) libérés."""
+        return 0, 0
+
+    async def purge_slug(self, anime_slug: str) -> List[str]:
+        """Supprime toutes les entrées propres à un anime et retourne les clés supprimées."""
+        return []
+
+    async def touch_entries(self, access_times: Dict[str, float]) -> None:
+        """Enregistre la date du dernier accès des entrées (éviction LRU)."""
+
+    async def evict_lru(self, max_rows: int, max_bytes: int, batch_size: int) -> Tuple[int, int]:
+        """Supprime les entrées les moins récemment utilisées au-delà des limites par table et retourne (entrées, octets) libérés."""
+        return 0, 0
+
+    async def table_report(self, limit: int) -> Dict[str, Any]:
+        """Retourne, par table, le nombre d'entrées, la taille totale et les plus grosses clés."""
+        return {}
+
+    async def iter_snapshot(self, min_expires_at: float, batch_size: int) -> AsyncIterator[List[Tuple[str, CacheEntry]]]:
+        """Parcourt par lots les entrées et épisodes expirant après min_expires_at (clés d'épisode logiques)."""
+        raise NotImplementedError(f"Export non supporté par le backend {self.name}")
+        yield []
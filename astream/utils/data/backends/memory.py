@@ -0,0 +1,158 @@
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from astream.utils.data.backends.base import CacheBackend, CacheEntry, CACHE_TABLES, get_cache_table, get_anime_slug, get_episode_cache_id, parse_episode_cache_id
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Backend de cache en mémoire, propre au processus (un seul worker ou tests)."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._entries: Dict[str, CacheEntry] = {}
+        self._locks: Dict[str, Tuple[str, float]] = {}
+        self._lock_results: Dict[str, Tuple[bytes, float]] = {}
+        self._last_access: Dict[str, float] = {}
+        self._episodes: Dict[Tuple[str, int, int], CacheEntry] = {}
+
+    async def get_entries(self, cache_ids: List[str], min_expires_at: float) -> Dict[str, CacheEntry]:
+        """Retourne les entrées non expirées avant min_expires_at."""
+        entries = {}
+        for cache_id in cache_ids:
+            entry = self._entries.get(cache_id)
+            if entry and entry.expires_at > min_expires_at:
+                entries[cache_id] = entry
+        return entries
+
+    async def set_entries(self, entries: List[Tuple[str, CacheEntry]]) -> None:
+        """Remplace les entrées données."""
+        for cache_id, entry in entries:
+            self._entries[cache_id] = entry
+            self._last_access[cache_id] = entry.created_at
+
+    async def get_episodes(self, anime_slug: str, season: int, episodes: Optional[List[int]], min_expires_at: float) -> Dict[int, CacheEntry]:
+        """Retourne les épisodes non expirés d'une saison."""
+        return {
+            episode: entry
+            for (slug, season_number, episode), entry in self._episodes.items()
+            if slug == anime_slug and season_number == season and (episodes is None or episode in episodes) and entry.expires_at > min_expires_at
+        }
+
+    async def set_episodes(self, anime_slug: str, season: int, entries: Dict[int, CacheEntry]) -> None:
+        """Remplace les épisodes donnés."""
+        for episode, entry in entries.items():
+            self._episodes[(anime_slug, season, episode)] = entry
+
+    async def acquire_lock(self, lock_key: str, instance_id: str, duration: int) -> bool:
+        """Acquiert un verrou local au processus."""
+        current_time = time.time()
+        holder = self._locks.get(lock_key)
+        if holder and holder[1] >= current_time:
+            return holder[0] == instance_id
+        self._locks[lock_key] = (instance_id, current_time + duration)
+        return True
+
+    async def get_lock_holder(self, lock_key: str) -> Optional[str]:
+        """Retourne le détenteur actuel d'un verrou, None s'il est libre."""
+        holder = self._locks.get(lock_key)
+        return holder[0] if holder and holder[1] >= time.time() else None
+
+    async def release_lock(self, lock_key: str, instance_id: str) -> bool:
+        """Libère un verrou détenu par instance_id."""
+        holder = self._locks.get(lock_key)
+        if holder and holder[0] == instance_id:
+            del self._locks[lock_key]
+        return True
+
+    async def set_lock_result(self, lock_key: str, payload: bytes, ttl: float) -> None:
+        """Publie le résultat du détenteur d'un verrou."""
+        self._lock_results[lock_key] = (payload, time.time() + ttl)
+
+    async def get_lock_result(self, lock_key: str) -> Optional[bytes]:
+        """Retourne le résultat publié pour un verrou s'il n'a pas expiré."""
+        result = self._lock_results.get(lock_key)
+        return result[0] if result and result[1] >= time.time() else None
+
+    async def cleanup_expired_locks(self) -> None:
+        """Supprime les verrous et résultats expirés."""
+        current_time = time.time()
+        for lock_key, (_, expires_at) in list(self._locks.items()):
+            if expires_at < current_time:
+                self._locks.pop(lock_key, None)
+        for lock_key, (_, expires_at) in list(self._lock_results.items()):
+            if expires_at < current_time:
+                self._lock_results.pop(lock_key, None)
+
+    async def sweep_expired(self, cutoff: float, batch_size: int) -> Tuple[int, int]:
+        """Supprime les entrées expirées avant cutoff (taille non mesurée)."""
+        expired = [cache_id for cache_id, entry in self._entries.items() if entry.expires_at < cutoff]
+        for cache_id in expired:
+            del self._entries[cache_id]
+            self._last_access.pop(cache_id, None)
+
+        expired_episodes = [key for key, entry in self._episodes.items() if entry.expires_at < cutoff]
+        for key in expired_episodes:
+            del self._episodes[key]
+            self._last_access.pop(get_episode_cache_id(*key), None)
+        return len(expired) + len(expired_episodes), 0
+
+    async def purge_slug(self, anime_slug: str) -> List[str]:
+        """Supprime les entrées d'un anime."""
+        purged = [cache_id for cache_id in self._entries if get_anime_slug(cache_id) == anime_slug]
+        for cache_id in purged:
+            del self._entries[cache_id]
+            self._last_access.pop(cache_id, None)
+
+        for key in [key for key in self._episodes if key[0] == anime_slug]:
+            del self._episodes[key]
+            self._last_access.pop(get_episode_cache_id(*key), None)
+            purged.append(get_episode_cache_id(*key))
+        return purged
+
+    async def touch_entries(self, access_times: Dict[str, float]) -> None:
+        """Enregistre la date du dernier accès des entrées et épisodes."""
+        for cache_id, last_access in access_times.items():
+            if cache_id in self._entries or parse_episode_cache_id(cache_id) in self._episodes:
+                self._last_access[cache_id] = max(last_access, self._last_access.get(cache_id, 0))
+
+    async def evict_lru(self, max_rows: int, max_bytes: int, batch_size: int) -> Tuple[int, int]:
+        """Supprime les entrées les moins récemment utilisées au-delà de max_rows par table, épisodes compris (taille non mesurée)."""
+        if max_rows <= 0:
+            return 0, 0
+
+        evicted = 0
+        for table_name in CACHE_TABLES.values():
+            cache_ids = [cache_id for cache_id in self._entries if get_cache_table(cache_id) == table_name]
+            if len(cache_ids) <= max_rows:
+                continue
+            cache_ids.sort(key=lambda cache_id: self._last_access.get(cache_id, 0))
+            for cache_id in cache_ids[:len(cache_ids) - max_rows]:
+                del self._entries[cache_id]
+                self._last_access.pop(cache_id, None)
+                evicted += 1
+
+        if len(self._episodes) > max_rows:
+            episode_keys = sorted(self._episodes, key=lambda key: self._last_access.get(get_episode_cache_id(*key), self._episodes[key].created_at))
+            for key in episode_keys[:len(episode_keys) - max_rows]:
+                del self._episodes[key]
+                self._last_access.pop(get_episode_cache_id(*key), None)
+                evicted += 1
+        return evicted, 0
+
+    async def table_report(self, limit: int) -> Dict[str, Any]:
+        """Retourne le nombre d'entrées par table (taille non mesurée)."""
+        report = {table_name: {"rows": 0} for table_name in CACHE_TABLES.values()}
+        for cache_id in self._entries:
+            table_name = get_cache_table(cache_id)
+            if table_name:
+                report[table_name]["rows"] += 1
+        report["episodes"] = {"rows": len(self._episodes)}
+        return report
+
+    async def iter_snapshot(self, min_expires_at: float, batch_size: int) -> AsyncIterator[List[Tuple[str, CacheEntry]]]:
+        """Parcourt par lots une copie des entrées et épisodes non expirés."""
+        snapshot = [(cache_id, entry) for cache_id, entry in self._entries.items() if entry.expires_at > min_expires_at]
+        snapshot += [(get_episode_cache_id(*key), entry) for key, entry in self._episodes.items() if entry.expires_at > min_expires_at]
+        for start in range(0, len(snapshot), batch_size):
+            yield snapshot[start:start + batch_size]
@@ -0,0 +1,383 @@
+import os
+import json
+import time
+import asyncio
+from typing import Awaitable, Callable, List, Set
+
+from astream.utils.logger import logger
+from astream.config.settings import database, settings
+from astream.utils.data.codec import decode_payload, encode_row
+from astream.utils.data.backends.base import CACHE_TABLES, parse_episode_cache_id
+
+DATABASE_VERSION = "2.8"
+# Versions antérieures au schéma actuel : seules les bases plus anciennes voient leurs tables
+# supprimées (étape reset_pre_2_0_schema) ; au-delà, le schéma évolue par migrations incrémentales
+MIN_COMPATIBLE_DATABASE_VERSION = "2.0"
+
+# Verrou (table scrape_lock) sérialisant les migrations entre workers
+MIGRATION_LOCK_KEY = "schema_migrations"
+MIGRATION_LOCK_TTL = 120
+MIGRATION_POLL_INTERVAL = 0.5
+
+
+def _parse_version(version: str) -> tuple:
+    return tuple(int(part) for part in version.split("."))
+
+
+class Migration:
+    """Étape de migration, appliquée une seule fois et enregistrée dans schema_migrations.
+
+    Une étape par lots (batched) reçoit la taille de lot, traite au plus ce nombre de lignes
+    et retourne le nombre traité ; elle est rappelée jusqu'à épuisement, hors du démarrage.
+    """
+    def __init__(self, migration_id: int, name: str, apply: Callable[..., Awaitable], batched: bool = False):
+        self.id = migration_id
+        self.name = name
+        self.apply = apply
+        self.batched = batched
+
+
+async def ensure_column(table_name: str, column_name: str, column_type: str) -> None:
+    """Ajoute une colonne à une table existante si elle est absente."""
+    if settings.DATABASE_TYPE == "sqlite":
+        columns = await database.fetch_all(f"PRAGMA table_info({table_name})")
+        if any(column["name"] == column_name for column in columns):
+            return
+        await database.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}")
+    else:
+        await database.execute(f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS {column_name} {column_type}")
+    logger.log("DATABASE", f"Colonne ajoutée: {table_name}.{column_name}")
+
+
+def _keys_filter(rows) -> tuple:
+    """Construit la clause IN et ses paramètres pour un lot de lignes (colonne key)."""
+    placeholders = ", ".join(f":key_{i}" for i in range(len(rows)))
+    return placeholders, {f"key_{i}": row["key"] for i, row in enumerate(rows)}
+
+
+async def _reset_pre_2_0_schema() -> None:
+    """Supprime les tables d'un schéma antérieur à MIN_COMPATIBLE_DATABASE_VERSION."""
+    current_version = await database.fetch_val("SELECT version FROM db_version WHERE id = 1")
+    if current_version is not None and _parse_version(current_version) >= _parse_version(MIN_COMPATIBLE_DATABASE_VERSION):
+        return
+
+    if settings.DATABASE_TYPE == "sqlite":
+        allowed_tables = {'metadata', 'animesama', 'tmdb', 'episodes', 'episode_players'}
+        tables = await database.fetch_all("SELECT name FROM sqlite_master WHERE type='table' AND name NOT IN ('db_version', 'sqlite_sequence', 'schema_migrations', 'scrape_lock')")
+        for table in tables:
+            table_name = table['name']
+            if table_name not in allowed_tables:
+                logger.warning(f"Table non autorisée ignorée: {table_name}")
+                continue
+            if not table_name.replace('_', '').isalnum() or len(table_name) > 64:
+                logger.warning(f"Table format nom invalide ignorée: {table_name}")
+                continue
+            # Sécurisation supplémentaire : double validation du nom de table
+            if table_name in allowed_tables and table_name.replace('_', '').isalnum():
+                await database.execute("DROP TABLE IF EXISTS " + table_name)
+                logger.log("DATABASE", f"Table supprimée: {table_name}")
+            else:
+                logger.error(f"Tentative suppression table non autorisée: {table_name}")
+    else:
+        await database.execute("""
+            DO $$ DECLARE r RECORD;
+            BEGIN
+                FOR r IN (SELECT tablename FROM pg_tables WHERE schemaname = current_schema() AND tablename NOT IN ('db_version', 'schema_migrations', 'scrape_lock')) LOOP
+                    EXECUTE 'DROP TABLE IF EXISTS ' || quote_ident(r.tablename) || ' CASCADE';
+                END LOOP;
+            END $$;
+        """)
+
+
+async def _create_cache_tables() -> None:
+    await database.execute("CREATE TABLE IF NOT EXISTS animesama (key TEXT PRIMARY KEY, content TEXT NOT NULL, created_at INTEGER, expires_at INTEGER, outcome TEXT)")
+    await database.execute("CREATE TABLE IF NOT EXISTS tmdb (key TEXT PRIMARY KEY, content TEXT NOT NULL, created_at INTEGER, expires_at INTEGER, outcome TEXT)")
+    await database.execute("CREATE INDEX IF NOT EXISTS idx_scrape_lock_key ON scrape_lock(lock_key)")
+    await database.execute("CREATE INDEX IF NOT EXISTS idx_scrape_lock_expires ON scrape_lock(expires_at)")
+    await database.execute("CREATE INDEX IF NOT EXISTS idx_animesama_key ON animesama(key)")
+    await database.execute("CREATE INDEX IF NOT EXISTS idx_animesama_expires ON animesama(expires_at)")
+    await database.execute("CREATE INDEX IF NOT EXISTS idx_tmdb_key ON tmdb(key)")
+    await database.execute("CREATE INDEX IF NOT EXISTS idx_tmdb_expires ON tmdb(expires_at)")
+
+
+async def _add_codec_columns() -> None:
+    blob_type = "BLOB" if settings.DATABASE_TYPE == "sqlite" else "BYTEA"
+    for table_name in CACHE_TABLES.values():
+        await ensure_column(table_name, "outcome", "TEXT")
+        await ensure_column(table_name, "payload", blob_type)
+        await ensure_column(table_name, "codec", "TEXT")
+
+
+async def _add_version_columns() -> None:
+    for table_name in CACHE_TABLES.values():
+        await ensure_column(table_name, "family_version", "INTEGER")
+        await ensure_column(table_name, "compute_time", "REAL")
+
+
+async def _add_last_access_column() -> None:
+    for table_name in CACHE_TABLES.values():
+        await ensure_column(table_name, "last_access", "REAL")
+        await database.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_last_access ON {table_name}(last_access)")
+
+
+async def _backfill_last_access(batch_size: int) -> int:
+    """Initialise last_access à created_at pour les lignes écrites avant son ajout."""
+    processed = 0
+    for table_name in CACHE_TABLES.values():
+        rows = await database.fetch_all(f"SELECT key FROM {table_name} WHERE last_access IS NULL LIMIT :limit", {"limit": batch_size})
+        if rows:
+            placeholders, values = _keys_filter(rows)
+            await database.execute(f"UPDATE {table_name} SET last_access = COALESCE(created_at, 0) WHERE key IN ({placeholders}) AND last_access IS NULL", values)
+            processed += len(rows)
+    return processed
+
+
+async def _add_slug_column() -> None:
+    for table_name in CACHE_TABLES.values():
+        await ensure_column(table_name, "slug", "TEXT")
+    await database.execute("CREATE INDEX IF NOT EXISTS idx_animesama_slug ON animesama(slug)")
+
+
+async def _backfill_slugs(batch_size: int) -> int:
+    """Renseigne la colonne slug des lignes animesama écrites avant son ajout."""
+    if settings.DATABASE_TYPE == "sqlite":
+        slug_expr = "substr(key, 4, instr(substr(key, 4) || ':', ':') - 1)"
+    else:
+        slug_expr = "split_part(substr(key, 4), ':', 1)"
+    condition = "slug IS NULL AND key NOT IN ('as:homepage', 'as:planning') AND key NOT LIKE :search_prefix AND key NOT LIKE :video_prefix"
+    prefixes = {"search_prefix": "as:search:%", "video_prefix": "as:video:%"}
+
+    rows = await database.fetch_all(f"SELECT key FROM animesama WHERE {condition} LIMIT :limit", {**prefixes, "limit": batch_size})
+    if rows:
+        placeholders, values = _keys_filter(rows)
+        values.update(prefixes)
+        await database.execute(f"UPDATE animesama SET slug = {slug_expr} WHERE key IN ({placeholders}) AND {condition}", values)
+    return len(rows)
+
+
+async def _create_episode_tables() -> None:
+    await database.execute("CREATE TABLE IF NOT EXISTS episodes (slug TEXT NOT NULL, season INTEGER NOT NULL, episode INTEGER NOT NULL, outcome TEXT, created_at REAL, expires_at REAL, PRIMARY KEY (slug, season, episode))")
+    await database.execute("CREATE TABLE IF NOT EXISTS episode_players (slug TEXT NOT NULL, season INTEGER NOT NULL, episode INTEGER NOT NULL, position INTEGER NOT NULL, language TEXT, url TEXT NOT NULL, source TEXT, fetched_at REAL, PRIMARY KEY (slug, season, episode, position))")
+    await database.execute("CREATE INDEX IF NOT EXISTS idx_episodes_expires ON episodes(expires_at)")
+    await database.execute("CREATE INDEX IF NOT EXISTS idx_episode_players_language ON episode_players(slug, season, language)")
+
+
+async def _create_lock_results_table() -> None:
+    await database.execute("CREATE TABLE IF NOT EXISTS lock_results (lock_key TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL)")
+
+
+async def _index_last_access_nulls_first() -> None:
+    """Sous PostgreSQL, recrée l'index last_access avec NULL en tête (ordre d'éviction LRU de SQLite)."""
+    if settings.DATABASE_TYPE == "sqlite":
+        return
+    for table_name in CACHE_TABLES.values():
+        await database.execute(f"DROP INDEX IF EXISTS idx_{table_name}_last_access")
+        await database.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_last_access ON {table_name}(last_access NULLS FIRST)")
+
+
+async def _add_episode_version_column() -> None:
+    await ensure_column("episodes", "family_version", "INTEGER")
+
+
+async def _add_episode_last_access_column() -> None:
+    await ensure_column("episodes", "last_access", "REAL")
+    nulls_first = "" if settings.DATABASE_TYPE == "sqlite" else " NULLS FIRST"
+    await database.execute(f"CREATE INDEX IF NOT EXISTS idx_episodes_last_access ON episodes(last_access{nulls_first})")
+
+
+async def _create_response_invalidations_table() -> None:
+    await database.execute("CREATE TABLE IF NOT EXISTS response_invalidations (tag TEXT PRIMARY KEY, invalidated_at REAL NOT NULL, expires_at REAL)")
+    await database.execute("CREATE INDEX IF NOT EXISTS idx_response_invalidations_expires ON response_invalidations(expires_at)")
+
+
+async def _reencode_legacy_rows(batch_size: int) -> int:
+    """Ré-encode les lignes au format JSON texte historique (codec NULL) avec le codec configuré."""
+    processed = 0
+    for table_name in CACHE_TABLES.values():
+        rows = await database.fetch_all(f"SELECT key, content FROM {table_name} WHERE codec IS NULL LIMIT :limit", {"limit": batch_size})
+        updates = []
+        for row in rows:
+            try:
+                values = encode_row(json.loads(row["content"]))
+            except (ValueError, TypeError):
+                values = {"content": row["content"] or "", "payload": None, "codec": "json"}
+            values["cache_id"] = row["key"]
+            updates.append(values)
+
+        if updates:
+            async with database.transaction():
+                await database.execute_many(f"UPDATE {table_name} SET content = :content, payload = :payload, codec = :codec WHERE key = :cache_id AND codec IS NULL", updates)
+            processed += len(updates)
+    return processed
+
+
+async def _move_legacy_episode_rows(batch_size: int) -> int:
+    """Déplace les players d'épisodes stockés en JSON dans animesama (as:{slug}:sXeY) vers episodes/episode_players.
+
+    Un épisode déjà présent dans episodes (écrit depuis) est conservé ; la ligne historique est supprimée dans tous les cas.
+    """
+    rows = await database.fetch_all(
+        "SELECT key, content, payload, codec, created_at, expires_at, outcome, family_version FROM animesama "
+        "WHERE key LIKE :episode_pattern AND key NOT LIKE :search_prefix AND key NOT LIKE :video_prefix LIMIT :limit",
+        {"episode_pattern": "as:%:s%e%", "search_prefix": "as:search:%", "video_prefix": "as:video:%", "limit": batch_size}
+    )
+    episode_rows = [(row, parse_episode_cache_id(row["key"])) for row in rows]
+    episode_rows = [(row, parsed) for row, parsed in episode_rows if parsed]
+    if not episode_rows:
+        return 0
+
+    slugs = {parsed[0] for _, parsed in episode_rows}
+    placeholders = ", ".join(f":slug_{i}" for i in range(len(slugs)))
+    existing = await database.fetch_all(f"SELECT slug, season, episode FROM episodes WHERE slug IN ({placeholders})", {f"slug_{i}": slug for i, slug in enumerate(slugs)})
+    existing = {(row["slug"], row["season"], row["episode"]) for row in existing}
+
+    states = []
+    players = []
+    for row, (anime_slug, season, episode) in episode_rows:
+        if (anime_slug, season, episode) in existing:
+            continue
+        try:
+            data = decode_payload(row["payload"], row["codec"], row["content"])
+        except (ValueError, TypeError):
+            logger.warning(f"Épisode historique illisible supprimé: {row['key']}")
+            continue
+        # Format historique : {"player_urls": [...], "anime_slug": ...}, players en dict ou URL seule
+        if isinstance(data, dict):
+            data = data.get("player_urls") or []
+        if not isinstance(data, list):
+            logger.warning(f"Épisode historique au format inconnu supprimé: {row['key']}")
+            continue
+        episode_players = [{"url": player} if isinstance(player, str) else player for player in data]
+        episode_players = [player for player in episode_players if isinstance(player, dict) and player.get("url")]
+
+        key = {"slug": anime_slug, "season": season, "episode": episode}
+        states.append({
+            **key, "outcome": row["outcome"] or ("found" if episode_players else "not_found"), "created_at": row["created_at"], "expires_at": row["expires_at"],
+            "family_version": row["family_version"] or 1, "last_access": row["created_at"]
+        })
+        players += [
+            {**key, "position": position, "language": player.get("language"), "url": player["url"], "source": player.get("source"), "fetched_at": row["created_at"]}
+            for position, player in enumerate(episode_players)
+        ]
+
+    placeholders, values = _keys_filter([row for row, _ in episode_rows])
+    async with database.transaction():
+        if states:
+            await database.execute_many(
+                "INSERT INTO episodes (slug, season, episode, outcome, created_at, expires_at, family_version, last_access) "
+                "VALUES (:slug, :season, :episode, :outcome, :created_at, :expires_at, :family_version, :last_access)",
+                states
+            )
+        if players:
+            await database.execute_many(
+                "INSERT INTO episode_players (slug, season, episode, position, language, url, source, fetched_at) "
+                "VALUES (:slug, :season, :episode, :position, :language, :url, :source, :fetched_at)",
+                players
+            )
+        await database.execute(f"DELETE FROM animesama WHERE key IN ({placeholders})", values)
+    return len(episode_rows)
+
+
+# Étapes dans leur ordre d'application ; ne jamais renuméroter ni réordonner une étape publiée.
+# Les étapes par lots s'exécutent après le démarrage : le code doit tolérer les lignes non encore migrées.
+MIGRATIONS: List[Migration] = [
+    Migration(1, "reset_pre_2_0_schema", _reset_pre_2_0_schema),
+    Migration(2, "create_cache_tables", _create_cache_tables),
+    Migration(3, "add_codec_columns", _add_codec_columns),
+    Migration(4, "add_version_columns", _add_version_columns),
+    Migration(5, "add_last_access_column", _add_last_access_column),
+    Migration(6, "add_slug_column", _add_slug_column),
+    Migration(7, "create_episode_tables", _create_episode_tables),
+    Migration(8, "backfill_last_access", _backfill_last_access, batched=True),
+    Migration(9, "backfill_slugs", _backfill_slugs, batched=True),
+    Migration(10, "reencode_legacy_rows", _reencode_legacy_rows, batched=True),
+    Migration(11, "create_lock_results_table", _create_lock_results_table),
+    Migration(12, "index_last_access_nulls_first", _index_last_access_nulls_first),
+    Migration(13, "add_episode_version_column", _add_episode_version_column),
+    Migration(14, "add_episode_last_access_column", _add_episode_last_access_column),
+    Migration(15, "move_legacy_episode_rows", _move_legacy_episode_rows, batched=True),
+    Migration(16, "create_response_invalidations_table", _create_response_invalidations_table),
+]
+
+
+async def ensure_migration_tables() -> None:
+    """Crée les tables nécessaires au suivi et au verrouillage des migrations."""
+    await database.execute("CREATE TABLE IF NOT EXISTS db_version (id INTEGER PRIMARY KEY CHECK (id = 1), version TEXT)")
+    await database.execute("CREATE TABLE IF NOT EXISTS schema_migrations (id INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at REAL)")
+    await database.execute("CREATE TABLE IF NOT EXISTS scrape_lock (lock_key TEXT PRIMARY KEY, instance_id TEXT, timestamp INTEGER, expires_at INTEGER)")
+
+
+async def get_applied_migrations() -> Set[int]:
+    """Retourne les identifiants des étapes déjà appliquées."""
+    rows = await database.fetch_all("SELECT id FROM schema_migrations")
+    return {row["id"] for row in rows}
+
+
+async def get_pending_migrations(batched: bool) -> List[Migration]:
+    """Retourne les étapes (de schéma ou par lots) restant à appliquer, dans l'ordre."""
+    applied = await get_applied_migrations()
+    return [migration for migration in MIGRATIONS if migration.batched == batched and migration.id not in applied]
+
+
+async def _record_migration(migration: Migration) -> None:
+    values = {"id": migration.id, "name": migration.name, "applied_at": time.time()}
+    if settings.DATABASE_TYPE == "sqlite":
+        await database.execute("INSERT OR IGNORE INTO schema_migrations (id, name, applied_at) VALUES (:id, :name, :applied_at)", values)
+    else:
+        await database.execute("INSERT INTO schema_migrations (id, name, applied_at) VALUES (:id, :name, :applied_at) ON CONFLICT (id) DO NOTHING", values)
+
+
+async def _set_database_version() -> None:
+    if settings.DATABASE_TYPE == "sqlite":
+        await database.execute("INSERT OR REPLACE INTO db_version VALUES (1, :version)", {"version": DATABASE_VERSION})
+    else:
+        await database.execute("INSERT INTO db_version VALUES (1, :version) ON CONFLICT (id) DO UPDATE SET version = :version", {"version": DATABASE_VERSION})
+
+
+async def _apply_migration(migration: Migration, batch_size: int) -> None:
+    start = time.perf_counter()
+    if migration.batched:
+        rows = 0
+        while True:
+            processed = await migration.apply(batch_size)
+            rows += processed
+            if processed == 0:
+                break
+            # Laisser la main aux requêtes entre deux lots
+            await asyncio.sleep(0)
+        logger.log("DATABASE", f"Migration {migration.id} ({migration.name}) appliquée: {rows} lignes en {time.perf_counter() - start:.2f}s")
+    else:
+        await migration.apply()
+        logger.log("DATABASE", f"Migration {migration.id} ({migration.name}) appliquée en {time.perf_counter() - start:.2f}s")
+    await _record_migration(migration)
+
+
+async def run_migrations(backend, batched: bool = False, batch_size: int = 500) -> int:
+    """Applique les étapes en attente sous verrou et retourne le nombre d'étapes appliquées.
+
+    Pour les étapes de schéma, les autres workers attendent la fin de la migration ;
+    pour les étapes par lots, ils laissent le worker détenteur du verrou s'en charger.
+    """
+    if not await get_pending_migrations(batched):
+        return 0
+
+    instance_id = f"migrate_{os.getpid()}"
+    lock_key = f"{MIGRATION_LOCK_KEY}_batched" if batched else MIGRATION_LOCK_KEY
+    while not await backend.acquire_lock(lock_key, instance_id, MIGRATION_LOCK_TTL):
+        if batched:
+            return 0
+        await asyncio.sleep(MIGRATION_POLL_INTERVAL)
+        if not await get_pending_migrations(batched):
+            return 0
+
+    try:
+        # Relire sous verrou : un autre worker a pu appliquer une partie des étapes
+        pending = await get_pending_migrations(batched)
+        for migration in pending:
+            await _apply_migration(migration, batch_size)
+        if pending and not batched:
+            await _set_database_version()
+            logger.log("DATABASE", f"Migration base de données vers v{DATABASE_VERSION} terminée")
+        return len(pending)
+    finally:
+        await backend.release_lock(lock_key, instance_id)
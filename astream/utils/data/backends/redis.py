@@ -0,0 +1,269 @@
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import orjson
+
+from astream.config.settings import settings
+from astream.utils.data.codec import encode_row, decode_payload
+from astream.utils.data.cache_stats import cache_stats
+from astream.utils.data.backends.base import CacheBackend, CacheEntry, CacheOutcome, CACHE_TABLES, get_anime_slug, get_episode_cache_id
+
+
+class RedisCacheBackend(CacheBackend):
+    """Backend de cache Redis (ou compatible protocole Redis), partagé entre instances.
+
+    Chaque entrée est un hash expirant à la fin de sa fenêtre de grâce ;
+    les verrous utilisent SET NX EX.
+    """
+
+    name = "redis"
+
+    def __init__(self, client=None, key_prefix: str = None):
+        if client is None:
+            try:
+                from redis import asyncio as redis_asyncio
+            except ImportError as e:
+                raise RuntimeError("CACHE_BACKEND=redis nécessite le paquet redis (pip install astream[redis])") from e
+            client = redis_asyncio.from_url(settings.REDIS_URL)
+        self.client = client
+        self.key_prefix = key_prefix if key_prefix is not None else settings.REDIS_KEY_PREFIX
+
+    def _key(self, cache_id: str) -> str:
+        return f"{self.key_prefix}{cache_id}"
+
+    def _season_key(self, anime_slug: str, season: int) -> str:
+        return f"{self.key_prefix}episodes:{anime_slug}:s{season}"
+
+    def _lock_key(self, lock_key: str) -> str:
+        return f"{self.key_prefix}lock:{lock_key}"
+
+    def _lock_result_key(self, lock_key: str) -> str:
+        return f"{self.key_prefix}lock_result:{lock_key}"
+
+    def _invalidation_key(self, tag: str) -> str:
+        return f"{self.key_prefix}invalidated:{tag}"
+
+    async def setup(self) -> None:
+        """Vérifie la connexion au serveur Redis."""
+        await self.client.ping()
+
+    async def teardown(self) -> None:
+        """Ferme la connexion Redis."""
+        await self.client.aclose()
+
+    async def get_entries(self, cache_ids: List[str], min_expires_at: float) -> Dict[str, CacheEntry]:
+        """Lit les entrées en un seul aller-retour (pipeline HGETALL)."""
+        if not cache_ids:
+            return {}
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            for cache_id in cache_ids:
+                pipe.hgetall(self._key(cache_id))
+            results = await pipe.execute()
+
+        entries = {}
+        for cache_id, fields in zip(cache_ids, results):
+            if not fields:
+                continue
+            expires_at = float(fields[b"expires_at"])
+            if expires_at <= min_expires_at:
+                continue
+
+            codec = fields.get(b"codec", b"").decode()
+            content = fields.get(b"content", b"").decode("utf-8")
+            payload = fields.get(b"payload")
+            decode_start = time.perf_counter()
+            try:
+                data = decode_payload(payload, codec, content)
+            except ValueError:
+                continue
+            cache_stats.record_payload(cache_id, len(payload) if payload is not None else len(content), time.perf_counter() - decode_start)
+
+            outcome = CacheOutcome(fields.get(b"outcome", b"found").decode())
+            version = int(fields.get(b"version", b"1"))
+            compute_time = float(fields.get(b"compute_time", b"0"))
+            entries[cache_id] = CacheEntry(data, float(fields[b"created_at"]), expires_at, outcome, version, compute_time)
+
+        return entries
+
+    async def set_entries(self, entries: List[Tuple[str, CacheEntry]]) -> None:
+        """Écrit les entrées dans une transaction MULTI/EXEC."""
+        if not entries:
+            return
+
+        async with self.client.pipeline(transaction=True) as pipe:
+            for cache_id, entry in entries:
+                key = self._key(cache_id)
+                fields = {"created_at": entry.created_at, "expires_at": entry.expires_at, "outcome": entry.outcome.value, "version": entry.version, "compute_time": entry.compute_time}
+                fields.update({name: value for name, value in encode_row(entry.data).items() if value is not None})
+                cache_stats.record_payload(cache_id, len(fields.get("payload") or fields.get("content", "")))
+                pipe.delete(key)
+                pipe.hset(key, mapping=fields)
+                # Conserver l'entrée pendant la fenêtre de grâce (stale-while-revalidate)
+                pipe.expireat(key, int(entry.expires_at + settings.STALE_CACHE_GRACE) + 1)
+            await pipe.execute()
+
+    async def get_episodes(self, anime_slug: str, season: int, episodes: Optional[List[int]], min_expires_at: float) -> Dict[int, CacheEntry]:
+        """Lit les épisodes d'une saison (un hash par saison, un champ par épisode)."""
+        key = self._season_key(anime_slug, season)
+        if episodes is None:
+            fields = await self.client.hgetall(key)
+        elif episodes:
+            values = await self.client.hmget(key, [str(episode) for episode in episodes])
+            fields = {str(episode).encode(): value for episode, value in zip(episodes, values) if value is not None}
+        else:
+            fields = {}
+
+        entries = {}
+        for field, value in fields.items():
+            state = orjson.loads(value)
+            if state["expires_at"] > min_expires_at:
+                entries[int(field)] = CacheEntry(state["players"], state["created_at"], state["expires_at"], CacheOutcome(state["outcome"]), state.get("version", 1))
+        return entries
+
+    async def set_episodes(self, anime_slug: str, season: int, entries: Dict[int, CacheEntry]) -> None:
+        """Remplace les champs des épisodes donnés dans le hash de la saison."""
+        if not entries:
+            return
+
+        key = self._season_key(anime_slug, season)
+        mapping = {
+            str(episode): orjson.dumps({"players": entry.data, "outcome": entry.outcome.value, "created_at": entry.created_at, "expires_at": entry.expires_at, "version": entry.version})
+            for episode, entry in entries.items()
+        }
+        expires_at = int(max(entry.expires_at for entry in entries.values()) + settings.STALE_CACHE_GRACE) + 1
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping=mapping)
+            # L'expiration du hash ne fait que reculer : un épisode court ne raccourcit pas ceux de la saison déjà en cache
+            pipe.expireat(key, expires_at, nx=True)
+            pipe.expireat(key, expires_at, gt=True)
+            await pipe.execute()
+
+    async def acquire_lock(self, lock_key: str, instance_id: str, duration: int) -> bool:
+        """Acquiert un verrou via SET NX EX."""
+        key = self._lock_key(lock_key)
+        if await self.client.set(key, instance_id, nx=True, ex=max(1, int(duration))):
+            return True
+        holder = await self.client.get(key)
+        return holder is not None and holder.decode() == instance_id
+
+    async def get_lock_holder(self, lock_key: str) -> Optional[str]:
+        """Retourne le détenteur actuel d'un verrou, None s'il est libre."""
+        holder = await self.client.get(self._lock_key(lock_key))
+        return holder.decode() if holder is not None else None
+
+    async def release_lock(self, lock_key: str, instance_id: str) -> bool:
+        """Libère le verrou uniquement s'il appartient à instance_id (WATCH/MULTI)."""
+        key = self._lock_key(lock_key)
+        async with self.client.pipeline(transaction=True) as pipe:
+            await pipe.watch(key)
+            holder = await pipe.get(key)
+            if holder is None or holder.decode() != instance_id:
+                await pipe.unwatch()
+                return False
+            pipe.multi()
+            pipe.delete(key)
+            await pipe.execute()
+        return True
+
+    async def set_lock_result(self, lock_key: str, payload: bytes, ttl: float) -> None:
+        """Publie le résultat du détenteur d'un verrou (SET PX, expiré par Redis)."""
+        await self.client.set(self._lock_result_key(lock_key), payload, px=max(1, int(ttl * 1000)))
+
+    async def get_lock_result(self, lock_key: str) -> Optional[bytes]:
+        """Retourne le résultat publié pour un verrou s'il n'a pas expiré."""
+        return await self.client.get(self._lock_result_key(lock_key))
+
+    async def publish_invalidations(self, invalidations: Dict[str, float], ttl: float) -> None:
+        """Enregistre les dates d'invalidation (une clé par étiquette, SET PX expiré par Redis)."""
+        if not invalidations:
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            for tag, invalidated_at in invalidations.items():
+                pipe.set(self._invalidation_key(tag), repr(invalidated_at), px=max(1, int(ttl * 1000)))
+            await pipe.execute()
+
+    async def get_invalidations(self, tags: List[str]) -> Dict[str, float]:
+        """Lit les dates d'invalidation des étiquettes en un aller-retour (MGET)."""
+        if not tags:
+            return {}
+        values = await self.client.mget([self._invalidation_key(tag) for tag in tags])
+        return {tag: float(value) for tag, value in zip(tags, values) if value is not None}
+
+    async def purge_slug(self, anime_slug: str) -> List[str]:
+        """Supprime la fiche et les épisodes d'un anime (as:{slug} et SCAN as:{slug}:*)."""
+        keys = [self._key(f"as:{anime_slug}")]
+        keys += [key.decode() async for key in self.client.scan_iter(match=f"{self._key(f'as:{anime_slug}')}:*", count=500)]
+        purged = [key[len(self.key_prefix):] for key in keys]
+        purged = [cache_id for cache_id in purged if get_anime_slug(cache_id) == anime_slug]
+        season_keys = [key async for key in self.client.scan_iter(match=f"{self.key_prefix}episodes:{anime_slug}:s*", count=500)]
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            for cache_id in purged:
+                pipe.delete(self._key(cache_id))
+            for season_key in season_keys:
+                pipe.hkeys(season_key)
+                pipe.delete(season_key)
+            results = await pipe.execute() if purged or season_keys else []
+
+        deleted = [cache_id for cache_id, count in zip(purged, results) if count]
+        season_results = results[len(purged):]
+        for i, season_key in enumerate(season_keys):
+            season = int(season_key.decode().rsplit(":s", 1)[1])
+            deleted += [get_episode_cache_id(anime_slug, season, int(episode)) for episode in season_results[2 * i]]
+        return deleted
+
+    async def table_report(self, limit: int) -> Dict[str, Any]:
+        """Parcourt les clés (SCAN) et retourne, par famille, le nombre d'entrées, la taille et les plus grosses clés."""
+        report = {}
+        for prefix, table_name in CACHE_TABLES.items():
+            keys = [key async for key in self.client.scan_iter(match=f"{self._key(prefix)}*", count=500)]
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.hstrlen(key, "payload")
+                    pipe.hstrlen(key, "content")
+                lengths = await pipe.execute() if keys else []
+            sizes = [(key.decode()[len(self.key_prefix):], lengths[2 * i] + lengths[2 * i + 1]) for i, key in enumerate(keys)]
+
+            sizes.sort(key=lambda item: item[1], reverse=True)
+            report[table_name] = {
+                "rows": len(sizes),
+                "bytes": sum(size for _, size in sizes),
+                "largest_keys": [{"key": key, "bytes": size} for key, size in sizes[:limit]],
+            }
+
+        # Épisodes : un hash par saison, la taille de chaque champ est celle d'un épisode
+        season_keys = [key async for key in self.client.scan_iter(match=f"{self.key_prefix}episodes:*", count=500)]
+        async with self.client.pipeline(transaction=False) as pipe:
+            for season_key in season_keys:
+                pipe.hgetall(season_key)
+            seasons = await pipe.execute() if season_keys else []
+        sizes = []
+        for season_key, fields in zip(season_keys, seasons):
+            anime_slug, season = season_key.decode()[len(f"{self.key_prefix}episodes:"):].rsplit(":s", 1)
+            sizes += [(get_episode_cache_id(anime_slug, int(season), int(episode)), len(value)) for episode, value in fields.items()]
+        sizes.sort(key=lambda item: item[1], reverse=True)
+        report["episodes"] = {
+            "rows": len(sizes),
+            "bytes": sum(size for _, size in sizes),
+            "largest_keys": [{"key": key, "bytes": size} for key, size in sizes[:limit]],
+        }
+        return report
+
+    async def iter_snapshot(self, min_expires_at: float, batch_size: int) -> AsyncIterator[List[Tuple[str, CacheEntry]]]:
+        """Parcourt les clés par SCAN et les lit par lots (cohérence par entrée, pas d'instantané global)."""
+        for prefix in CACHE_TABLES:
+            cache_ids = []
+            async for key in self.client.scan_iter(match=f"{self._key(prefix)}*", count=batch_size):
+                cache_ids.append(key.decode()[len(self.key_prefix):])
+                if len(cache_ids) >= batch_size:
+                    yield list((await self.get_entries(cache_ids, min_expires_at)).items())
+                    cache_ids = []
+            if cache_ids:
+                yield list((await self.get_entries(cache_ids, min_expires_at)).items())
+
+        async for season_key in self.client.scan_iter(match=f"{self.key_prefix}episodes:*", count=batch_size):
+            anime_slug, season = season_key.decode()[len(f"{self.key_prefix}episodes:"):].rsplit(":s", 1)
+            entries = await self.get_episodes(anime_slug, int(season), None, min_expires_at)
+            if entries:
+                yield [(get_episode_cache_id(anime_slug, int(season), episode), entry) for episode, entry in entries.items()]
@@ -0,0 +1,615 @@
+import os
+import time
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import orjson
+
+from astream.utils.logger import logger
+from astream.config.settings import database, settings
+from astream.utils.data.codec import encode_row, decode_payload
+from astream.utils.data.cache_stats import cache_stats
+from astream.utils.data.backends.migrations import ensure_migration_tables, run_migrations
+from astream.utils.data.backends.base import CacheBackend, CacheEntry, CacheOutcome, CACHE_TABLES, get_cache_table, get_anime_slug, get_episode_cache_id, get_key_family, parse_episode_cache_id, parse_field_path
+
+# Canal NOTIFY publié à la libération d'un verrou (PostgreSQL)
+LOCK_RELEASE_CHANNEL = "astream_lock_released"
+
+# Taille d'un player en base (un épisode pèse la somme de ses players)
+PLAYER_SIZE_EXPR = "LENGTH(url) + COALESCE(LENGTH(language), 0) + COALESCE(LENGTH(source), 0)"
+
+
+class SQLCacheBackend(CacheBackend):
+    """Backend de cache SQL (SQLite ou PostgreSQL via databases)."""
+
+    name = "sql"
+
+    def __init__(self):
+        # Écoute LISTEN des libérations de verrous (PostgreSQL) : lock_key -> événement des instances en attente
+        self._lock_listener: Optional[asyncio.Task] = None
+        self._lock_events: Dict[str, asyncio.Event] = {}
+
+    async def setup(self) -> None:
+        """Initialise la base de données et effectue les migrations."""
+        if settings.DATABASE_TYPE == "sqlite":
+            os.makedirs(os.path.dirname(settings.DATABASE_PATH), exist_ok=True)
+            if not os.path.exists(settings.DATABASE_PATH):
+                open(settings.DATABASE_PATH, "a").close()
+
+        await database.connect()
+
+        if settings.DATABASE_TYPE == "sqlite":
+            await database.execute("PRAGMA busy_timeout=30000")
+            await database.execute("PRAGMA journal_mode=WAL")
+            await database.execute("PRAGMA synchronous=NORMAL")
+            await database.execute("PRAGMA temp_store=MEMORY")
+            await database.execute("PRAGMA cache_size=-2000")
+            await database.execute("PRAGMA foreign_keys=ON")
+
+        # Migrations de schéma incrémentales, appliquées une seule fois sous verrou entre workers
+        await ensure_migration_tables()
+        await run_migrations(self)
+
+        # Nettoyage des caches expirés (au-delà de la fenêtre de grâce)
+        current_time = time.time() - settings.STALE_CACHE_GRACE
+        await database.execute("DELETE FROM animesama WHERE expires_at IS NOT NULL AND expires_at < :current_time;", {"current_time": current_time})
+        await database.execute("DELETE FROM tmdb WHERE expires_at IS NOT NULL AND expires_at < :current_time;", {"current_time": current_time})
+
+    async def teardown(self) -> None:
+        """Ferme la connexion à la base de données."""
+        if self._lock_listener is not None:
+            self._lock_listener.cancel()
+            await asyncio.gather(self._lock_listener, return_exceptions=True)
+        await database.disconnect()
+
+    async def run_background_migrations(self) -> int:
+        """Applique par lots les migrations de données en attente (un seul worker à la fois)."""
+        return await run_migrations(self, batched=True, batch_size=settings.CACHE_SWEEP_BATCH_SIZE)
+
+    async def get_entries(self, cache_ids: List[str], min_expires_at: float) -> Dict[str, CacheEntry]:
+        """Lit les entrées avec une seule requête WHERE key IN (...) par table."""
+        keys_by_table: Dict[str, List[str]] = {}
+        for cache_id in cache_ids:
+            table_name = get_cache_table(cache_id)
+            if table_name:
+                keys_by_table.setdefault(table_name, []).append(cache_id)
+
+        entries = {}
+        for table_name, keys in keys_by_table.items():
+            placeholders = ", ".join(f":key_{i}" for i in range(len(keys)))
+            values = {f"key_{i}": key for i, key in enumerate(keys)}
+            values["min_expires_at"] = min_expires_at
+            query = f"SELECT key, content, payload, codec, created_at, expires_at, outcome, family_version, compute_time FROM {table_name} WHERE key IN ({placeholders}) AND expires_at > :min_expires_at"
+            for row in await database.fetch_all(query, values):
+                decode_start = time.perf_counter()
+                try:
+                    data = decode_payload(row["payload"], row["codec"], row["content"])
+                except ValueError:
+                    continue
+                size = len(row["payload"]) if row["payload"] is not None else len(row["content"] or "")
+                cache_stats.record_payload(row["key"], size, time.perf_counter() - decode_start)
+                outcome = CacheOutcome(row["outcome"] or CacheOutcome.FOUND)
+                entries[row["key"]] = CacheEntry(data, row["created_at"], row["expires_at"], outcome, row["family_version"] or 1, row["compute_time"] or 0.0)
+
+        return entries
+
+    async def get_fields(self, cache_id: str, paths: List[str], min_expires_at: float) -> Optional[CacheEntry]:
+        """Extrait les chemins demandés côté base (JSON1 sous SQLite, jsonb sous PostgreSQL) sans décoder tout le document.
+
+        Les lignes compressées ou d'un codec non JSON sont décodées en Python (implémentation par défaut).
+        """
+        table_name = get_cache_table(cache_id)
+        if not table_name:
+            return None
+
+        values = {"key": cache_id, "min_expires_at": min_expires_at}
+        columns = []
+        for i, path in enumerate(paths):
+            expression, path_values = self._field_expression(path, f"path_{i}")
+            columns.append(f"{expression} AS field_{i}")
+            values.update(path_values)
+
+        row = await database.fetch_one(
+            f"SELECT codec, created_at, expires_at, outcome, family_version, compute_time, {', '.join(columns)} FROM {table_name} WHERE key = :key AND expires_at > :min_expires_at",
+            values
+        )
+        if row is None:
+            return None
+        if row["codec"] not in (None, "json", "orjson"):
+            return await super().get_fields(cache_id, paths, min_expires_at)
+
+        fields = {path: orjson.loads(row[f"field_{i}"]) if row[f"field_{i}"] is not None else None for i, path in enumerate(paths)}
+        outcome = CacheOutcome(row["outcome"] or CacheOutcome.FOUND)
+        return CacheEntry(fields, row["created_at"], row["expires_at"], outcome, row["family_version"] or 1, row["compute_time"] or 0.0)
+
+    @staticmethod
+    def _field_expression(path: str, name: str) -> Tuple[str, Dict[str, str]]:
+        """Construit l'expression SQL retournant le JSON d'un chemin de champ."""
+        segments = parse_field_path(path)
+
+        if settings.DATABASE_TYPE == "sqlite":
+            document = "CASE WHEN codec IS NULL OR codec = 'json' THEN content WHEN codec = 'orjson' THEN CAST(payload AS TEXT) END"
+
+            def to_path(parts):
+                return "$" + "".join(f"[{part}]" if isinstance(part, int) else f'."{part}"' for part in parts)
+
+            if "*" in segments:
+                position = segments.index("*")
+                expression = f"(SELECT json_group_array(json_extract(value, :{name}_item)) FROM json_each({document}, :{name}))"
+                return expression, {name: to_path(segments[:position]), f"{name}_item": to_path(segments[position + 1:])}
+            # json_quote conserve les sous-documents tels quels et encode les scalaires en JSON
+            return f"json_quote(json_extract({document}, :{name}))", {name: to_path(segments)}
+
+        document = "CASE WHEN codec IS NULL OR codec = 'json' THEN content::jsonb WHEN codec = 'orjson' THEN convert_from(payload, 'UTF8')::jsonb END"
+        json_path = "$" + "".join("[*]" if part == "*" else f"[{part}]" if isinstance(part, int) else f'."{part}"' for part in segments)
+        function = "jsonb_path_query_array" if "*" in segments else "jsonb_path_query_first"
+        return f"CAST({function}({document}, CAST(:{name} AS jsonpath)) AS TEXT)", {name: json_path}
+
+    async def set_entries(self, entries: List[Tuple[str, CacheEntry]]) -> None:
+        """Écrit les entrées dans une seule transaction (execute_many par table)."""
+        # Familles lues par projection (get_fields) : jamais compressées pour rester lisibles par JSON1/jsonb
+        projected_families = {family.strip() for family in settings.CACHE_PROJECTION_FAMILIES.split(",") if family.strip()}
+        rows_by_table: Dict[str, List[Dict[str, Any]]] = {}
+        for cache_id, entry in entries:
+            table_name = get_cache_table(cache_id)
+            if not table_name:
+                continue
+            row = {"cache_id": cache_id, "created_at": entry.created_at, "expires_at": entry.expires_at, "outcome": entry.outcome.value, "family_version": entry.version, "compute_time": entry.compute_time, "slug": get_anime_slug(cache_id)}
+            row.update(encode_row(entry.data, compress=get_key_family(cache_id) not in projected_families))
+            cache_stats.record_payload(cache_id, len(row["payload"]) if row["payload"] is not None else len(row["content"]))
+            rows_by_table.setdefault(table_name, []).append(row)
+
+        if not rows_by_table:
+            return
+
+        async with database.transaction():
+            for table_name, rows in rows_by_table.items():
+                if settings.DATABASE_TYPE == "sqlite":
+                    query = f"INSERT OR REPLACE INTO {table_name} (key, content, payload, codec, created_at, expires_at, outcome, family_version, compute_time, last_access, slug) VALUES (:cache_id, :content, :payload, :codec, :created_at, :expires_at, :outcome, :family_version, :compute_time, :created_at, :slug)"
+                else:
+                    query = f"INSERT INTO {table_name} (key, content, payload, codec, created_at, expires_at, outcome, family_version, compute_time, last_access, slug) VALUES (:cache_id, :content, :payload, :codec, :created_at, :expires_at, :outcome, :family_version, :compute_time, :created_at, :slug) ON CONFLICT (key) DO UPDATE SET content = EXCLUDED.content, payload = EXCLUDED.payload, codec = EXCLUDED.codec, created_at = EXCLUDED.created_at, expires_at = EXCLUDED.expires_at, outcome = EXCLUDED.outcome, family_version = EXCLUDED.family_version, compute_time = EXCLUDED.compute_time, last_access = EXCLUDED.last_access, slug = EXCLUDED.slug"
+                await database.execute_many(query, rows)
+
+    async def get_episodes(self, anime_slug: str, season: int, episodes: Optional[List[int]], min_expires_at: float) -> Dict[int, CacheEntry]:
+        """Lit l'état et les players d'une saison (ou de certains épisodes) en deux requêtes indexées."""
+        values = {"slug": anime_slug, "season": season}
+        episode_filter = ""
+        if episodes is not None:
+            if not episodes:
+                return {}
+            episode_filter = " AND episode IN (" + ", ".join(f":episode_{i}" for i in range(len(episodes))) + ")"
+            values.update({f"episode_{i}": episode for i, episode in enumerate(episodes)})
+
+        states = await database.fetch_all(
+            f"SELECT episode, outcome, created_at, expires_at, family_version FROM episodes WHERE slug = :slug AND season = :season{episode_filter} AND expires_at > :min_expires_at",
+            {**values, "min_expires_at": min_expires_at}
+        )
+        if not states:
+            return {}
+
+        players: Dict[int, List[Dict[str, Any]]] = {}
+        rows = await database.fetch_all(
+            f"SELECT episode, language, url, source FROM episode_players WHERE slug = :slug AND season = :season{episode_filter} ORDER BY episode, position",
+            values
+        )
+        for row in rows:
+            players.setdefault(row["episode"], []).append({"url": row["url"], "language": row["language"], "source": row["source"]})
+
+        return {
+            row["episode"]: CacheEntry(players.get(row["episode"], []), row["created_at"], row["expires_at"], CacheOutcome(row["outcome"] or CacheOutcome.FOUND), row["family_version"] or 1)
+            for row in states
+        }
+
+    async def set_episodes(self, anime_slug: str, season: int, entries: Dict[int, CacheEntry]) -> None:
+        """Remplace l'état et les players des épisodes donnés dans une seule transaction."""
+        if not entries:
+            return
+
+        keys = [{"slug": anime_slug, "season": season, "episode": episode} for episode in entries]
+        states = [
+            {**key, "outcome": entry.outcome.value, "created_at": entry.created_at, "expires_at": entry.expires_at, "family_version": entry.version, "last_access": entry.created_at}
+            for key, entry in zip(keys, entries.values())
+        ]
+        players = [
+            {**key, "position": position, "language": player.get("language"), "url": player["url"], "source": player.get("source"), "fetched_at": entry.created_at}
+            for key, entry in zip(keys, entries.values())
+            for position, player in enumerate(entry.data)
+            if player.get("url")
+        ]
+
+        if settings.DATABASE_TYPE == "sqlite":
+            state_query = "INSERT OR REPLACE INTO episodes (slug, season, episode, outcome, created_at, expires_at, family_version, last_access) VALUES (:slug, :season, :episode, :outcome, :created_at, :expires_at, :family_version, :last_access)"
+        else:
+            state_query = "INSERT INTO episodes (slug, season, episode, outcome, created_at, expires_at, family_version, last_access) VALUES (:slug, :season, :episode, :outcome, :created_at, :expires_at, :family_version, :last_access) ON CONFLICT (slug, season, episode) DO UPDATE SET outcome = EXCLUDED.outcome, created_at = EXCLUDED.created_at, expires_at = EXCLUDED.expires_at, family_version = EXCLUDED.family_version, last_access = EXCLUDED.last_access"
+
+        async with database.transaction():
+            await database.execute_many("DELETE FROM episode_players WHERE slug = :slug AND season = :season AND episode = :episode", keys)
+            await database.execute_many(state_query, states)
+            if players:
+                await database.execute_many(
+                    "INSERT INTO episode_players (slug, season, episode, position, language, url, source, fetched_at) VALUES (:slug, :season, :episode, :position, :language, :url, :source, :fetched_at)",
+                    players
+                )
+
+    async def acquire_lock(self, lock_key: str, instance_id: str, duration: int) -> bool:
+        """Acquiert un verrou en une seule requête : insertion, reprise d'un verrou expiré ou renouvellement par son détenteur."""
+        current_time = int(time.time())
+        row = await database.fetch_one(
+            "INSERT INTO scrape_lock (lock_key, instance_id, timestamp, expires_at) VALUES (:lock_key, :instance_id, :timestamp, :expires_at) "
+            "ON CONFLICT (lock_key) DO UPDATE SET instance_id = excluded.instance_id, timestamp = excluded.timestamp, expires_at = excluded.expires_at "
+            "WHERE scrape_lock.expires_at < excluded.timestamp OR scrape_lock.instance_id = excluded.instance_id "
+            "RETURNING instance_id",
+            {"lock_key": lock_key, "instance_id": instance_id, "timestamp": current_time, "expires_at": current_time + duration}
+        )
+        return row is not None
+
+    async def get_lock_holder(self, lock_key: str) -> Optional[str]:
+        """Retourne le détenteur actuel d'un verrou non expiré, None s'il est libre."""
+        return await database.fetch_val(
+            "SELECT instance_id FROM scrape_lock WHERE lock_key = :lock_key AND expires_at >= :current_time",
+            {"lock_key": lock_key, "current_time": int(time.time())}
+        )
+
+    async def release_lock(self, lock_key: str, instance_id: str) -> bool:
+        """Libère un verrou de la table scrape_lock (et réveille les instances en attente sous PostgreSQL)."""
+        values = {"lock_key": lock_key, "instance_id": instance_id}
+        if settings.DATABASE_TYPE == "sqlite":
+            await database.execute("DELETE FROM scrape_lock WHERE lock_key = :lock_key AND instance_id = :instance_id", values)
+        else:
+            await database.execute(
+                "WITH released AS (DELETE FROM scrape_lock WHERE lock_key = :lock_key AND instance_id = :instance_id RETURNING lock_key) "
+                f"SELECT pg_notify('{LOCK_RELEASE_CHANNEL}', lock_key) FROM released",
+                values
+            )
+        return True
+
+    async def wait_for_release(self, lock_key: str, timeout: float) -> None:
+        """Attend la notification de libération (LISTEN sous PostgreSQL) ou la fin du délai."""
+        if settings.DATABASE_TYPE == "sqlite":
+            await asyncio.sleep(timeout)
+            return
+
+        await self._ensure_lock_listener()
+        event = self._lock_events.setdefault(lock_key, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _ensure_lock_listener(self) -> None:
+        """Démarre la connexion dédiée à l'écoute des libérations de verrous (une par worker)."""
+        listener = self._lock_listener
+        if listener is None:
+            ready = asyncio.Event()
+            listener = self._lock_listener = asyncio.create_task(self._listen_lock_releases(ready))
+            listener.add_done_callback(self._on_lock_listener_done)
+            ready_wait = asyncio.ensure_future(ready.wait())
+            await asyncio.wait({listener, ready_wait}, return_when=asyncio.FIRST_COMPLETED)
+            ready_wait.cancel()
+        if listener.done():
+            raise RuntimeError("écoute des libérations de verrous indisponible")
+
+    async def _listen_lock_releases(self, ready: asyncio.Event) -> None:
+        # Connexion propre à cette tâche, conservée tant que le worker tourne
+        async with database.connection() as connection:
+            await connection.raw_connection.add_listener(LOCK_RELEASE_CHANNEL, self._on_lock_released)
+            ready.set()
+            await asyncio.Event().wait()
+
+    def _on_lock_listener_done(self, task: asyncio.Task) -> None:
+        self._lock_listener = None
+        if not task.cancelled() and task.exception():
+            logger.warning(f"Écoute des libérations de verrous interrompue: {task.exception()}")
+
+    def _on_lock_released(self, connection, pid, channel, lock_key) -> None:
+        event = self._lock_events.pop(lock_key, None)
+        if event:
+            event.set()
+
+    async def set_lock_result(self, lock_key: str, payload: bytes, ttl: float) -> None:
+        """Publie le résultat du détenteur d'un verrou dans la table lock_results."""
+        values = {"lock_key": lock_key, "payload": payload.decode(), "expires_at": time.time() + ttl}
+        await database.execute(
+            "INSERT INTO lock_results (lock_key, payload, expires_at) VALUES (:lock_key, :payload, :expires_at) "
+            "ON CONFLICT (lock_key) DO UPDATE SET payload = excluded.payload, expires_at = excluded.expires_at",
+            values
+        )
+
+    async def get_lock_result(self, lock_key: str) -> Optional[bytes]:
+        """Retourne le résultat publié pour un verrou s'il n'a pas expiré."""
+        row = await database.fetch_one(
+            "SELECT payload FROM lock_results WHERE lock_key = :lock_key AND expires_at >= :current_time",
+            {"lock_key": lock_key, "current_time": time.time()}
+        )
+        return row["payload"].encode() if row else None
+
+    async def cleanup_expired_locks(self) -> None:
+        """Supprime les verrous expirés de la table scrape_lock, les résultats expirés de lock_results et les invalidations périmées."""
+        current_time = int(time.time())
+        await database.execute("DELETE FROM scrape_lock WHERE expires_at < :current_time", {"current_time": current_time})
+        await database.execute("DELETE FROM lock_results WHERE expires_at < :current_time", {"current_time": current_time})
+        await database.execute("DELETE FROM response_invalidations WHERE expires_at < :current_time", {"current_time": current_time})
+
+    async def publish_invalidations(self, invalidations: Dict[str, float], ttl: float) -> None:
+        """Enregistre les dates d'invalidation dans la table response_invalidations (la plus récente est conservée)."""
+        rows = [{"tag": tag, "invalidated_at": invalidated_at, "expires_at": invalidated_at + ttl} for tag, invalidated_at in invalidations.items()]
+        if not rows:
+            return
+        await database.execute_many(
+            "INSERT INTO response_invalidations (tag, invalidated_at, expires_at) VALUES (:tag, :invalidated_at, :expires_at) "
+            "ON CONFLICT (tag) DO UPDATE SET invalidated_at = excluded.invalidated_at, expires_at = excluded.expires_at "
+            "WHERE response_invalidations.invalidated_at < excluded.invalidated_at",
+            rows
+        )
+
+    async def get_invalidations(self, tags: List[str]) -> Dict[str, float]:
+        """Lit les dates d'invalidation des étiquettes en une requête."""
+        if not tags:
+            return {}
+        placeholders = ", ".join(f":tag_{i}" for i in range(len(tags)))
+        values = {f"tag_{i}": tag for i, tag in enumerate(tags)}
+        rows = await database.fetch_all(f"SELECT tag, invalidated_at FROM response_invalidations WHERE tag IN ({placeholders})", values)
+        return {row["tag"]: row["invalidated_at"] for row in rows}
+
+    async def sweep_expired(self, cutoff: float, batch_size: int) -> Tuple[int, int]:
+        """Supprime par lots les lignes expirées avant cutoff."""
+        total_rows = 0
+        total_bytes = 0
+
+        for table_name in CACHE_TABLES.values():
+            while True:
+                rows = await database.fetch_all(
+                    f"SELECT key, LENGTH(content) + COALESCE(LENGTH(payload), 0) AS size FROM {table_name} WHERE expires_at < :cutoff LIMIT :limit",
+                    {"cutoff": cutoff, "limit": batch_size}
+                )
+                if not rows:
+                    break
+
+                placeholders = ", ".join(f":key_{i}" for i in range(len(rows)))
+                values = {f"key_{i}": row["key"] for i, row in enumerate(rows)}
+                values["cutoff"] = cutoff
+                await database.execute(f"DELETE FROM {table_name} WHERE key IN ({placeholders}) AND expires_at < :cutoff", values)
+
+                total_rows += len(rows)
+                total_bytes += sum(row["size"] or 0 for row in rows)
+                if len(rows) < batch_size:
+                    break
+                # Laisser la main aux requêtes entre deux lots
+                await asyncio.sleep(0)
+
+        while True:
+            rows = await database.fetch_all(
+                "SELECT slug, season, episode FROM episodes WHERE expires_at < :cutoff LIMIT :limit",
+                {"cutoff": cutoff, "limit": batch_size}
+            )
+            if not rows:
+                break
+
+            keys = [{"slug": row["slug"], "season": row["season"], "episode": row["episode"]} for row in rows]
+            async with database.transaction():
+                await database.execute_many("DELETE FROM episode_players WHERE slug = :slug AND season = :season AND episode = :episode", keys)
+                await database.execute_many("DELETE FROM episodes WHERE slug = :slug AND season = :season AND episode = :episode", keys)
+
+            total_rows += len(rows)
+            if len(rows) < batch_size:
+                break
+            await asyncio.sleep(0)
+
+        return total_rows, total_bytes
+
+    async def purge_slug(self, anime_slug: str) -> List[str]:
+        """Supprime les lignes d'un anime via l'index sur slug."""
+        rows = await database.fetch_all("SELECT key FROM animesama WHERE slug = :slug", {"slug": anime_slug})
+        episodes = await database.fetch_all("SELECT season, episode FROM episodes WHERE slug = :slug", {"slug": anime_slug})
+        async with database.transaction():
+            await database.execute("DELETE FROM animesama WHERE slug = :slug", {"slug": anime_slug})
+            await database.execute("DELETE FROM episode_players WHERE slug = :slug", {"slug": anime_slug})
+            await database.execute("DELETE FROM episodes WHERE slug = :slug", {"slug": anime_slug})
+        return [row["key"] for row in rows] + [get_episode_cache_id(anime_slug, row["season"], row["episode"]) for row in episodes]
+
+    async def touch_entries(self, access_times: Dict[str, float]) -> None:
+        """Met à jour last_access dans une seule transaction (execute_many par table, épisodes compris)."""
+        rows_by_table: Dict[str, List[Dict[str, Any]]] = {}
+        episode_rows: List[Dict[str, Any]] = []
+        for cache_id, last_access in access_times.items():
+            parsed = parse_episode_cache_id(cache_id)
+            if parsed:
+                episode_rows.append({"slug": parsed[0], "season": parsed[1], "episode": parsed[2], "last_access": last_access})
+                continue
+            table_name = get_cache_table(cache_id)
+            if table_name:
+                rows_by_table.setdefault(table_name, []).append({"key": cache_id, "last_access": last_access})
+
+        if not rows_by_table and not episode_rows:
+            return
+
+        async with database.transaction():
+            for table_name, rows in rows_by_table.items():
+                await database.execute_many(
+                    f"UPDATE {table_name} SET last_access = :last_access WHERE key = :key AND (last_access IS NULL OR last_access < :last_access)",
+                    rows
+                )
+            if episode_rows:
+                await database.execute_many(
+                    "UPDATE episodes SET last_access = :last_access WHERE slug = :slug AND season = :season AND episode = :episode AND (last_access IS NULL OR last_access < :last_access)",
+                    episode_rows
+                )
+
+    async def evict_lru(self, max_rows: int, max_bytes: int, batch_size: int) -> Tuple[int, int]:
+        """Supprime par lots les lignes les moins récemment utilisées tant qu'une table dépasse max_rows ou max_bytes."""
+        total_rows = 0
+        total_bytes = 0
+        size_expr = "LENGTH(content) + COALESCE(LENGTH(payload), 0)"
+
+        for table_name in CACHE_TABLES.values():
+            totals = await database.fetch_one(f"SELECT COUNT(*) AS rows, COALESCE(SUM({size_expr}), 0) AS bytes FROM {table_name}")
+            excess_rows = totals["rows"] - max_rows if max_rows > 0 else 0
+            excess_bytes = totals["bytes"] - max_bytes if max_bytes > 0 else 0
+
+            while excess_rows > 0 or excess_bytes > 0:
+                rows = await database.fetch_all(
+                    f"SELECT key, {size_expr} AS size FROM {table_name} ORDER BY last_access ASC NULLS FIRST LIMIT :limit",
+                    {"limit": batch_size}
+                )
+                if not rows:
+                    break
+
+                # Ne retenir que le nécessaire pour repasser sous les deux limites
+                victims = []
+                for row in rows:
+                    if excess_rows <= 0 and excess_bytes <= 0:
+                        break
+                    victims.append(row)
+                    excess_rows -= 1
+                    excess_bytes -= row["size"] or 0
+
+                placeholders = ", ".join(f":key_{i}" for i in range(len(victims)))
+                values = {f"key_{i}": row["key"] for i, row in enumerate(victims)}
+                await database.execute(f"DELETE FROM {table_name} WHERE key IN ({placeholders})", values)
+
+                total_rows += len(victims)
+                total_bytes += sum(row["size"] or 0 for row in victims)
+                # Laisser la main aux requêtes entre deux lots
+                await asyncio.sleep(0)
+
+        episode_rows, episode_bytes = await self._evict_lru_episodes(max_rows, max_bytes, batch_size)
+        return total_rows + episode_rows, total_bytes + episode_bytes
+
+    async def _evict_lru_episodes(self, max_rows: int, max_bytes: int, batch_size: int) -> Tuple[int, int]:
+        """Éviction LRU des épisodes : un épisode (état et players) est supprimé d'un bloc."""
+        rows_count = await database.fetch_val("SELECT COUNT(*) FROM episodes")
+        bytes_count = await database.fetch_val(f"SELECT COALESCE(SUM({PLAYER_SIZE_EXPR}), 0) FROM episode_players")
+        excess_rows = rows_count - max_rows if max_rows > 0 else 0
+        excess_bytes = bytes_count - max_bytes if max_bytes > 0 else 0
+
+        total_rows = 0
+        total_bytes = 0
+        while excess_rows > 0 or excess_bytes > 0:
+            rows = await database.fetch_all(
+                f"SELECT e.slug, e.season, e.episode, (SELECT COALESCE(SUM({PLAYER_SIZE_EXPR}), 0) FROM episode_players p "
+                "WHERE p.slug = e.slug AND p.season = e.season AND p.episode = e.episode) AS size "
+                "FROM episodes e ORDER BY e.last_access ASC NULLS FIRST LIMIT :limit",
+                {"limit": batch_size}
+            )
+            if not rows:
+                break
+
+            victims = []
+            for row in rows:
+                if excess_rows <= 0 and excess_bytes <= 0:
+                    break
+                victims.append(row)
+                excess_rows -= 1
+                excess_bytes -= row["size"] or 0
+
+            keys = [{"slug": row["slug"], "season": row["season"], "episode": row["episode"]} for row in victims]
+            async with database.transaction():
+                await database.execute_many("DELETE FROM episode_players WHERE slug = :slug AND season = :season AND episode = :episode", keys)
+                await database.execute_many("DELETE FROM episodes WHERE slug = :slug AND season = :season AND episode = :episode", keys)
+
+            total_rows += len(victims)
+            total_bytes += sum(row["size"] or 0 for row in victims)
+            await asyncio.sleep(0)
+
+        return total_rows, total_bytes
+
+    async def table_report(self, limit: int) -> Dict[str, Any]:
+        """Retourne, par table, le nombre de lignes, la taille totale et les plus grosses clés."""
+        current_time = time.time()
+        report = {}
+        for table_name in CACHE_TABLES.values():
+            size_expr = "LENGTH(content) + COALESCE(LENGTH(payload), 0)"
+            totals = await database.fetch_one(
+                f"SELECT COUNT(*) AS rows, COALESCE(SUM({size_expr}), 0) AS bytes, COALESCE(SUM(CASE WHEN expires_at <= :now THEN 1 ELSE 0 END), 0) AS expired FROM {table_name}",
+                {"now": current_time}
+            )
+            largest = await database.fetch_all(
+                f"SELECT key, {size_expr} AS size, codec FROM {table_name} ORDER BY size DESC LIMIT :limit",
+                {"limit": limit}
+            )
+            report[table_name] = {
+                "rows": totals["rows"],
+                "bytes": totals["bytes"],
+                "expired_rows": totals["expired"],
+                "largest_keys": [{"key": row["key"], "bytes": row["size"], "codec": row["codec"]} for row in largest],
+            }
+
+        episodes = await database.fetch_one(
+            "SELECT COUNT(*) AS rows, COALESCE(SUM(CASE WHEN expires_at <= :now THEN 1 ELSE 0 END), 0) AS expired FROM episodes",
+            {"now": current_time}
+        )
+        players = await database.fetch_one(f"SELECT COUNT(*) AS rows, COALESCE(SUM({PLAYER_SIZE_EXPR}), 0) AS bytes FROM episode_players")
+        largest = await database.fetch_all(
+            f"SELECT slug, season, episode, SUM({PLAYER_SIZE_EXPR}) AS size FROM episode_players GROUP BY slug, season, episode ORDER BY size DESC LIMIT :limit",
+            {"limit": limit}
+        )
+        report["episodes"] = {
+            "rows": episodes["rows"],
+            "bytes": players["bytes"],
+            "expired_rows": episodes["expired"],
+            "players": players["rows"],
+            "largest_keys": [{"key": get_episode_cache_id(row["slug"], row["season"], row["episode"]), "bytes": row["size"]} for row in largest],
+        }
+        return report
+
+    async def iter_snapshot(self, min_expires_at: float, batch_size: int) -> AsyncIterator[List[Tuple[str, CacheEntry]]]:
+        """Parcourt par lots (pagination par clé) les lignes non expirées dans une seule transaction.
+
+        La transaction fige la vue de la base (instantané WAL sous SQLite, REPEATABLE READ sous PostgreSQL) :
+        l'export reste cohérent pendant que les workers continuent d'écrire.
+        """
+        isolation = {"isolation": "repeatable_read"} if settings.DATABASE_TYPE != "sqlite" else {}
+        async with database.transaction(**isolation):
+            for table_name in CACHE_TABLES.values():
+                last_key = ""
+                while True:
+                    rows = await database.fetch_all(
+                        f"SELECT key, content, payload, codec, created_at, expires_at, outcome, family_version, compute_time FROM {table_name} WHERE key > :last_key AND expires_at > :min_expires_at ORDER BY key LIMIT :limit",
+                        {"last_key": last_key, "min_expires_at": min_expires_at, "limit": batch_size}
+                    )
+                    if not rows:
+                        break
+
+                    batch = []
+                    for row in rows:
+                        try:
+                            data = decode_payload(row["payload"], row["codec"], row["content"])
+                        except ValueError:
+                            continue
+                        outcome = CacheOutcome(row["outcome"] or CacheOutcome.FOUND)
+                        batch.append((row["key"], CacheEntry(data, row["created_at"], row["expires_at"], outcome, row["family_version"] or 1, row["compute_time"] or 0.0)))
+                    yield batch
+
+                    last_key = rows[-1]["key"]
+                    if len(rows) < batch_size:
+                        break
+
+            last = ("", -1, -1)
+            while True:
+                states = await database.fetch_all(
+                    "SELECT slug, season, episode, outcome, created_at, expires_at, family_version FROM episodes WHERE (slug, season, episode) > (:slug, :season, :episode) AND expires_at > :min_expires_at ORDER BY slug, season, episode LIMIT :limit",
+                    {"slug": last[0], "season": last[1], "episode": last[2], "min_expires_at": min_expires_at, "limit": batch_size}
+                )
+                if not states:
+                    break
+
+                # Players du lot : plage de clé primaire entre le premier et le dernier épisode lus
+                first = (states[0]["slug"], states[0]["season"], states[0]["episode"])
+                last = (states[-1]["slug"], states[-1]["season"], states[-1]["episode"])
+                players: Dict[Tuple[str, int, int], List[Dict[str, Any]]] = {}
+                rows = await database.fetch_all(
+                    "SELECT slug, season, episode, language, url, source FROM episode_players WHERE (slug, season, episode) >= (:first_slug, :first_season, :first_episode) AND (slug, season, episode) <= (:last_slug, :last_season, :last_episode) ORDER BY slug, season, episode, position",
+                    {"first_slug": first[0], "first_season": first[1], "first_episode": first[2], "last_slug": last[0], "last_season": last[1], "last_episode": last[2]}
+                )
+                for row in rows:
+                    players.setdefault((row["slug"], row["season"], row["episode"]), []).append({"url": row["url"], "language": row["language"], "source": row["source"]})
+
+                yield [
+                    (
+                        get_episode_cache_id(row["slug"], row["season"], row["episode"]),
+                        CacheEntry(players.get((row["slug"], row["season"], row["episode"]), []), row["created_at"], row["expires_at"], CacheOutcome(row["outcome"] or CacheOutcome.FOUND), row["family_version"] or 1)
+                    )
+                    for row in states
+                ]
+                if len(states) < batch_size:
+                    break
@@ -0,0 +1,137 @@
+import time
+from typing import Any, Dict, List
+
+from astream.utils.data.backends.base import get_key_family
+
+# Bornes supérieures des histogrammes
+LATENCY_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500)
+SIZE_BUCKETS_BYTES = (1024, 10 * 1024, 100 * 1024, 1024 * 1024)
+
+
+class Histogram:
+    """Histogramme à bornes fixes."""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Enregistre une observation."""
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Retourne l'état de l'histogramme sérialisable en JSON."""
+        labels = [f"<={bound}" for bound in self.buckets] + [f">{self.buckets[-1]}"]
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 3) if self.count else 0,
+            "max": round(self.max, 3),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class FamilyStats:
+    """Compteurs d'une famille de clés de cache."""
+
+    def __init__(self):
+        self.lookups = 0
+        self.memory_hits = 0
+        self.pending_hits = 0
+        self.backend_hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.lookup_latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.decode_latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.payload_bytes = Histogram(SIZE_BUCKETS_BYTES)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Retourne les compteurs et le taux de succès."""
+        hits = self.memory_hits + self.pending_hits + self.backend_hits
+        return {
+            "lookups": self.lookups,
+            "hits": hits,
+            "hit_rate": round(hits / self.lookups, 4) if self.lookups else 0,
+            "memory_hits": self.memory_hits,
+            "pending_hits": self.pending_hits,
+            "backend_hits": self.backend_hits,
+            "stale_hits": self.stale_hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "lookup_latency_ms": self.lookup_latency_ms.snapshot(),
+            "decode_latency_ms": self.decode_latency_ms.snapshot(),
+            "payload_bytes": self.payload_bytes.snapshot(),
+        }
+
+
+class CacheStats:
+    """Statistiques du cache par famille de clés (une instance par worker)."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._families: Dict[str, FamilyStats] = {}
+
+    def _family(self, family: str) -> FamilyStats:
+        stats = self._families.get(family)
+        if stats is None:
+            stats = self._families[family] = FamilyStats()
+        return stats
+
+    def record_lookup(self, cache_id: str, source: str, entry=None) -> None:
+        """Enregistre une lecture : source parmi memory, pending, backend ou miss."""
+        stats = self._family(get_key_family(cache_id))
+        stats.lookups += 1
+        if source == "miss":
+            stats.misses += 1
+            return
+        setattr(stats, f"{source}_hits", getattr(stats, f"{source}_hits") + 1)
+        if entry is not None:
+            if entry.is_stale:
+                stats.stale_hits += 1
+            if entry.is_negative:
+                stats.negative_hits += 1
+
+    def record_lookup_latency(self, cache_ids: List[str], seconds: float) -> None:
+        """Enregistre la durée d'une lecture backend pour chaque famille concernée."""
+        for family in {get_key_family(cache_id) for cache_id in cache_ids}:
+            self._family(family).lookup_latency_ms.observe(seconds * 1000)
+
+    def record_write(self, cache_id: str) -> None:
+        """Enregistre une écriture."""
+        self._family(get_key_family(cache_id)).writes += 1
+
+    def record_payload(self, cache_id: str, size: int, decode_seconds: float = None) -> None:
+        """Enregistre la taille encodée d'une entrée et, en lecture, sa durée de décodage."""
+        stats = self._family(get_key_family(cache_id))
+        stats.payload_bytes.observe(size)
+        if decode_seconds is not None:
+            stats.decode_latency_ms.observe(decode_seconds * 1000)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Retourne toutes les statistiques par famille."""
+        return {
+            "uptime": int(time.time() - self.started_at),
+            "families": {family: stats.snapshot() for family, stats in sorted(self._families.items())},
+        }
+
+    def reset(self) -> None:
+        """Remet les compteurs à zéro."""
+        self.started_at = time.time()
+        self._families.clear()
+
+
+# Instance globale (une par worker)
+cache_stats = CacheStats()
@@ -0,0 +1,85 @@
+import json
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import orjson
+
+from astream.config.settings import settings
+
+# Marqueur des lignes historiques : JSON texte dans la colonne content
+LEGACY_CODEC = "json"
+COMPRESSION_SUFFIX = "+zlib"
+
+
+def _orjson_encode(data: Any) -> bytes:
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _json_encode(data: Any) -> bytes:
+    return json.dumps(data).encode("utf-8")
+
+
+# Codecs disponibles : nom -> (encodeur, décodeur)
+_CODECS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    "orjson": (_orjson_encode, orjson.loads),
+    "json": (_json_encode, json.loads),
+}
+
+
+def register_codec(name: str, encoder: Callable[[Any], bytes], decoder: Callable[[bytes], Any]) -> None:
+    """Enregistre un codec supplémentaire (ex: msgpack)."""
+    if COMPRESSION_SUFFIX in name:
+        raise ValueError(f"Nom de codec invalide: {name}")
+    _CODECS[name] = (encoder, decoder)
+
+
+def encode_payload(data: Any, compress: bool = True) -> Tuple[Optional[bytes], str]:
+    """Encode une valeur de cache et retourne (payload, marqueur de format).
+
+    Le codec "json" conserve le format historique (payload None, texte dans content).
+    """
+    codec = settings.CACHE_CODEC
+    if codec == LEGACY_CODEC:
+        return None, LEGACY_CODEC
+    if codec not in _CODECS:
+        raise ValueError(f"Codec de cache inconnu: {codec}")
+
+    encoder, _ = _CODECS[codec]
+    payload = encoder(data)
+
+    threshold = settings.CACHE_COMPRESSION_THRESHOLD
+    if compress and threshold and len(payload) >= threshold:
+        compressed = zlib.compress(payload, settings.CACHE_COMPRESSION_LEVEL)
+        if len(compressed) < len(payload):
+            return compressed, codec + COMPRESSION_SUFFIX
+
+    return payload, codec
+
+
+def encode_row(data: Any, compress: bool = True) -> Dict[str, Any]:
+    """Prépare les colonnes content/payload/codec d'une ligne de cache."""
+    payload, codec = encode_payload(data, compress)
+    content = json.dumps(data) if payload is None else ""
+    return {"content": content, "payload": payload, "codec": codec}
+
+
+def decode_payload(payload: Optional[bytes], codec: Optional[str], content: Optional[str]) -> Any:
+    """Décode une valeur de cache selon son marqueur de format (NULL = ligne historique)."""
+    if not codec or codec == LEGACY_CODEC:
+        if not content:
+            raise ValueError("Contenu de cache vide")
+        return json.loads(content)
+
+    name = codec
+    if name.endswith(COMPRESSION_SUFFIX):
+        name = name[:-len(COMPRESSION_SUFFIX)]
+        try:
+            payload = zlib.decompress(payload)
+        except zlib.error as e:
+            raise ValueError(f"Décompression impossible: {e}") from e
+
+    if name not in _CODECS:
+        raise ValueError(f"Codec de cache inconnu: {codec}")
+
+    _, decoder = _CODECS[name]
+    return decoder(bytes(payload))
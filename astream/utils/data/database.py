@@ -1,153 +1,510 @@
 import os
+import re
+import math
 import time
-import json
+import random
 import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import orjson
 
 from astream.utils.logger import logger
-from astream.config.settings import database, settings
+from astream.config.settings import settings
+from astream.utils.data.memory_cache import memory_cache
+from astream.utils.data.cache_stats import cache_stats
+from astream.utils.data.response_cache import invalidate_responses, record_document_dependencies, record_own_invalidations
+from astream.utils.data.single_flight import single_flight
+from astream.utils.data.backends.base import CacheBackend, CacheEntry, CacheOutcome, get_cache_table, get_family_version, get_anime_slug, get_episode_cache_id, extract_field
 
-DATABASE_VERSION = "2.0"
 
+_cache_backend: Optional[CacheBackend] = None
 
-async def setup_database():
-    """Initialise la base de données et effectue les migrations."""
-    try:
-        if settings.DATABASE_TYPE == "sqlite":
-            os.makedirs(os.path.dirname(settings.DATABASE_PATH), exist_ok=True)
-            if not os.path.exists(settings.DATABASE_PATH):
-                open(settings.DATABASE_PATH, "a").close()
-
-        await database.connect()
-
-        await database.execute("CREATE TABLE IF NOT EXISTS db_version (id INTEGER PRIMARY KEY CHECK (id = 1), version TEXT)")
-        current_version = await database.fetch_val("SELECT version FROM db_version WHERE id = 1")
-
-        if current_version != DATABASE_VERSION:
-            logger.log("DATABASE", f"Migration v{current_version} → v{DATABASE_VERSION}")
-
-            if settings.DATABASE_TYPE == "sqlite":
-                allowed_tables = {'scrape_lock', 'metadata', 'animesama', 'tmdb'}
-                tables = await database.fetch_all("SELECT name FROM sqlite_master WHERE type='table' AND name NOT IN ('db_version', 'sqlite_sequence')")
-                for table in tables:
-                    table_name = table['name']
-                    if table_name not in allowed_tables:
-                        logger.warning(f"Table non autorisée ignorée: {table_name}")
-                        continue
-                    if not table_name.replace('_', '').isalnum() or len(table_name) > 64:
-                        logger.warning(f"Table format nom invalide ignorée: {table_name}")
-                        continue
-                    # Sécurisation supplémentaire : double validation du nom de table
-                    if table_name in allowed_tables and table_name.replace('_', '').isalnum():
-                        await database.execute("DROP TABLE IF EXISTS " + table_name)
-                        logger.log("DATABASE", f"Table supprimée: {table_name}")
-                    else:
-                        logger.error(f"Tentative suppression table non autorisée: {table_name}")
-            else:
-                await database.execute("""
-                    DO $$ DECLARE r RECORD;
-                    BEGIN
-                        FOR r IN (SELECT tablename FROM pg_tables WHERE schemaname = current_schema() AND tablename != 'db_version') LOOP
-                            EXECUTE 'DROP TABLE IF EXISTS ' || quote_ident(r.tablename) || ' CASCADE';
-                        END LOOP;
-                    END $$;
-                """)
-
-            if settings.DATABASE_TYPE == "sqlite":
-                await database.execute("INSERT OR REPLACE INTO db_version VALUES (1, :version)", {"version": DATABASE_VERSION})
-            else:
-                await database.execute("INSERT INTO db_version VALUES (1, :version) ON CONFLICT (id) DO UPDATE SET version = :version", {"version": DATABASE_VERSION})
-            logger.log("DATABASE", f"Migration base de données vers v{DATABASE_VERSION} terminée")
 
-        await database.execute("CREATE TABLE IF NOT EXISTS scrape_lock (lock_key TEXT PRIMARY KEY, instance_id TEXT, timestamp INTEGER, expires_at INTEGER)")
-        
-        # Nouvelles tables de cache séparées
-        await database.execute("CREATE TABLE IF NOT EXISTS animesama (key TEXT PRIMARY KEY, content TEXT NOT NULL, created_at INTEGER, expires_at INTEGER)")
-        await database.execute("CREATE TABLE IF NOT EXISTS tmdb (key TEXT PRIMARY KEY, content TEXT NOT NULL, created_at INTEGER, expires_at INTEGER)")
-        
-        # Créer les index pour optimiser les performances
-        await database.execute("CREATE INDEX IF NOT EXISTS idx_scrape_lock_key ON scrape_lock(lock_key)")
-        await database.execute("CREATE INDEX IF NOT EXISTS idx_scrape_lock_expires ON scrape_lock(expires_at)")
-        await database.execute("CREATE INDEX IF NOT EXISTS idx_animesama_key ON animesama(key)")
-        await database.execute("CREATE INDEX IF NOT EXISTS idx_animesama_expires ON animesama(expires_at)")
-        await database.execute("CREATE INDEX IF NOT EXISTS idx_tmdb_key ON tmdb(key)")
-        await database.execute("CREATE INDEX IF NOT EXISTS idx_tmdb_expires ON tmdb(expires_at)")
-        
+def _create_cache_backend(name: str) -> CacheBackend:
+    """Instancie le backend de cache configuré (CACHE_BACKEND)."""
+    if name == "sql":
+        from astream.utils.data.backends.sql import SQLCacheBackend
+        return SQLCacheBackend()
+    if name == "memory":
+        from astream.utils.data.backends.memory import MemoryCacheBackend
+        return MemoryCacheBackend()
+    if name == "redis":
+        from astream.utils.data.backends.redis import RedisCacheBackend
+        return RedisCacheBackend()
+    raise ValueError(f"Backend de cache inconnu: {name}")
+
+
+def get_cache_backend() -> CacheBackend:
+    """Retourne le backend de cache actif (créé au premier appel)."""
+    global _cache_backend
+    if _cache_backend is None:
+        _cache_backend = _create_cache_backend(settings.CACHE_BACKEND)
+    return _cache_backend
 
-        if settings.DATABASE_TYPE == "sqlite":
-            await database.execute("PRAGMA busy_timeout=30000")
-            await database.execute("PRAGMA journal_mode=WAL")
-            await database.execute("PRAGMA synchronous=NORMAL")
-            await database.execute("PRAGMA temp_store=MEMORY")
-            await database.execute("PRAGMA cache_size=-2000")
-            await database.execute("PRAGMA foreign_keys=ON")
 
-        # Nettoyage des caches expirés
-        current_time = time.time()
-        await database.execute("DELETE FROM animesama WHERE expires_at IS NOT NULL AND expires_at < :current_time;", {"current_time": current_time})
-        await database.execute("DELETE FROM tmdb WHERE expires_at IS NOT NULL AND expires_at < :current_time;", {"current_time": current_time})
+def set_cache_backend(backend: CacheBackend) -> None:
+    """Remplace le backend de cache actif (ex: Redis de substitution)."""
+    global _cache_backend
+    _cache_backend = backend
+    memory_cache.clear()
 
+
+async def setup_database():
+    """Initialise le backend de cache et effectue les migrations."""
+    try:
+        backend = get_cache_backend()
+        await backend.setup()
+        logger.log("DATABASE", f"Backend de cache: {backend.name}")
     except Exception as e:
         logger.error(f"Erreur configuration base de données: {e}")
 
 
+async def run_background_migrations() -> int:
+    """Applique les migrations de données par lots après le démarrage, pendant que le service répond."""
+    try:
+        return await get_cache_backend().run_background_migrations()
+    except Exception as e:
+        logger.error(f"Erreur migration de données en arrière-plan: {e}")
+        return 0
+
+
 async def cleanup_expired_locks():
     """Tâche de nettoyage périodique pour les verrous expirés."""
     while True:
         try:
-            current_time = int(time.time())
-            await database.execute("DELETE FROM scrape_lock WHERE expires_at < :current_time", {"current_time": current_time})
+            await get_cache_backend().cleanup_expired_locks()
         except Exception as e:
             logger.error(f"Erreur nettoyage périodique verrous: {e}")
         await asyncio.sleep(60)
 
 
+async def sweep_expired_cache() -> Tuple[int, int]:
+    """Supprime par lots les entrées de cache expirées au-delà de la fenêtre de grâce.
+
+    Retourne le nombre de lignes supprimées et la taille approximative libérée (octets).
+    """
+    cutoff = time.time() - settings.STALE_CACHE_GRACE
+    return await get_cache_backend().sweep_expired(cutoff, settings.CACHE_SWEEP_BATCH_SIZE)
+
+
+# Dates de dernier accès en attente d'écriture (éviction LRU) : cache_id -> timestamp
+_access_times: Dict[str, float] = {}
+
+
+def _is_size_bounded() -> bool:
+    """Indique si une limite de taille des tables est configurée."""
+    return settings.CACHE_MAX_ROWS > 0 or settings.CACHE_MAX_BYTES > 0
+
+
+async def flush_access_times() -> int:
+    """Écrit les dates de dernier accès accumulées par ce worker et retourne leur nombre."""
+    if not _access_times:
+        return 0
+
+    access_times = dict(_access_times)
+    _access_times.clear()
+    await get_cache_backend().touch_entries(access_times)
+    return len(access_times)
+
+
+async def evict_lru_cache() -> Tuple[int, int]:
+    """Supprime les entrées les moins récemment utilisées au-delà de CACHE_MAX_ROWS / CACHE_MAX_BYTES par table."""
+    if not _is_size_bounded():
+        return 0, 0
+    return await get_cache_backend().evict_lru(settings.CACHE_MAX_ROWS, settings.CACHE_MAX_BYTES, settings.CACHE_SWEEP_BATCH_SIZE)
+
+
+async def cleanup_expired_cache():
+    """Tâche de nettoyage périodique du cache, exécutée par un seul worker à la fois."""
+    instance_id = f"sweeper_{os.getpid()}"
+    interval = settings.CACHE_SWEEP_INTERVAL
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # Chaque worker publie ses accès avant le balayage pour que l'éviction LRU en tienne compte
+            await flush_access_times()
+
+            # Verrou conservé jusqu'à expiration : un seul balayage par intervalle tous workers confondus
+            if not await acquire_lock("cache_sweeper", instance_id, interval):
+                continue
+
+            rows, reclaimed = await sweep_expired_cache()
+            if rows:
+                logger.log("DATABASE", f"Nettoyage cache: {rows} entrées expirées supprimées ({reclaimed / 1024:.1f} Ko libérés)")
+
+            rows, reclaimed = await evict_lru_cache()
+            if rows:
+                logger.log("DATABASE", f"Éviction LRU: {rows} entrées supprimées ({reclaimed / 1024:.1f} Ko libérés)")
+        except Exception as e:
+            logger.error(f"Erreur nettoyage périodique cache: {e}")
+
+
+ANIME_SLUG_PATTERN = re.compile(r"^[a-z0-9-]+$")
+
+
+async def invalidate_anime(anime_slug: str) -> List[str]:
+    """Supprime toutes les entrées d'un anime (fiche, épisodes) et retourne les clés supprimées.
+
+    Les caches mémoire des autres workers expirent d'eux-mêmes (MEMORY_CACHE_MAX_TTL) ; leurs documents
+    en cache sont invalidés via le backend.
+    """
+    if not ANIME_SLUG_PATTERN.match(anime_slug):
+        raise ValueError(f"Slug invalide: {anime_slug}")
+
+    pending = [cache_id for cache_id in _pending_writes if get_anime_slug(cache_id) == anime_slug]
+    for cache_id in pending:
+        del _pending_writes[cache_id]
+
+    purged = await get_cache_backend().purge_slug(anime_slug)
+    for cache_id in set(purged) | set(pending) | {f"as:{anime_slug}"}:
+        memory_cache.delete(cache_id)
+        _access_times.pop(cache_id, None)
+    await _publish_invalidations(invalidate_responses([f"as:{anime_slug}"]))
+
+    logger.log("DATABASE", f"Invalidation {anime_slug}: {len(purged)} entrées supprimées")
+    return purged
+
+
+async def get_cache_entry(cache_id: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+    """Récupère une entrée de cache, éventuellement expirée (fenêtre de grâce STALE_CACHE_GRACE)."""
+    entries = await get_cache_entries([cache_id], allow_stale)
+    return entries.get(cache_id)
+
+
+async def get_cache_entries(cache_ids: List[str], allow_stale: bool = False) -> Dict[str, CacheEntry]:
+    """Récupère plusieurs entrées de cache (mémoire, file différée puis backend en une lecture)."""
+    entries = {}
+    missing_ids = []
+    for cache_id in dict.fromkeys(cache_ids):
+        cached = memory_cache.get(cache_id)
+        if cached is not None:
+            entries[cache_id] = cached
+            cache_stats.record_lookup(cache_id, "memory", cached)
+            continue
+        pending = _pending_writes.get(cache_id)
+        if pending and (allow_stale or not pending.is_stale):
+            entries[cache_id] = pending
+            cache_stats.record_lookup(cache_id, "pending", pending)
+            continue
+        if get_cache_table(cache_id):
+            missing_ids.append(cache_id)
+
+    current_time = time.time()
+    if missing_ids:
+        min_expires_at = current_time - settings.STALE_CACHE_GRACE if allow_stale else current_time
+        backend_entries = await get_cache_backend().get_entries(missing_ids, min_expires_at)
+        cache_stats.record_lookup_latency(missing_ids, time.time() - current_time)
+
+        for cache_id in missing_ids:
+            entry = backend_entries.get(cache_id)
+            # Entrée d'une ancienne version de la famille : traitée comme absente
+            if entry is not None and entry.version != get_family_version(cache_id):
+                entry = None
+            if entry is None:
+                cache_stats.record_lookup(cache_id, "miss")
+                continue
+            cache_stats.record_lookup(cache_id, "backend", entry)
+            memory_cache.set(cache_id, entry, entry.expires_at)
+            entries[cache_id] = entry
+
+    # Accès (y compris en mémoire) reportés en base par lots pour l'éviction LRU
+    if _is_size_bounded():
+        for cache_id in entries:
+            _access_times[cache_id] = current_time
+
+    record_document_dependencies(entries)
+    return entries
+
+
 async def get_metadata_from_cache(cache_id: str):
-    """Récupère les métadonnées depuis le cache."""
+    """Récupère les métadonnées depuis le cache (mémoire puis base)."""
+    entry = await get_cache_entry(cache_id)
+    return entry.data if entry else None
+
+
+async def get_metadata_many(cache_ids: List[str]) -> Dict[str, Any]:
+    """Récupère les métadonnées de plusieurs clés (clés absentes omises du résultat)."""
+    entries = await get_cache_entries(cache_ids)
+    return {cache_id: entry.data for cache_id, entry in entries.items()}
+
+
+def is_refresh_due(entry: CacheEntry) -> bool:
+    """Indique si une entrée doit être rafraîchie : expirée, ou tirage XFetch à l'approche de l'expiration (CACHE_EARLY_REFRESH)."""
     current_time = time.time()
-    
-    # Déterminer la table selon le préfixe
-    if cache_id.startswith("as:"):
-        table_name = "animesama"
-    elif cache_id.startswith("tmdb:"):
-        table_name = "tmdb"
-    else:
-        logger.warning(f"Préfixe de cache inconnu: {cache_id}")
-        return None
-    
-    query = f"SELECT content FROM {table_name} WHERE key = :cache_id AND expires_at > :current_time"
-    result = await database.fetch_one(query, {"cache_id": cache_id, "current_time": current_time})
-    if not result or not result["content"]:
+    if entry.expires_at <= current_time:
+        return True
+    if not settings.CACHE_EARLY_REFRESH or entry.compute_time <= 0:
+        return False
+    # XFetch : probabilité croissante à mesure que l'expiration approche, pondérée par le coût de calcul
+    return current_time - entry.compute_time * settings.CACHE_EARLY_REFRESH_BETA * math.log(1.0 - random.random()) >= entry.expires_at
+
+
+async def get_metadata_fields(cache_id: str, paths: List[str]) -> Optional[Dict[str, Any]]:
+    """Récupère uniquement certains champs d'une entrée (chemin -> valeur), sans décoder tout le document en base.
+
+    Chemins séparés par des points, index numériques et un joker "*" sur une liste : "seasons", "anime.*.genres".
+    """
+    cached, source = memory_cache.get(cache_id), "memory"
+    if cached is None:
+        cached, source = _pending_writes.get(cache_id), "pending"
+    if cached is not None and not cached.is_stale:
+        cache_stats.record_lookup(cache_id, source, cached)
+        record_document_dependencies({cache_id: cached})
+        return {path: extract_field(cached.data, path) for path in paths}
+
+    if not get_cache_table(cache_id):
         return None
-    try:
-        return json.loads(result["content"])
-    except json.JSONDecodeError:
+
+    current_time = time.time()
+    entry = await get_cache_backend().get_fields(cache_id, paths, current_time)
+    cache_stats.record_lookup_latency([cache_id], time.time() - current_time)
+    if entry is None or entry.version != get_family_version(cache_id):
+        cache_stats.record_lookup(cache_id, "miss")
         return None
 
+    cache_stats.record_lookup(cache_id, "backend", entry)
+    if _is_size_bounded():
+        _access_times[cache_id] = current_time
+    record_document_dependencies({cache_id: entry})
+    return entry.data
+
 
-async def set_metadata_to_cache(cache_id: str, data, ttl: int = None):
-    """Stocke les métadonnées dans le cache avec TTL intelligent."""
+async def get_season_players(anime_slug: str, season: int, episodes: Optional[List[int]] = None) -> Dict[int, CacheEntry]:
+    """Récupère les players en cache d'une saison (ou de certains épisodes) en une lecture, data étant la liste des players."""
+    entries = {}
+    missing = None
     current_time = time.time()
-    
-    # Déterminer la table selon le préfixe
-    if cache_id.startswith("as:"):
-        table_name = "animesama"
-    elif cache_id.startswith("tmdb:"):
-        table_name = "tmdb"
-    else:
-        logger.warning(f"Préfixe de cache inconnu: {cache_id}")
+    if episodes is not None:
+        missing = []
+        for episode in dict.fromkeys(episodes):
+            cache_id = get_episode_cache_id(anime_slug, season, episode)
+            cached = memory_cache.get(cache_id)
+            if cached is not None:
+                entries[episode] = cached
+                cache_stats.record_lookup(cache_id, "memory", cached)
+            else:
+                missing.append(episode)
+        if not missing:
+            _record_episode_access(anime_slug, season, entries, current_time)
+            return entries
+
+    backend_entries = await get_cache_backend().get_episodes(anime_slug, season, missing, current_time)
+    looked_up = missing if missing is not None else list(backend_entries)
+    cache_stats.record_lookup_latency([get_episode_cache_id(anime_slug, season, episode) for episode in looked_up], time.time() - current_time)
+
+    for episode in looked_up:
+        cache_id = get_episode_cache_id(anime_slug, season, episode)
+        entry = backend_entries.get(episode)
+        # Épisode écrit par une ancienne version de la famille as:episode : traité comme absent
+        if entry is not None and entry.version != get_family_version(cache_id):
+            entry = None
+        if entry is None:
+            cache_stats.record_lookup(cache_id, "miss")
+            continue
+        cache_stats.record_lookup(cache_id, "backend", entry)
+        memory_cache.set(cache_id, entry, entry.expires_at)
+        entries[episode] = entry
+
+    _record_episode_access(anime_slug, season, entries, current_time)
+    return entries
+
+
+def _record_episode_access(anime_slug: str, season: int, entries: Dict[int, CacheEntry], current_time: float) -> None:
+    # Accès reportés en base par lots pour l'éviction LRU des épisodes
+    if _is_size_bounded():
+        for episode in entries:
+            _access_times[get_episode_cache_id(anime_slug, season, episode)] = current_time
+    record_document_dependencies({get_episode_cache_id(anime_slug, season, episode): entry for episode, entry in entries.items()})
+
+
+async def get_episode_players(anime_slug: str, season: int, episode: int) -> Optional[CacheEntry]:
+    """Récupère les players en cache d'un épisode."""
+    entries = await get_season_players(anime_slug, season, [episode])
+    return entries.get(episode)
+
+
+async def set_season_players(anime_slug: str, season: int, episodes: Dict[int, Tuple[List[Dict[str, Any]], CacheOutcome]], ttl: int = None) -> None:
+    """Remplace en une transaction les players de plusieurs épisodes d'une saison (les autres épisodes sont conservés).
+
+    Chaque épisode est associé à (players, outcome) ; le TTL est réduit pour les résultats négatifs ou partiels.
+    """
+    current_time = time.time()
+    entries = {}
+    for episode, (players, outcome) in episodes.items():
+        episode_ttl = settings.EPISODE_TTL if ttl is None else ttl
+        if outcome != CacheOutcome.FOUND:
+            episode_ttl = min(episode_ttl, _get_outcome_ttl(outcome))
+
+        cache_id = get_episode_cache_id(anime_slug, season, episode)
+        entry = CacheEntry(players, current_time, current_time + _apply_ttl_jitter(episode_ttl), outcome, get_family_version(cache_id))
+        entries[episode] = entry
+        cache_stats.record_write(cache_id)
+        memory_cache.set(cache_id, entry, entry.expires_at)
+
+    episode_entries = {get_episode_cache_id(anime_slug, season, episode): entry for episode, entry in entries.items()}
+    record_document_dependencies(episode_entries)
+    tags = invalidate_responses(episode_entries)
+    await get_cache_backend().set_episodes(anime_slug, season, entries)
+    await _publish_invalidations(tags)
+
+
+async def set_episode_players(anime_slug: str, season: int, episode: int, players: List[Dict[str, Any]], outcome: CacheOutcome = CacheOutcome.FOUND, ttl: int = None) -> None:
+    """Remplace les players en cache d'un épisode."""
+    await set_season_players(anime_slug, season, {episode: (players, outcome)}, ttl)
+
+
+_background_refreshes: dict[str, asyncio.Task] = {}
+
+
+def schedule_background_refresh(cache_id: str, refresh_func) -> None:
+    """Lance un rafraîchissement unique en arrière-plan pour une entrée expirée ou proche de l'expiration."""
+    if cache_id in _background_refreshes:
         return
-    
-    # TTL intelligent si pas spécifié
-    if ttl is None:
-        ttl = await _calculate_context_aware_ttl(cache_id)
-    
-    expires_at = current_time + ttl
-    if settings.DATABASE_TYPE == "sqlite":
-        query = f"INSERT OR REPLACE INTO {table_name} (key, content, created_at, expires_at) VALUES (:cache_id, :content, :created_at, :expires_at)"
-    else:
-        query = f"INSERT INTO {table_name} (key, content, created_at, expires_at) VALUES (:cache_id, :content, :created_at, :expires_at) ON CONFLICT (key) DO UPDATE SET content = :content, created_at = :created_at, expires_at = :expires_at"
-    values = {"cache_id": cache_id, "content": json.dumps(data), "created_at": current_time, "expires_at": expires_at}
-    await database.execute(query, values)
+
+    async def _run():
+        try:
+            await refresh_func()
+        except Exception as e:
+            logger.warning(f"Échec rafraîchissement arrière-plan {cache_id}: {e}")
+        finally:
+            _background_refreshes.pop(cache_id, None)
+
+    logger.log("DATABASE", f"Cache servi {cache_id} - Rafraîchissement en arrière-plan")
+    _background_refreshes[cache_id] = asyncio.create_task(_run())
+
+
+async def set_metadata_to_cache(cache_id: str, data, ttl: int = None, outcome: CacheOutcome = CacheOutcome.FOUND, compute_time: float = 0.0):
+    """Stocke les métadonnées dans le cache avec TTL intelligent (réduit pour les résultats négatifs ou partiels)."""
+    await set_metadata_many([(cache_id, data, ttl, outcome, compute_time)])
+
+
+async def set_metadata_many(items: List[Tuple]):
+    """Stocke plusieurs entrées dans une seule transaction (ou dans la file d'écriture différée).
+
+    Chaque élément est un tuple (cache_id, data[, ttl[, outcome[, compute_time]]]),
+    compute_time étant la durée de récupération en secondes (rafraîchissement anticipé).
+    """
+    current_time = time.time()
+    entries: List[Tuple[str, CacheEntry]] = []
+    for item in items:
+        cache_id, data = item[0], item[1]
+        ttl = item[2] if len(item) > 2 else None
+        outcome = item[3] if len(item) > 3 else CacheOutcome.FOUND
+        compute_time = item[4] if len(item) > 4 else 0.0
+
+        if not get_cache_table(cache_id):
+            continue
+
+        # TTL court pour les résultats négatifs/partiels, sinon TTL intelligent si pas spécifié
+        if outcome != CacheOutcome.FOUND:
+            outcome_ttl = _get_outcome_ttl(outcome)
+            ttl = outcome_ttl if ttl is None else min(ttl, outcome_ttl)
+        elif ttl is None:
+            ttl = await _calculate_context_aware_ttl(cache_id)
+
+        entry = CacheEntry(data, current_time, current_time + _apply_ttl_jitter(ttl), outcome, get_family_version(cache_id), compute_time)
+        entries.append((cache_id, entry))
+        cache_stats.record_write(cache_id)
+        memory_cache.set(cache_id, entry, entry.expires_at)
+
+    if not entries:
+        return
+
+    record_document_dependencies(dict(entries))
+    tags = invalidate_responses(cache_id for cache_id, _ in entries)
+
+    if settings.CACHE_WRITE_BEHIND:
+        for cache_id, entry in entries:
+            _pending_writes[cache_id] = entry
+        # Publiées aux autres workers une fois les entrées écrites en base
+        _pending_invalidations.update(tags)
+        if len(_pending_writes) >= settings.CACHE_WRITE_BEHIND_MAX_ITEMS:
+            _write_behind_event.set()
+        return
+
+    await get_cache_backend().set_entries(entries)
+    await _publish_invalidations(tags)
+
+
+# File d'écriture différée (CACHE_WRITE_BEHIND) : cache_id -> entrée
+_pending_writes: Dict[str, CacheEntry] = {}
+# Étiquettes de documents invalidées par les écritures de la file
+_pending_invalidations: Set[str] = set()
+_write_behind_event = asyncio.Event()
+_write_behind_stop = asyncio.Event()
+
+
+async def _publish_invalidations(tags: Set[str]) -> None:
+    """Publie aux autres workers l'invalidation des documents étiquetés (après l'écriture en base)."""
+    if not tags:
+        return
+    invalidated_at = time.time()
+    record_own_invalidations(tags, invalidated_at)
+    await get_cache_backend().publish_invalidations(dict.fromkeys(tags, invalidated_at), settings.RESPONSE_CACHE_TTL)
+
+
+async def flush_pending_writes() -> int:
+    """Écrit en base toutes les entrées en attente et retourne leur nombre."""
+    if not _pending_writes:
+        return 0
+
+    pending = list(_pending_writes.items())
+    _pending_writes.clear()
+    tags = set(_pending_invalidations)
+    _pending_invalidations.clear()
+    try:
+        await get_cache_backend().set_entries(pending)
+    except BaseException:
+        # Remettre en file sans écraser les écritures plus récentes (y compris sur annulation)
+        for cache_id, value in pending:
+            _pending_writes.setdefault(cache_id, value)
+        _pending_invalidations.update(tags)
+        raise
+    await _publish_invalidations(tags)
+
+    logger.debug(f"Écriture différée: {len(pending)} entrées écrites")
+    return len(pending)
+
+
+async def run_write_behind_flusher():
+    """Tâche d'écriture périodique de la file différée (toutes les N ms ou dès M entrées).
+
+    S'arrête via stop_write_behind_flusher() après l'écriture en cours, sans l'interrompre.
+    """
+    interval = settings.CACHE_WRITE_BEHIND_INTERVAL_MS / 1000
+    while not _write_behind_stop.is_set():
+        try:
+            await asyncio.wait_for(_write_behind_event.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+        _write_behind_event.clear()
+
+        try:
+            await flush_pending_writes()
+        except Exception as e:
+            logger.error(f"Erreur écriture différée du cache: {e}")
+
+
+def stop_write_behind_flusher() -> None:
+    """Demande l'arrêt de la tâche d'écriture différée une fois l'écriture en cours terminée."""
+    _write_behind_stop.set()
+    _write_behind_event.set()
+
+
+def _apply_ttl_jitter(ttl: float) -> float:
+    """Réduit aléatoirement le TTL (CACHE_TTL_JITTER) pour que des clés écrites ensemble n'expirent pas au même instant."""
+    if settings.CACHE_TTL_JITTER > 0:
+        ttl *= 1 - random.uniform(0, min(settings.CACHE_TTL_JITTER, 1))
+    return ttl
+
+
+def _get_outcome_ttl(outcome: CacheOutcome) -> int:
+    """Retourne le TTL court associé à un résultat négatif ou partiel."""
+    if outcome == CacheOutcome.NOT_FOUND:
+        return settings.NOT_FOUND_TTL
+    if outcome == CacheOutcome.PARTIAL:
+        return settings.PARTIAL_RESULT_TTL
+    return settings.UPSTREAM_ERROR_TTL
 
 
 async def _calculate_context_aware_ttl(cache_id: str) -> int:
@@ -202,31 +559,13 @@ async def _calculate_context_aware_ttl(cache_id: str) -> int:
 async def acquire_lock(lock_key: str, instance_id: str, duration: int = None) -> bool:
     """Acquiert un verrou distribué pour la clé donnée."""
     try:
-        current_time = int(time.time())
         lock_duration = duration if duration is not None else settings.SCRAPE_LOCK_TTL
-        expires_at = current_time + lock_duration
-        
-        if settings.DATABASE_TYPE == "sqlite":
-            query = "INSERT OR IGNORE INTO scrape_lock (lock_key, instance_id, timestamp, expires_at) VALUES (:lock_key, :instance_id, :timestamp, :expires_at)"
+        acquired = await get_cache_backend().acquire_lock(lock_key, instance_id, lock_duration)
+        if acquired:
+            logger.debug(f"Verrou acquis: {lock_key}")
         else:
-            query = "INSERT INTO scrape_lock (lock_key, instance_id, timestamp, expires_at) VALUES (:lock_key, :instance_id, :timestamp, :expires_at) ON CONFLICT (lock_key) DO NOTHING"
-        await database.execute(query, {"lock_key": lock_key, "instance_id": instance_id, "timestamp": current_time, "expires_at": expires_at})
-        
-        existing_lock = await database.fetch_one("SELECT instance_id, expires_at FROM scrape_lock WHERE lock_key = :lock_key", {"lock_key": lock_key})
-        
-        if existing_lock:
-            if existing_lock["expires_at"] < current_time:
-                deleted = await database.execute("DELETE FROM scrape_lock WHERE lock_key = :lock_key AND expires_at < :current_time", {"lock_key": lock_key, "current_time": current_time})
-                return await acquire_lock(lock_key, instance_id, duration) if deleted else False
-            if existing_lock["instance_id"] == instance_id:
-                logger.debug(f"Verrou acquis: {lock_key}")
-                return True
-            else:
-                logger.debug(f"Verrou déjà détenu par autre instance: {lock_key}")
-                return False
-        
-        logger.debug(f"Verrou acquis: {lock_key}")
-        return True
+            logger.debug(f"Verrou déjà détenu par autre instance: {lock_key}")
+        return acquired
     except Exception as e:
         logger.warning(f"Échec acquisition verrou {lock_key}: {e}")
         return False
@@ -235,7 +574,7 @@ async def acquire_lock(lock_key: str, instance_id: str, duration: int = None) ->
 async def release_lock(lock_key: str, instance_id: str) -> bool:
     """Libère un verrou distribué pour la clé donnée."""
     try:
-        await database.execute("DELETE FROM scrape_lock WHERE lock_key = :lock_key AND instance_id = :instance_id", {"lock_key": lock_key, "instance_id": instance_id})
+        await get_cache_backend().release_lock(lock_key, instance_id)
         logger.debug(f"Verrou libéré: {lock_key}")
         return True
     except Exception as e:
@@ -243,26 +582,97 @@ async def release_lock(lock_key: str, instance_id: str) -> bool:
         return False
 
 
+async def wait_for_lock_release(lock_key: str, timeout: float) -> None:
+    """Attend la libération d'un verrou (notification du backend si disponible) ou la fin du délai."""
+    try:
+        await get_cache_backend().wait_for_release(lock_key, timeout)
+    except Exception as e:
+        logger.debug(f"Attente notification verrou {lock_key} indisponible: {e}")
+        await asyncio.sleep(timeout)
+
+
+async def get_lock_holder(lock_key: str) -> Optional[str]:
+    """Retourne le détenteur actuel d'un verrou, None s'il est libre ou en cas d'erreur."""
+    try:
+        return await get_cache_backend().get_lock_holder(lock_key)
+    except Exception as e:
+        logger.debug(f"Lecture détenteur verrou {lock_key} impossible: {e}")
+        return None
+
+
+async def publish_lock_result(lock_key: str, instance_id: str, result: Dict[str, Any], ttl: float) -> None:
+    """Publie le résultat d'une détention de verrou ({"value": ...} ou {"error": ...}) avant sa libération.
+
+    Le résultat est rangé sous l'identifiant du détenteur : seules les instances qui l'ont vu détenir le verrou le lisent.
+    """
+    try:
+        await get_cache_backend().set_lock_result(f"{lock_key}:{instance_id}", orjson.dumps(result), ttl)
+    except Exception as e:
+        logger.warning(f"Échec publication résultat verrou {lock_key}: {e}")
+
+
+async def get_lock_result(lock_key: str, instance_id: str) -> Optional[Dict[str, Any]]:
+    """Retourne le résultat publié par le détenteur instance_id d'un verrou, None sinon."""
+    try:
+        payload = await get_cache_backend().get_lock_result(f"{lock_key}:{instance_id}")
+    except Exception as e:
+        logger.debug(f"Lecture résultat verrou {lock_key} impossible: {e}")
+        return None
+    return orjson.loads(payload) if payload is not None else None
+
+
+# Attente entre deux tentatives d'acquisition : backoff exponentiel avec jitter
+LOCK_BACKOFF_INITIAL = 0.05
+LOCK_BACKOFF_MAX = 1.0
+# Conservation d'un résultat publié : le temps que les instances en attente se réveillent
+LOCK_RESULT_TTL = 10
+
+
 class DistributedLock:
     """Gestionnaire de contexte pour le verrouillage distribué."""
     def __init__(self, lock_key: str, instance_id: str = None, duration: int = None):
         self.lock_key = lock_key
-        self.instance_id = instance_id or f"astream_{int(time.time())}"
+        # Identifiant propre à chaque détenteur : deux tâches du même worker ne partagent jamais un verrou
+        self.instance_id = instance_id or f"astream_{os.getpid()}_{os.urandom(4).hex()}"
         self.duration = duration if duration is not None else settings.SCRAPE_LOCK_TTL
         self.acquired = False
     
     async def __aenter__(self):
+        await self._acquire()
+        return self
+
+    async def _acquire(self, shared_result: bool = False) -> Optional[Dict[str, Any]]:
+        """Acquiert le verrou ; avec shared_result, s'arrête dès qu'un détenteur observé pendant l'attente a publié son résultat et le retourne."""
         start_time = time.time()
         timeout = settings.SCRAPE_WAIT_TIMEOUT
+        delay = LOCK_BACKOFF_INITIAL
+        # Détenteurs vus pendant l'attente : seuls leurs résultats sont acceptés (jamais celui d'une détention antérieure)
+        holders: List[str] = []
         
-        while time.time() - start_time < timeout:
+        while True:
+            for holder in holders:
+                result = await get_lock_result(self.lock_key, holder)
+                if result is not None:
+                    return result
+            
             self.acquired = await acquire_lock(self.lock_key, self.instance_id, self.duration)
             if self.acquired:
                 logger.debug(f"Verrou acquis {self.lock_key} après {time.time() - start_time:.2f}s")
-                return self
+                return None
+            
+            if shared_result:
+                holder = await get_lock_holder(self.lock_key)
+                if holder and holder not in holders:
+                    holders.append(holder)
             
+            remaining = timeout - (time.time() - start_time)
+            if remaining <= 0:
+                break
+            
+            # Réveil immédiat à la libération si le backend la notifie ; sinon nouvelle tentative après backoff
             logger.debug(f"Attente verrou {self.lock_key}...")
-            await asyncio.sleep(1)
+            await wait_for_lock_release(self.lock_key, min(remaining, delay * random.uniform(0.5, 1.5)))
+            delay = min(delay * 2, LOCK_BACKOFF_MAX)
             
         raise LockAcquisitionError(f"Impossible d'acquérir le verrou {self.lock_key} après {timeout}s")
 
@@ -270,15 +680,59 @@ class DistributedLock:
         if self.acquired:
             await release_lock(self.lock_key, self.instance_id)
 
+    async def run(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Exécute factory() sous le verrou et transmet son résultat (ou son échec) aux instances en attente.
+
+        Une instance en attente reçoit directement la valeur du détenteur, sans relire le cache ;
+        si le détenteur a échoué, elle lève LockHolderError au lieu de refaire le travail.
+        Une instance qui acquiert le verrou exécute toujours factory() : les résultats ne sont
+        transmis qu'aux instances ayant attendu pendant cette détention.
+        """
+        result = await self._acquire(shared_result=True)
+        if result is not None:
+            if "error" in result:
+                raise LockHolderError(f"Échec du détenteur du verrou {self.lock_key}: {result['error']}")
+            logger.debug(f"Résultat reçu du détenteur du verrou {self.lock_key}")
+            return result.get("value")
+        
+        try:
+            value = await factory()
+        except Exception as e:
+            await publish_lock_result(self.lock_key, self.instance_id, {"error": f"{type(e).__name__}: {e}"}, LOCK_RESULT_TTL)
+            raise
+        else:
+            await publish_lock_result(self.lock_key, self.instance_id, {"value": value}, LOCK_RESULT_TTL)
+            return value
+        finally:
+            await release_lock(self.lock_key, self.instance_id)
+            self.acquired = False
+
 
 class LockAcquisitionError(Exception):
     """Levée lorsqu'un verrou ne peut pas être acquis."""
     pass
 
 
+class LockHolderError(Exception):
+    """Levée chez une instance en attente lorsque le détenteur du verrou a échoué pendant son attente."""
+    pass
+
+
+async def get_cache_report(limit: int = 10) -> Dict[str, Any]:
+    """Rapport du cache : statistiques du worker et contenu du backend (tailles, plus grosses clés)."""
+    return {
+        "backend": get_cache_backend().name,
+        "memory_cache_items": len(memory_cache),
+        "pending_writes": len(_pending_writes),
+        "stats": cache_stats.snapshot(),
+        "single_flight": single_flight.snapshot(),
+        "tables": await get_cache_backend().table_report(limit),
+    }
+
+
 async def teardown_database():
-    """Ferme la connexion à la base de données."""
+    """Ferme la connexion du backend de cache."""
     try:
-        await database.disconnect()
+        await get_cache_backend().teardown()
     except Exception as e:
         logger.error(f"Erreur fermeture base de données: {e}")
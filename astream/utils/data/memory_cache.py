@@ -0,0 +1,64 @@
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from astream.config.settings import settings
+
+
+class MemoryCache:
+    """Cache mémoire LRU/TTL par worker placé devant les tables de cache."""
+
+    def __init__(self, max_items: int = None, max_ttl: int = None):
+        self.max_items = max_items if max_items is not None else settings.MEMORY_CACHE_MAX_ITEMS
+        self.max_ttl = max_ttl if max_ttl is not None else settings.MEMORY_CACHE_MAX_TTL
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        """Indique si le cache mémoire est actif."""
+        return self.max_items > 0 and self.max_ttl > 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Retourne la valeur si présente et non expirée (None sinon)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.time():
+            self._entries.pop(key, None)
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        """Stocke une valeur en respectant l'expiration de l'entrée en base."""
+        if not self.enabled:
+            return
+
+        # Borne le TTL local pour limiter la divergence entre workers
+        expires_at = min(expires_at, time.time() + self.max_ttl)
+        if expires_at <= time.time():
+            return
+
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_items:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """Supprime une entrée du cache mémoire."""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Vide entièrement le cache mémoire."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Instance globale (une par worker)
+memory_cache = MemoryCache()
@@ -0,0 +1,143 @@
+import time
+import hashlib
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Optional, Set
+
+import orjson
+from fastapi import Request, Response
+
+from astream.config.settings import settings
+from astream.utils.data.memory_cache import MemoryCache, memory_cache
+from astream.utils.data.backends.base import get_anime_slug
+
+
+class DocumentBuild:
+    """Clés de cache lues et écrites pendant la construction d'un document (étiquettes et expiration)."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.expires_at = float("inf")
+        self.tags: Set[str] = set()
+        self.written_at: Dict[str, float] = {}
+
+    def record(self, cache_id: str, expires_at: float) -> None:
+        """Ajoute une clé utilisée : le document n'est pas conservé au-delà de son expiration."""
+        self.tags.add(cache_id)
+        self.expires_at = min(self.expires_at, expires_at)
+
+
+# Construction en cours dans la requête (partagée avec les tâches qu'elle lance)
+_current_build: ContextVar[Optional[DocumentBuild]] = ContextVar("response_document_build", default=None)
+
+
+class ResponseCache(MemoryCache):
+    """Cache par worker des réponses JSON déjà sérialisées, invalidé par étiquettes (clés as: sous-jacentes)."""
+
+    def get_document(self, key: str) -> Optional[tuple]:
+        """Retourne (document sérialisé, étiquettes, début de construction, écritures propres) s'il est présent."""
+        return self.get(key)
+
+    def set_document(self, key: str, body: bytes, tags: Iterable[str], build: DocumentBuild, expires_at: float) -> None:
+        """Stocke un document sérialisé avec les étiquettes qui l'invalident."""
+        self.set(key, (body, frozenset(tags), build.started_at, dict(build.written_at)), expires_at)
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """Supprime les documents portant l'une des étiquettes et retourne leur nombre."""
+        tags = set(tags)
+        stale = [key for key, (_, (_, entry_tags, _, _)) in self._entries.items() if entry_tags & tags]
+        for key in stale:
+            self.delete(key)
+        return len(stale)
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_ITEMS, settings.RESPONSE_CACHE_TTL)
+
+
+def anime_tag(anime_slug: str) -> str:
+    """Étiquette couvrant la fiche et les épisodes d'un anime."""
+    return f"anime:{anime_slug}"
+
+
+def get_invalidation_tags(cache_id: str) -> set:
+    """Étiquettes de documents à invalider lorsqu'une clé de cache est écrite."""
+    tags = {cache_id}
+    anime_slug = get_anime_slug(cache_id)
+    if anime_slug:
+        tags.add(anime_tag(anime_slug))
+    return tags
+
+
+def start_document_build() -> DocumentBuild:
+    """Commence le suivi des clés utilisées par le document construit dans la requête courante."""
+    build = DocumentBuild()
+    _current_build.set(build)
+    return build
+
+
+def record_document_dependencies(entries: Dict[str, Any]) -> None:
+    """Note les entrées (cache_id -> CacheEntry) lues ou écrites pendant la construction d'un document."""
+    build = _current_build.get()
+    if build is None:
+        return
+    for cache_id, entry in entries.items():
+        build.record(cache_id, entry.expires_at)
+
+
+def invalidate_responses(cache_ids: Iterable[str]) -> Set[str]:
+    """Invalide les documents locaux dépendant des clés écrites et retourne les étiquettes à publier aux autres workers."""
+    if not response_cache.enabled:
+        return set()
+    tags = set()
+    for cache_id in cache_ids:
+        tags |= get_invalidation_tags(cache_id)
+    response_cache.invalidate(tags)
+    return tags
+
+
+def record_own_invalidations(tags: Iterable[str], invalidated_at: float) -> None:
+    """Note les invalidations publiées par la requête elle-même (elles ne rendent pas son document périmé)."""
+    build = _current_build.get()
+    if build is None:
+        return
+    for tag in tags:
+        build.written_at[tag] = invalidated_at
+
+
+def response_document_key(request: Request, route: str, config: Optional[dict], *params: Any) -> str:
+    """Clé d'un document : route, paramètres, URL de base (liens générés) et configuration canonique."""
+    canonical_config = orjson.dumps(config or {}, option=orjson.OPT_SORT_KEYS)
+    config_hash = hashlib.sha1(canonical_config).hexdigest()
+    return "|".join([route, str(request.base_url), *(str(param) for param in params), config_hash])
+
+
+async def get_cached_response(key: str) -> Optional[Response]:
+    """Retourne la réponse brute en cache, sans décodage ni ré-encodage, si aucun worker n'a invalidé ses étiquettes depuis."""
+    cached = response_cache.get_document(key)
+    if cached is None:
+        return None
+
+    body, tags, built_at, written_at = cached
+    from astream.utils.data.database import get_cache_backend
+    invalidations = await get_cache_backend().get_invalidations(list(tags))
+    stale = [tag for tag, invalidated_at in invalidations.items() if invalidated_at > written_at.get(tag, built_at)]
+    if stale:
+        response_cache.delete(key)
+        # Entrées réécrites par un autre worker : ne pas reconstruire le document depuis la copie mémoire locale
+        for tag in stale:
+            memory_cache.delete(tag)
+        return None
+    return Response(content=body, media_type="application/json")
+
+
+def cache_response(key: str, document: dict, tags: Iterable[str], cacheable: bool = True, ttl: Optional[float] = None) -> Response:
+    """Sérialise une fois le document, le met en cache si cacheable et le retourne en réponse brute.
+
+    Le document est étiqueté avec les clés de cache utilisées pour le construire et n'est pas conservé
+    au-delà de leur expiration, ni de ttl (RESPONSE_CACHE_TTL par défaut) après le début de sa construction.
+    """
+    body = orjson.dumps(document)
+    build = _current_build.get()
+    if cacheable and build is not None:
+        ttl = settings.RESPONSE_CACHE_TTL if ttl is None else min(ttl, settings.RESPONSE_CACHE_TTL)
+        response_cache.set_document(key, body, build.tags | set(tags), build, min(build.expires_at, build.started_at + ttl))
+    return Response(content=body, media_type="application/json")
@@ -0,0 +1,68 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+from astream.utils.logger import logger
+from astream.utils.data.backends.base import get_key_family
+
+T = TypeVar("T")
+
+
+def _flight_family(key: str) -> str:
+    """Famille d'une clé : famille de cache (as:episode...) ou préfixe (resolve, scrape)."""
+    family = get_key_family(key)
+    return family if family != "other" else key.split(":", 1)[0]
+
+
+class SingleFlight:
+    """Regroupe les appels simultanés d'un même calcul dans le worker (un seul appel amont par clé).
+
+    Le premier appelant lance le calcul dans une tâche ; les suivants attendent le même résultat
+    (ou la même exception). L'annulation d'un appelant n'interrompt pas le calcul partagé.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, "asyncio.Task[Any]"] = {}
+        self._leaders: Dict[str, int] = {}
+        self._coalesced: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """Exécute factory() une seule fois pour tous les appels simultanés de la même clé."""
+        family = _flight_family(key)
+        task = self._calls.get(key)
+        if task is not None:
+            self._coalesced[family] = self._coalesced.get(family, 0) + 1
+            logger.debug(f"Appel regroupé sur le calcul en cours {key}")
+            return await asyncio.shield(task)
+
+        self._leaders[family] = self._leaders.get(family, 0) + 1
+        task = asyncio.ensure_future(factory())
+        self._calls[key] = task
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: "asyncio.Task[Any]") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Exception consommée même si tous les appelants ont été annulés
+        if not task.cancelled():
+            task.exception()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Retourne, par famille, les calculs lancés et les appels regroupés."""
+        families = sorted(set(self._leaders) | set(self._coalesced))
+        return {
+            "in_flight": len(self._calls),
+            "families": {family: {"calls": self._leaders.get(family, 0), "coalesced": self._coalesced.get(family, 0)} for family in families},
+        }
+
+    def reset(self) -> None:
+        """Remet les compteurs à zéro (les calculs en cours sont conservés)."""
+        self._leaders.clear()
+        self._coalesced.clear()
+
+
+# Instance globale (une par worker)
+single_flight = SingleFlight()
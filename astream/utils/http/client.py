@@ -1,10 +1,12 @@
 import httpx
 import asyncio
 import random
+from typing import Any, Awaitable, Callable, Dict, Tuple
 from urllib.parse import urlparse
 
 from astream.config.settings import settings
 from astream.utils.logger import logger
+from astream.utils.http.concurrency import HostConcurrencyLimiter
 
 
 USER_AGENT_POOL = [
@@ -27,7 +29,6 @@ def get_default_headers():
         "Accept-Language": "fr-FR,fr;q=0.9,en;q=0.8",
         "Cache-Control": "max-age=0",
         "Upgrade-Insecure-Requests": "1",
-        "Connection": "keep-alive",
     }
 
 def get_sibnet_headers(referer_url):
@@ -39,8 +40,7 @@ def get_sibnet_headers(referer_url):
         "Range": "bytes=0-",
         "Cache-Control": "no-cache",
         "Pragma": "no-cache",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Connection": "keep-alive"
+        "Accept-Encoding": "gzip, deflate, br"
     }
 
 
@@ -64,6 +64,72 @@ def should_bypass_proxy(url: str) -> bool:
         return False
 
 
+# Pools de connexions séparés : anime-sama, TMDB, et hôtes des players (ainsi que tout autre hôte)
+HTTP_POOLS = ("animesama", "tmdb", "players")
+
+
+def get_pool_name(url: str) -> str:
+    """Détermine le pool de connexions d'une URL selon son hôte."""
+    host = (urlparse(url).hostname or "").lower()
+    animesama_host = (urlparse(settings.ANIMESAMA_URL or "").hostname or "").lower()
+    if animesama_host and (host == animesama_host or host.endswith(f".{animesama_host}")):
+        return "animesama"
+    if host.endswith("themoviedb.org") or host.endswith("tmdb.org"):
+        return "tmdb"
+    return "players"
+
+
+def get_http_limits() -> httpx.Limits:
+    """Limites de connexions d'un pool (HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE_CONNECTIONS, HTTP_KEEPALIVE_EXPIRY)."""
+    return httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+class ConnectionStats:
+    """Compteurs de réutilisation des connexions par pool (requêtes envoyées, connexions TCP et poignées de main TLS)."""
+
+    def __init__(self):
+        self._pools: Dict[str, Dict[str, Any]] = {}
+
+    def _counters(self, pool_name: str) -> Dict[str, Any]:
+        return self._pools.setdefault(pool_name, {"requests": 0, "connections": 0, "tls_handshakes": 0, "protocols": {}})
+
+    def tracer(self, pool_name: str) -> Callable[[str, Dict[str, Any]], Awaitable[None]]:
+        """Retourne le callback d'extension "trace" de httpcore qui alimente les compteurs du pool."""
+        async def trace(event_name: str, info: Dict[str, Any]) -> None:
+            counters = self._counters(pool_name)
+            if event_name.endswith("connect_tcp.complete"):
+                counters["connections"] += 1
+            elif event_name.endswith("start_tls.complete"):
+                counters["tls_handshakes"] += 1
+            elif event_name.endswith("send_request_headers.started"):
+                # Préfixe de l'événement : http11 ou http2
+                protocol = event_name.split(".", 1)[0]
+                counters["requests"] += 1
+                counters["protocols"][protocol] = counters["protocols"].get(protocol, 0) + 1
+        return trace
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Retourne, par pool, les requêtes, les connexions ouvertes et la part de requêtes sur connexion réutilisée."""
+        pools = {}
+        for pool_name, counters in sorted(self._pools.items()):
+            reused = max(counters["requests"] - counters["connections"], 0)
+            pools[pool_name] = {
+                **counters,
+                "protocols": dict(counters["protocols"]),
+                "reused": reused,
+                "reuse_ratio": round(reused / counters["requests"], 3) if counters["requests"] else 0,
+            }
+        return pools
+
+    def reset(self) -> None:
+        """Remet les compteurs à zéro."""
+        self._pools.clear()
+
+
 class BaseClient:
     """Classe de base pour les clients avec fermeture asynchrone."""
     
@@ -107,46 +173,59 @@ class HttpClient(BaseClient):
         self.base_url = base_url
         self.timeout = timeout
         self.retries = retries
-        self.proxy_client = None  # Client avec proxy
-        self.direct_client = None  # Client sans proxy
+        self.connection_stats = ConnectionStats()
+        self.host_limiter = HostConcurrencyLimiter()
+        self._pools: Dict[str, Tuple[httpx.AsyncClient, httpx.AsyncClient]] = {}  # pool -> (client avec proxy, client direct)
         self._setup_clients()
     
     def _setup_clients(self):
+        if settings.HTTP2_ENABLED:
+            try:
+                import h2  # noqa: F401
+            except ImportError as e:
+                raise RuntimeError("HTTP2_ENABLED=True nécessite le paquet h2 (pip install astream[http2])") from e
+        
         headers = get_default_headers()
         base_config = {
             "timeout": httpx.Timeout(self.timeout),
             "headers": headers,
-            "follow_redirects": True
+            "follow_redirects": True,
+            "limits": get_http_limits(),
+            "http2": settings.HTTP2_ENABLED,
         }
         
-        # Client direct (sans proxy)
-        self.direct_client = httpx.AsyncClient(**base_config)
+        # Un client direct (sans proxy) et, si configuré, un client avec proxy par pool
+        for pool_name in HTTP_POOLS:
+            direct_client = httpx.AsyncClient(**base_config)
+            proxy_client = httpx.AsyncClient(**base_config, proxy=settings.PROXY_URL) if settings.PROXY_URL else direct_client
+            self._pools[pool_name] = (proxy_client, direct_client)
         
-        # Client avec proxy si configuré
         if settings.PROXY_URL:
-            proxy_config = base_config.copy()
-            proxy_config["proxy"] = settings.PROXY_URL
-            self.proxy_client = httpx.AsyncClient(**proxy_config)
             logger.info(f"Configuration du proxy: {settings.PROXY_URL}")
-        else:
-            self.proxy_client = self.direct_client
         
         # Client par défaut
-        self.client = self.proxy_client
+        self.client = self._pools["animesama"][0]
     
     def _get_client_for_url(self, url: str) -> httpx.AsyncClient:
-        """Retourne le client approprié selon l'URL et les règles de bypass."""
+        """Retourne le client du pool de l'URL, avec ou sans proxy selon les règles de bypass."""
+        proxy_client, direct_client = self._pools[get_pool_name(url)]
         if should_bypass_proxy(url):
-            return self.direct_client
+            return direct_client
         else:
-            return self.proxy_client
+            return proxy_client
     
     @property
     def is_closed(self) -> bool:
         """Vérifie si les clients sont fermés."""
-        proxy_closed = self.proxy_client is None or self.proxy_client.is_closed
-        direct_closed = self.direct_client is None or self.direct_client.is_closed
-        return proxy_closed and direct_closed
+        return all(client.is_closed for clients in self._pools.values() for client in clients)
+    
+    async def close(self):
+        """Ferme les clients de tous les pools."""
+        for proxy_client, direct_client in self._pools.values():
+            await proxy_client.aclose()
+            if direct_client is not proxy_client:
+                await direct_client.aclose()
+        self.client = None
     
     async def get(self, url: str, **kwargs) -> httpx.Response:
         """Effectue une requête GET avec nouvelles tentatives automatiques."""
@@ -168,6 +247,9 @@ class HttpClient(BaseClient):
         
         # Sélectionner le client approprié selon l'URL
         client = self._get_client_for_url(url)
+        pool_name = get_pool_name(url)
+        host = (urlparse(url).hostname or "").lower()
+        kwargs["extensions"] = {**kwargs.get("extensions", {}), "trace": self.connection_stats.tracer(pool_name)}
         last_exception = None
         
         for attempt in range(self.retries):
@@ -176,10 +258,13 @@ class HttpClient(BaseClient):
                     self._setup_clients()
                     client = self._get_client_for_url(url)
                 
-                bypass_info = " (bypass proxy)" if client is self.direct_client and settings.PROXY_URL else ""
+                bypass_info = " (bypass proxy)" if client is self._pools[pool_name][1] and settings.PROXY_URL else ""
                 logger.log("API", f"{method} {url}{bypass_info} (tentative {attempt + 1}/{self.retries})")
                 
-                response = await client.request(method, url, **kwargs)
+                # Fenêtre de concurrence adaptative par hôte (attente hors fenêtre, mesure de la latence)
+                async with self.host_limiter.slot(host) as slot:
+                    response = await client.request(method, url, **kwargs)
+                    slot.observe(response.status_code)
                 response.raise_for_status()
                 
                 logger.log("API", f"{method} {url} → {response.status_code}")
@@ -193,7 +278,7 @@ class HttpClient(BaseClient):
                     
             except httpx.HTTPStatusError as e:
                 last_exception = e
-                if e.response.status_code >= 500:
+                if e.response.status_code >= 500 or e.response.status_code == 429:
                     logger.warning(f"{method} {url} → {e.response.status_code} (tentative {attempt + 1}/{self.retries})")
                     if attempt < self.retries - 1:
                         await asyncio.sleep(1 * (attempt + 1))
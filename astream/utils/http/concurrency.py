@@ -0,0 +1,137 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+import httpx
+
+from astream.config.settings import settings
+from astream.utils.logger import logger
+
+# Réponse « saine » : latence inférieure à LATENCY_TOLERANCE fois la latence minimale observée
+LATENCY_TOLERANCE = 2.0
+# Dérive de la latence minimale à chaque réponse (suit un hôte devenu durablement plus lent)
+MIN_LATENCY_DRIFT = 1.05
+# Réduction multiplicative de la fenêtre sur 429, 5xx ou timeout
+DECREASE_FACTOR = 0.5
+
+
+class HostSlot:
+    """Place réservée pour une requête ; le code HTTP observé qualifie la réponse."""
+
+    def __init__(self):
+        self.status_code: Optional[int] = None
+
+    def observe(self, status_code: int) -> None:
+        """Enregistre le code HTTP de la réponse."""
+        self.status_code = status_code
+
+
+class HostLimit:
+    """Fenêtre de concurrence d'un hôte, adaptée en AIMD (hausse additive, baisse multiplicative)."""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.limit = float(settings.HTTP_HOST_CONCURRENCY_INITIAL)
+        self.in_flight = 0
+        self.min_latency: Optional[float] = None
+        self.last_decrease = 0.0
+        self.increases = 0
+        self.decreases = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> None:
+        """Attend une place libre dans la fenêtre (file FIFO)."""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Place attribuée juste avant l'annulation : la rendre au suivant
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    def release(self, started_at: float, latency: float, overloaded: bool, succeeded: bool) -> None:
+        """Libère la place et adapte la fenêtre selon le résultat de la requête."""
+        if overloaded:
+            # Une seule réduction par vague : les échecs de requêtes lancées avant la dernière réduction sont ignorés
+            if started_at >= self.last_decrease:
+                self.limit = max(float(settings.HTTP_HOST_CONCURRENCY_MIN), self.limit * DECREASE_FACTOR)
+                self.last_decrease = time.monotonic()
+                self.decreases += 1
+                logger.log("PERFORMANCE", f"Concurrence {self.host} réduite à {int(self.limit)} (surcharge détectée)")
+        elif succeeded:
+            self.min_latency = latency if self.min_latency is None else min(latency, self.min_latency * MIN_LATENCY_DRIFT)
+            # Hausse seulement si la fenêtre est pleine (sinon elle grandirait sans être utilisée)
+            window_full = self.in_flight >= int(self.limit)
+            if window_full and latency <= self.min_latency * LATENCY_TOLERANCE and self.limit < settings.HTTP_HOST_CONCURRENCY_MAX:
+                self.limit = min(float(settings.HTTP_HOST_CONCURRENCY_MAX), self.limit + 1 / self.limit)
+                self.increases += 1
+        self._release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Retourne l'état de la fenêtre sérialisable en JSON."""
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "waiting": sum(1 for future in self._waiters if not future.done()),
+            "min_latency_ms": round(self.min_latency * 1000, 1) if self.min_latency is not None else None,
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
+
+
+class HostConcurrencyLimiter:
+    """Limite les requêtes simultanées par hôte, la fenêtre grandissant tant que l'hôte répond vite
+    et se réduisant sur 429, 5xx ou timeout (évite les blocages Cloudflare lors des fan-out)."""
+
+    def __init__(self):
+        self._hosts: Dict[str, HostLimit] = {}
+
+    @asynccontextmanager
+    async def slot(self, host: str) -> AsyncIterator[HostSlot]:
+        """Réserve une place pour une requête vers host ; appeler observe() avec le code HTTP reçu."""
+        slot = HostSlot()
+        if not settings.HTTP_ADAPTIVE_CONCURRENCY:
+            yield slot
+            return
+
+        host_limit = self._hosts.get(host)
+        if host_limit is None:
+            host_limit = self._hosts[host] = HostLimit(host)
+
+        await host_limit.acquire()
+        started_at = time.monotonic()
+        overloaded = False
+        try:
+            yield slot
+        except httpx.TimeoutException:
+            overloaded = True
+            raise
+        finally:
+            status_code = slot.status_code
+            overloaded = overloaded or status_code == 429 or (status_code is not None and status_code >= 500)
+            succeeded = status_code is not None and status_code < 400
+            host_limit.release(started_at, time.monotonic() - started_at, overloaded, succeeded)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Retourne la fenêtre courante de chaque hôte contacté."""
+        return {host: host_limit.snapshot() for host, host_limit in sorted(self._hosts.items())}
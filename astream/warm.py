@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import os
+from typing import Dict, List
+
+from astream.config.settings import settings
+from astream.utils.logger import logger
+from astream.utils.http.client import HttpClient
+from astream.utils.data.database import setup_database, teardown_database, acquire_lock, release_lock, invalidate_anime
+from astream.scrapers.animesama.client import AnimeSamaAPI
+from astream.scrapers.animesama.details import get_or_fetch_anime_details
+from astream.scrapers.animesama.planning import AnimeSamaPlanning
+
+# Identité utilisée pour le rate limiting des requêtes de préchauffage
+WARM_CLIENT_ID = "cache-warmer"
+
+
+async def warm_slugs(animesama_api: AnimeSamaAPI, anime_slugs: List[str]) -> int:
+    """Précharge les détails (saisons comprises) d'une liste d'anime et retourne le nombre réussi."""
+    semaphore = asyncio.Semaphore(max(1, settings.CACHE_WARM_CONCURRENCY))
+
+    async def warm_one(anime_slug: str) -> bool:
+        async with semaphore:
+            try:
+                return bool(await get_or_fetch_anime_details(animesama_api.details, anime_slug))
+            except Exception as e:
+                logger.warning(f"Préchauffage {anime_slug} échoué: {e}")
+                return False
+
+    results = await asyncio.gather(*(warm_one(anime_slug) for anime_slug in anime_slugs))
+    return sum(results)
+
+
+async def warm_cache(http_client: HttpClient) -> Dict[str, int]:
+    """Précharge page d'accueil, planning et détails de chaque anime listé (un seul worker à la fois)."""
+    instance_id = f"warm_{os.getpid()}"
+    if not await acquire_lock("cache_warm", instance_id, settings.CACHE_WARM_LOCK_TTL):
+        logger.log("PERFORMANCE", "Préchauffage du cache déjà en cours sur une autre instance")
+        return {}
+
+    try:
+        animesama_api = AnimeSamaAPI(http_client)
+        animesama_api.set_client_ip(WARM_CLIENT_ID)
+        planning = AnimeSamaPlanning(http_client)
+        planning.set_client_ip(WARM_CLIENT_ID)
+
+        logger.log("PERFORMANCE", "Préchauffage du cache: page d'accueil et planning")
+        homepage = await animesama_api.get_homepage_content()
+        planning_slugs = await planning.get_current_planning_anime()
+
+        # Page d'accueil d'abord (ordre d'affichage), puis anime du planning
+        anime_slugs = list(dict.fromkeys(
+            [anime.get("slug") for anime in homepage if anime.get("slug")] + sorted(planning_slugs)
+        ))
+        logger.log("PERFORMANCE", f"Préchauffage du cache: {len(anime_slugs)} anime à charger")
+
+        warmed = await warm_slugs(animesama_api, anime_slugs)
+        logger.log("PERFORMANCE", f"Préchauffage du cache terminé: {warmed}/{len(anime_slugs)} anime")
+        return {"homepage": len(homepage), "planning": len(planning_slugs), "anime": len(anime_slugs), "warmed": warmed}
+    except Exception as e:
+        logger.error(f"Erreur préchauffage du cache: {e}")
+        return {}
+    finally:
+        await release_lock("cache_warm", instance_id)
+
+
+async def rewarm_anime(http_client: HttpClient, anime_slug: str) -> Dict[str, int]:
+    """Purge toutes les entrées d'un anime puis recharge immédiatement sa fiche."""
+    purged = await invalidate_anime(anime_slug)
+
+    animesama_api = AnimeSamaAPI(http_client)
+    animesama_api.set_client_ip(WARM_CLIENT_ID)
+    warmed = await warm_slugs(animesama_api, [anime_slug])
+    return {"purged": len(purged), "warmed": warmed}
+
+
+async def main() -> None:
+    """Point d'entrée CLI : python -m astream.warm [--invalidate slug ...]"""
+    parser = argparse.ArgumentParser(prog="python -m astream.warm", description="Préchauffage du cache AStream")
+    parser.add_argument("--invalidate", nargs="+", metavar="SLUG", help="purger puis recharger uniquement ces anime")
+    args = parser.parse_args()
+
+    await setup_database()
+    http_client = HttpClient()
+    try:
+        if args.invalidate:
+            for anime_slug in args.invalidate:
+                result = await rewarm_anime(http_client, anime_slug)
+                logger.log("PERFORMANCE", f"Invalidation {anime_slug}: {result['purged']} entrées purgées, rechargé: {bool(result['warmed'])}")
+        else:
+            await warm_cache(http_client)
+    finally:
+        await http_client.close()
+        await teardown_database()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# La configuration exige une URL anime-sama au chargement des paramètres
+os.environ.setdefault("ANIMESAMA_URL", "https://anime-sama.example")
+# Base SQLite temporaire (recréée par chaque test qui l'utilise)
+os.environ.setdefault("DATABASE_TYPE", "sqlite")
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(prefix="astream-tests-"), "astream.db"))
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from astream.utils.data import database
+from astream.utils.data.backends.memory import MemoryCacheBackend
+from astream.utils.data.database import DistributedLock, LockHolderError
+
+
+def run_with_memory_backend(scenario):
+    """Exécute un scénario asynchrone avec le backend mémoire comme backend de cache actif."""
+    async def main():
+        database.set_cache_backend(MemoryCacheBackend())
+        try:
+            await scenario()
+        finally:
+            database.set_cache_backend(None)
+
+    asyncio.run(main())
+
+
+def test_concurrent_runs_share_the_holder_result():
+    async def scenario():
+        calls = []
+
+        async def fetch(value):
+            calls.append(value)
+            await asyncio.sleep(0.2)
+            return {"players": [value]}
+
+        results = await asyncio.gather(*[DistributedLock("episode_fetch").run(lambda value=value: fetch(value)) for value in range(4)])
+
+        assert len(calls) == 1
+        assert results == [{"players": [calls[0]]}] * 4
+
+    run_with_memory_backend(scenario)
+
+
+def test_holder_failure_reaches_waiters_only():
+    async def scenario():
+        async def failing():
+            await asyncio.sleep(0.2)
+            raise RuntimeError("anime-sama indisponible")
+
+        async def never_called():
+            raise AssertionError("un waiter ne doit pas refaire le travail")
+
+        holder, waiter = await asyncio.gather(
+            DistributedLock("details_fetch").run(failing),
+            DistributedLock("details_fetch").run(never_called),
+            return_exceptions=True
+        )
+        assert isinstance(holder, RuntimeError)
+        assert isinstance(waiter, LockHolderError)
+
+        # Un appel ultérieur n'hérite pas de l'échec : il refait le travail
+        async def recovered():
+            return ["ok"]
+
+        assert await DistributedLock("details_fetch").run(recovered) == ["ok"]
+
+    run_with_memory_backend(scenario)
+
+
+def test_sequential_runs_never_reuse_an_old_result():
+    async def scenario():
+        assert await DistributedLock("anime_warm").run(lambda: asyncio.sleep(0, result={"version": 1})) == {"version": 1}
+        assert await DistributedLock("anime_warm").run(lambda: asyncio.sleep(0, result={"version": 2})) == {"version": 2}
+
+    run_with_memory_backend(scenario)
+
+
+def test_exception_propagates_to_the_holder():
+    async def scenario():
+        async def failing():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            await DistributedLock("tmdb_fetch").run(failing)
+        assert await database.get_lock_holder("tmdb_fetch") is None
+
+    run_with_memory_backend(scenario)
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import os
+import time
+
+from astream.config.settings import database, settings
+from astream.utils.data.backends.migrations import DATABASE_VERSION, MIGRATIONS, run_migrations
+from astream.utils.data.backends.sql import SQLCacheBackend
+
+
+def reset_database_file():
+    for suffix in ("", "-wal", "-shm"):
+        path = settings.DATABASE_PATH + suffix
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def run_upgrade(prepare, scenario):
+    """Crée une base SQLite avec prepare(), la met à niveau (migrations de schéma puis par lots) et exécute le scénario."""
+    async def main():
+        reset_database_file()
+        await database.connect()
+        try:
+            await prepare()
+        finally:
+            await database.disconnect()
+
+        backend = SQLCacheBackend()
+        await backend.setup()
+        try:
+            await backend.run_background_migrations()
+            await scenario(backend)
+        finally:
+            await backend.teardown()
+
+    asyncio.run(main())
+
+
+async def create_2_0_schema(rows):
+    """Schéma 2.0 (tables animesama/tmdb en JSON texte) et ses lignes (clé, contenu)."""
+    now = int(time.time())
+    await database.execute("CREATE TABLE db_version (id INTEGER PRIMARY KEY CHECK (id = 1), version TEXT)")
+    await database.execute("INSERT INTO db_version VALUES (1, '2.0')")
+    await database.execute("CREATE TABLE scrape_lock (lock_key TEXT PRIMARY KEY, instance_id TEXT, timestamp INTEGER, expires_at INTEGER)")
+    await database.execute("CREATE TABLE animesama (key TEXT PRIMARY KEY, content TEXT NOT NULL, created_at INTEGER, expires_at INTEGER)")
+    await database.execute("CREATE TABLE tmdb (key TEXT PRIMARY KEY, content TEXT NOT NULL, created_at INTEGER, expires_at INTEGER)")
+    for key, content in rows:
+        table_name = "tmdb" if key.startswith("tmdb:") else "animesama"
+        await database.execute(
+            f"INSERT INTO {table_name} (key, content, created_at, expires_at) VALUES (:key, :content, :created_at, :expires_at)",
+            {"key": key, "content": json.dumps(content), "created_at": now, "expires_at": now + 3600}
+        )
+
+
+def test_upgrade_from_2_0_moves_episode_players():
+    legacy_rows = [
+        ("as:naruto", {"slug": "naruto", "title": "Naruto"}),
+        ("as:naruto:s1e1", {
+            "player_urls": [{"url": "https://player.example/1", "language": "vostfr"}, {"url": "https://player.example/2", "language": "vf"}],
+            "anime_slug": "naruto", "season": 1, "episode": 1, "language_filter": None, "total_players": 2,
+        }),
+        ("as:naruto:s1e2", {"player_urls": ["https://player.example/3"], "anime_slug": "naruto"}),
+        ("as:naruto:s1e3", {"player_urls": [], "anime_slug": "naruto"}),
+    ]
+
+    async def scenario(backend):
+        assert await database.fetch_val("SELECT version FROM db_version WHERE id = 1") == DATABASE_VERSION
+
+        episodes = await backend.get_episodes("naruto", 1, None, time.time())
+        assert set(episodes) == {1, 2, 3}
+        assert [(player["url"], player["language"]) for player in episodes[1].data] == [
+            ("https://player.example/1", "vostfr"),
+            ("https://player.example/2", "vf"),
+        ]
+        assert [player["url"] for player in episodes[2].data] == ["https://player.example/3"]
+        assert episodes[3].data == []
+        assert episodes[3].outcome.value == "not_found"
+
+        # Lignes historiques déplacées, fiche de l'anime conservée
+        keys = [row["key"] for row in await database.fetch_all("SELECT key FROM animesama ORDER BY key")]
+        assert keys == ["as:naruto"]
+        entries = await backend.get_entries(["as:naruto"], time.time())
+        assert entries["as:naruto"].data["title"] == "Naruto"
+
+    run_upgrade(lambda: create_2_0_schema(legacy_rows), scenario)
+
+
+def test_upgrade_backfills_slugs_of_anime_keys_only():
+    rows = [
+        ("as:naruto", {"slug": "naruto"}),
+        ("as:homepage", []),
+        ("as:search:naruto", [{"slug": "naruto"}]),
+        ("as:video:0123456789abcdef", ["https://video.example/1.mp4"]),
+    ]
+
+    async def scenario(backend):
+        slugs = {row["key"]: row["slug"] for row in await database.fetch_all("SELECT key, slug FROM animesama")}
+        assert slugs == {"as:naruto": "naruto", "as:homepage": None, "as:search:naruto": None, "as:video:0123456789abcdef": None}
+
+        # Invalider un anime ne touche pas aux URLs vidéo résolues
+        assert await backend.purge_slug("video") == []
+        assert await backend.purge_slug("naruto") == ["as:naruto"]
+
+    run_upgrade(lambda: create_2_0_schema(rows), scenario)
+
+
+def test_fresh_database_applies_every_migration_once():
+    async def scenario(backend):
+        applied = [row["id"] for row in await database.fetch_all("SELECT id FROM schema_migrations ORDER BY id")]
+        assert applied == [migration.id for migration in MIGRATIONS]
+        assert await database.fetch_val("SELECT version FROM db_version WHERE id = 1") == DATABASE_VERSION
+
+        assert await run_migrations(backend) == 0
+        assert await run_migrations(backend, batched=True) == 0
+
+    run_upgrade(lambda: asyncio.sleep(0), scenario)
+
+
+def test_upgrade_reencodes_legacy_rows():
+    rows = [("as:bleach", {"title": "Bleach", "seasons": [1]}), ("tmdb:42", {"id": 42})]
+
+    async def scenario(backend):
+        migrated = await database.fetch_all("SELECT key, codec, last_access, created_at FROM animesama UNION ALL SELECT key, codec, last_access, created_at FROM tmdb")
+        assert {row["key"]: row["codec"] for row in migrated} == {"as:bleach": "orjson", "tmdb:42": "orjson"}
+        assert all(row["last_access"] == row["created_at"] for row in migrated)
+
+        entries = await backend.get_entries(["as:bleach", "tmdb:42"], time.time())
+        assert entries["as:bleach"].data == {"title": "Bleach", "seasons": [1]}
+        assert entries["tmdb:42"].data == {"id": 42}
+
+    run_upgrade(lambda: create_2_0_schema(rows), scenario)
@@ -0,0 +1,143 @@
+import asyncio
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from astream.utils.data.backends.base import CacheEntry, CacheOutcome
+from astream.utils.data.backends.redis import RedisCacheBackend
+
+
+def run_with_backend(scenario):
+    """Exécute un scénario asynchrone contre un backend Redis simulé (fakeredis)."""
+    async def main():
+        backend = RedisCacheBackend(fakeredis.aioredis.FakeRedis(), key_prefix="test:")
+        await backend.setup()
+        try:
+            await scenario(backend)
+        finally:
+            await backend.teardown()
+
+    asyncio.run(main())
+
+
+def make_entry(data, ttl=3600, outcome=CacheOutcome.FOUND, version=1):
+    now = time.time()
+    return CacheEntry(data, now, now + ttl, outcome, version, 0.5)
+
+
+def test_set_and_get_entries():
+    async def scenario(backend):
+        await backend.set_entries([
+            ("as:one-piece", make_entry({"title": "One Piece", "seasons": [1, 2]})),
+            ("tmdb:search:one piece", make_entry([], outcome=CacheOutcome.NOT_FOUND, version=2)),
+            ("as:expired", make_entry({"title": "Expired"}, ttl=-10)),
+        ])
+
+        entries = await backend.get_entries(["as:one-piece", "tmdb:search:one piece", "as:expired", "as:missing"], time.time())
+
+        assert set(entries) == {"as:one-piece", "tmdb:search:one piece"}
+        assert entries["as:one-piece"].data == {"title": "One Piece", "seasons": [1, 2]}
+        assert entries["as:one-piece"].outcome == CacheOutcome.FOUND
+        assert entries["as:one-piece"].compute_time == 0.5
+        assert entries["tmdb:search:one piece"].outcome == CacheOutcome.NOT_FOUND
+        assert entries["tmdb:search:one piece"].version == 2
+        assert await backend.get_entries([], time.time()) == {}
+
+    run_with_backend(scenario)
+
+
+def test_set_entries_replaces_existing_entry():
+    async def scenario(backend):
+        await backend.set_entries([("as:naruto", make_entry({"title": "Old"}))])
+        await backend.set_entries([("as:naruto", make_entry({"title": "New"}))])
+
+        entries = await backend.get_entries(["as:naruto"], time.time())
+        assert entries["as:naruto"].data == {"title": "New"}
+
+    run_with_backend(scenario)
+
+
+def test_episodes_are_merged_per_season():
+    async def scenario(backend):
+        players_1 = [{"url": "https://p.example/1", "language": "VOSTFR"}]
+        players_2 = [{"url": "https://p.example/2", "language": "VF"}]
+        await backend.set_episodes("one-piece", 1, {1: make_entry(players_1, version=3)})
+        await backend.set_episodes("one-piece", 1, {2: make_entry(players_2), 3: make_entry([], ttl=-10)})
+
+        all_episodes = await backend.get_episodes("one-piece", 1, None, time.time())
+        assert set(all_episodes) == {1, 2}
+        assert all_episodes[1].data == players_1
+        assert all_episodes[1].version == 3
+        assert all_episodes[2].version == 1
+
+        selected = await backend.get_episodes("one-piece", 1, [2, 4], time.time())
+        assert set(selected) == {2}
+        assert selected[2].data == players_2
+        assert await backend.get_episodes("one-piece", 1, [], time.time()) == {}
+        assert await backend.get_episodes("one-piece", 2, None, time.time()) == {}
+
+    run_with_backend(scenario)
+
+
+def test_season_expiry_is_only_extended():
+    async def scenario(backend):
+        await backend.set_episodes("one-piece", 1, {1: make_entry([], ttl=3600)})
+        long_ttl = await backend.client.ttl("test:episodes:one-piece:s1")
+        await backend.set_episodes("one-piece", 1, {2: make_entry([], ttl=60)})
+        assert await backend.client.ttl("test:episodes:one-piece:s1") >= long_ttl - 1
+
+        await backend.set_episodes("one-piece", 1, {3: make_entry([], ttl=7200)})
+        assert await backend.client.ttl("test:episodes:one-piece:s1") > long_ttl
+
+    run_with_backend(scenario)
+
+
+def test_lock_acquire_release():
+    async def scenario(backend):
+        assert await backend.get_lock_holder("metadata_fetch_naruto") is None
+        assert await backend.acquire_lock("metadata_fetch_naruto", "worker-a", 60)
+        assert await backend.get_lock_holder("metadata_fetch_naruto") == "worker-a"
+        # Réentrant pour son détenteur, refusé aux autres
+        assert await backend.acquire_lock("metadata_fetch_naruto", "worker-a", 60)
+        assert not await backend.acquire_lock("metadata_fetch_naruto", "worker-b", 60)
+
+        assert not await backend.release_lock("metadata_fetch_naruto", "worker-b")
+        assert not await backend.acquire_lock("metadata_fetch_naruto", "worker-b", 60)
+
+        assert await backend.release_lock("metadata_fetch_naruto", "worker-a")
+        assert await backend.acquire_lock("metadata_fetch_naruto", "worker-b", 60)
+        assert await backend.get_lock_holder("metadata_fetch_naruto") == "worker-b"
+
+    run_with_backend(scenario)
+
+
+def test_lock_result():
+    async def scenario(backend):
+        assert await backend.get_lock_result("episode_fetch") is None
+        await backend.set_lock_result("episode_fetch", b'{"value":[1,2]}', 60)
+        assert await backend.get_lock_result("episode_fetch") == b'{"value":[1,2]}'
+
+    run_with_backend(scenario)
+
+
+def test_purge_slug():
+    async def scenario(backend):
+        await backend.set_entries([
+            ("as:naruto", make_entry({"title": "Naruto"})),
+            ("as:naruto-shippuden", make_entry({"title": "Naruto Shippuden"})),
+            ("as:search:naruto", make_entry([{"slug": "naruto"}])),
+        ])
+        await backend.set_episodes("naruto", 1, {1: make_entry([]), 2: make_entry([])})
+        await backend.set_episodes("naruto-shippuden", 1, {1: make_entry([])})
+
+        purged = await backend.purge_slug("naruto")
+
+        assert sorted(purged) == ["as:naruto", "as:naruto:s1e1", "as:naruto:s1e2"]
+        remaining = await backend.get_entries(["as:naruto", "as:naruto-shippuden", "as:search:naruto"], time.time())
+        assert set(remaining) == {"as:naruto-shippuden", "as:search:naruto"}
+        assert await backend.get_episodes("naruto", 1, None, time.time()) == {}
+        assert set(await backend.get_episodes("naruto-shippuden", 1, None, time.time())) == {1}
+
+    run_with_backend(scenario)
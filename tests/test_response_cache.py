@@ -0,0 +1,90 @@
+import asyncio
+import os
+
+from astream.config.settings import settings
+from astream.utils.data import database, response_cache
+from astream.utils.data.backends.sql import SQLCacheBackend
+from astream.utils.data.response_cache import ResponseCache, anime_tag, cache_response, get_cached_response, start_document_build
+
+
+def run_with_shared_backend(scenario):
+    """Exécute un scénario avec le backend SQL (base SQLite temporaire neuve) partagé par les « workers » simulés."""
+    async def main():
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(settings.DATABASE_PATH + suffix):
+                os.remove(settings.DATABASE_PATH + suffix)
+        backend = SQLCacheBackend()
+        await backend.setup()
+        database.set_cache_backend(backend)
+        try:
+            await scenario()
+        finally:
+            await backend.teardown()
+            database.set_cache_backend(None)
+
+    asyncio.run(main())
+
+
+async def build_document(key):
+    """Construit un document comme un handler : lecture des entrées de cache puis mise en cache."""
+    async def handler():
+        start_document_build()
+        entries = await database.get_cache_entries(["as:naruto", "tmdb:20"])
+        return cache_response(key, {"titles": [entry.data["title"] for entry in entries.values()]}, [anime_tag("naruto")])
+
+    return await asyncio.create_task(handler())
+
+
+def as_worker(cache, action):
+    """Exécute action() avec le cache de documents d'un autre worker."""
+    async def run():
+        own_cache = response_cache.response_cache
+        response_cache.response_cache = cache
+        try:
+            return await action()
+        finally:
+            response_cache.response_cache = own_cache
+
+    return run()
+
+
+def test_documents_are_tagged_with_the_keys_they_read():
+    async def scenario():
+        await database.set_metadata_many([("as:naruto", {"title": "Naruto"}), ("tmdb:20", {"title": "Naruto (TMDB)"})])
+        await build_document("meta|naruto")
+
+        _, tags, _, _ = response_cache.response_cache.get_document("meta|naruto")
+        assert {"as:naruto", "tmdb:20", anime_tag("naruto")} <= tags
+        # Les écritures faites pendant la construction ne périment pas le document
+        assert await get_cached_response("meta|naruto") is not None
+
+    run_with_shared_backend(scenario)
+
+
+def test_write_on_another_worker_drops_the_document():
+    async def scenario():
+        await database.set_metadata_many([("as:naruto", {"title": "Naruto"}), ("tmdb:20", {"title": "Naruto (TMDB)"})])
+        await build_document("meta|naruto")
+        assert await get_cached_response("meta|naruto") is not None
+
+        # Un autre worker réécrit une clé TMDB utilisée par le document
+        other_worker_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_ITEMS, settings.RESPONSE_CACHE_TTL)
+        await as_worker(other_worker_cache, lambda: database.set_metadata_to_cache("tmdb:20", {"title": "Naruto (2002)"}))
+
+        assert await get_cached_response("meta|naruto") is None
+        assert response_cache.response_cache.get_document("meta|naruto") is None
+
+    run_with_shared_backend(scenario)
+
+
+def test_unrelated_write_keeps_the_document():
+    async def scenario():
+        await database.set_metadata_many([("as:naruto", {"title": "Naruto"}), ("tmdb:20", {"title": "Naruto (TMDB)"})])
+        await build_document("meta|naruto")
+
+        other_worker_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_ITEMS, settings.RESPONSE_CACHE_TTL)
+        await as_worker(other_worker_cache, lambda: database.set_metadata_to_cache("as:bleach", {"title": "Bleach"}))
+
+        assert await get_cached_response("meta|naruto") is not None
+
+    run_with_shared_backend(scenario)
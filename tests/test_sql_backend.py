@@ -0,0 +1,184 @@
+import asyncio
+import os
+import time
+
+from astream.config.settings import database, settings
+from astream.utils.data.backends.base import CacheEntry, CacheOutcome
+from astream.utils.data.backends.sql import SQLCacheBackend
+
+
+def run_with_backend(scenario):
+    """Exécute un scénario asynchrone contre le backend SQL sur une base SQLite temporaire neuve."""
+    async def main():
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(settings.DATABASE_PATH + suffix):
+                os.remove(settings.DATABASE_PATH + suffix)
+        backend = SQLCacheBackend()
+        await backend.setup()
+        try:
+            await scenario(backend)
+        finally:
+            await backend.teardown()
+
+    asyncio.run(main())
+
+
+def make_entry(data, ttl=3600, outcome=CacheOutcome.FOUND, version=1):
+    now = time.time()
+    return CacheEntry(data, now, now + ttl, outcome, version, 0.5)
+
+
+def test_set_and_get_entries():
+    async def scenario(backend):
+        await backend.set_entries([
+            ("as:naruto", make_entry({"title": "Naruto", "seasons": [1, 2]}, version=2)),
+            ("tmdb:123", make_entry({"id": 123}, outcome=CacheOutcome.PARTIAL)),
+            ("as:expired", make_entry({"title": "Old"}, ttl=-10)),
+        ])
+
+        entries = await backend.get_entries(["as:naruto", "tmdb:123", "as:expired", "as:missing"], time.time())
+        assert set(entries) == {"as:naruto", "tmdb:123"}
+        assert entries["as:naruto"].data == {"title": "Naruto", "seasons": [1, 2]}
+        assert entries["as:naruto"].version == 2
+        assert entries["tmdb:123"].outcome == CacheOutcome.PARTIAL
+
+        await backend.set_entries([("as:naruto", make_entry({"title": "Naruto (2002)"}))])
+        entries = await backend.get_entries(["as:naruto"], time.time())
+        assert entries["as:naruto"].data == {"title": "Naruto (2002)"}
+
+    run_with_backend(scenario)
+
+
+def test_codec_round_trip():
+    async def scenario(backend):
+        large = {"synopsis": "x" * (settings.CACHE_COMPRESSION_THRESHOLD * 4), "episodes": list(range(50))}
+        await backend.set_entries([("as:one-piece", make_entry(large)), ("as:bleach", make_entry({"title": "Bleach"}))])
+
+        codecs = {row["key"]: row["codec"] for row in await database.fetch_all("SELECT key, codec FROM animesama")}
+        assert codecs == {"as:one-piece": "orjson+zlib", "as:bleach": "orjson"}
+
+        entries = await backend.get_entries(["as:one-piece", "as:bleach"], time.time())
+        assert entries["as:one-piece"].data == large
+        assert entries["as:bleach"].data == {"title": "Bleach"}
+
+    run_with_backend(scenario)
+
+
+def test_get_fields_projections():
+    async def scenario(backend):
+        document = {"anime": [{"slug": "naruto", "genres": ["Action"]}, {"slug": "bleach", "genres": ["Shonen"]}], "count": 2}
+        await backend.set_entries([("as:homepage", make_entry(document))])
+        # Ligne historique en JSON texte (codec NULL)
+        now = time.time()
+        await database.execute(
+            "INSERT INTO animesama (key, content, created_at, expires_at) VALUES ('as:naruto', :content, :now, :expires_at)",
+            {"content": '{"seasons": [{"season_number": 1}], "title": "Naruto"}', "now": now, "expires_at": now + 3600}
+        )
+
+        entry = await backend.get_fields("as:homepage", ["count", "anime.*.slug", "anime.1.genres", "missing"], time.time())
+        assert entry.data == {"count": 2, "anime.*.slug": ["naruto", "bleach"], "anime.1.genres": ["Shonen"], "missing": None}
+
+        entry = await backend.get_fields("as:naruto", ["seasons"], time.time())
+        assert entry.data == {"seasons": [{"season_number": 1}]}
+        assert await backend.get_fields("as:unknown", ["seasons"], time.time()) is None
+
+    run_with_backend(scenario)
+
+
+def test_episodes_are_merged_per_season():
+    async def scenario(backend):
+        players_1 = [{"url": "https://p.example/1", "language": "VOSTFR", "source": "animesama"}]
+        players_2 = [{"url": "https://p.example/2", "language": "VF", "source": "dataset"}]
+        await backend.set_episodes("one-piece", 1, {1: make_entry(players_1, version=3)})
+        await backend.set_episodes("one-piece", 1, {2: make_entry(players_2), 3: make_entry([], ttl=-10, outcome=CacheOutcome.NOT_FOUND)})
+
+        all_episodes = await backend.get_episodes("one-piece", 1, None, time.time())
+        assert set(all_episodes) == {1, 2}
+        assert all_episodes[1].data == players_1
+        assert all_episodes[1].version == 3
+        assert all_episodes[2].data == players_2
+
+        # Remplacement d'un épisode : ses anciens players disparaissent
+        await backend.set_episodes("one-piece", 1, {1: make_entry([], outcome=CacheOutcome.NOT_FOUND)})
+        selected = await backend.get_episodes("one-piece", 1, [1, 4], time.time())
+        assert set(selected) == {1}
+        assert selected[1].data == []
+        assert selected[1].outcome == CacheOutcome.NOT_FOUND
+        assert await database.fetch_val("SELECT COUNT(*) FROM episode_players WHERE episode = 1") == 0
+
+    run_with_backend(scenario)
+
+
+def test_lock_acquire_release():
+    async def scenario(backend):
+        assert await backend.get_lock_holder("metadata_fetch_naruto") is None
+        assert await backend.acquire_lock("metadata_fetch_naruto", "worker-a", 60)
+        assert await backend.get_lock_holder("metadata_fetch_naruto") == "worker-a"
+        # Réentrant pour son détenteur, refusé aux autres
+        assert await backend.acquire_lock("metadata_fetch_naruto", "worker-a", 60)
+        assert not await backend.acquire_lock("metadata_fetch_naruto", "worker-b", 60)
+
+        await backend.release_lock("metadata_fetch_naruto", "worker-b")
+        assert not await backend.acquire_lock("metadata_fetch_naruto", "worker-b", 60)
+
+        await backend.release_lock("metadata_fetch_naruto", "worker-a")
+        assert await backend.acquire_lock("metadata_fetch_naruto", "worker-b", 60)
+        assert await backend.get_lock_holder("metadata_fetch_naruto") == "worker-b"
+
+    run_with_backend(scenario)
+
+
+def test_expired_lock_is_taken_over():
+    async def scenario(backend):
+        assert await backend.acquire_lock("video_resolve", "worker-a", 60)
+        await database.execute("UPDATE scrape_lock SET expires_at = :expired WHERE lock_key = 'video_resolve'", {"expired": int(time.time()) - 5})
+
+        assert await backend.get_lock_holder("video_resolve") is None
+        assert await backend.acquire_lock("video_resolve", "worker-b", 60)
+        assert not await backend.acquire_lock("video_resolve", "worker-a", 60)
+
+    run_with_backend(scenario)
+
+
+def test_lock_result():
+    async def scenario(backend):
+        assert await backend.get_lock_result("episode_fetch") is None
+        await backend.set_lock_result("episode_fetch", b'{"value":[1,2]}', 60)
+        assert await backend.get_lock_result("episode_fetch") == b'{"value":[1,2]}'
+
+        await backend.set_lock_result("episode_fetch", b'{"value":[3]}', -1)
+        assert await backend.get_lock_result("episode_fetch") is None
+
+    run_with_backend(scenario)
+
+
+def test_invalidations_keep_the_latest_date():
+    async def scenario(backend):
+        assert await backend.get_invalidations(["as:naruto"]) == {}
+        await backend.publish_invalidations({"as:naruto": 200.0, "anime:naruto": 200.0}, 60)
+        await backend.publish_invalidations({"as:naruto": 100.0}, 60)
+
+        assert await backend.get_invalidations(["as:naruto", "anime:naruto", "as:bleach"]) == {"as:naruto": 200.0, "anime:naruto": 200.0}
+
+    run_with_backend(scenario)
+
+
+def test_purge_slug_and_sweep():
+    async def scenario(backend):
+        await backend.set_entries([
+            ("as:naruto", make_entry({"title": "Naruto"})),
+            ("as:naruto-shippuden", make_entry({"title": "Naruto Shippuden"})),
+            ("as:bleach", make_entry({"title": "Bleach"}, ttl=-10)),
+        ])
+        await backend.set_episodes("naruto", 1, {1: make_entry([{"url": "https://p.example/1"}])})
+
+        purged = await backend.purge_slug("naruto")
+        assert set(purged) == {"as:naruto", "as:naruto:s1e1"}
+        assert await backend.get_episodes("naruto", 1, None, time.time()) == {}
+        assert set(await backend.get_entries(["as:naruto", "as:naruto-shippuden"], time.time())) == {"as:naruto-shippuden"}
+
+        rows, _ = await backend.sweep_expired(time.time(), 100)
+        assert rows == 1
+        assert await database.fetch_val("SELECT COUNT(*) FROM animesama WHERE key = 'as:bleach'") == 0
+
+    run_with_backend(scenario)